@@ -0,0 +1,244 @@
+"""Budget allocator over Robyn response curves with a persistent memo store.
+
+A Hill response curve ``beta * s^alpha / (s^alpha + kappa^alpha)`` is fitted
+per channel to the spend/response points and marginal responses reported in
+the Robyn allocator files (initial and optimized points of every scenario).
+Allocations are then solved with SLSQP for either objective:
+
+- ``max_response``: maximize total response for a fixed budget
+- ``target_efficiency``: maximize total response while keeping ROAS at or
+  above a target, spending at most the budget
+
+Spend bounds are multipliers of each channel's initial spend, like Robyn's
+``constr_low``/``constr_up``. Every solve is stored in an SQLite memo keyed on
+a hash of (curve parameters, objective, budget, target, bounds), so a plan
+that was solved before returns instantly across sessions and restarts, and
+refitted or calibrated curves never reuse another model's plans; new plans
+warm-start from the spend of the nearest cached plan on the same curves.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+from scipy import optimize as opt
+
+OBJECTIVES = ['max_response', 'target_efficiency']
+MEMO_PATH = os.environ.get(
+    'ALLOCATOR_MEMO', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'allocator.sqlite')
+)
+# Cached plans compared when looking for a warm start
+WARM_START_CANDIDATES = 500
+# Columns of a fitted curve frame that determine its plans
+CURVE_COLUMNS = ['beta', 'alpha', 'kappa', 'init_spend', 'init_response']
+
+def hill_response(spend, beta, alpha, kappa):
+    spend = np.maximum(spend, 0)
+    return beta * spend ** alpha / (spend ** alpha + kappa ** alpha)
+
+def hill_marginal(spend, beta, alpha, kappa):
+    spend = np.maximum(spend, 1e-12)
+    return beta * alpha * kappa ** alpha * spend ** (alpha - 1) / (spend ** alpha + kappa ** alpha) ** 2
+
+def curve_points(scenarios):
+    """Distinct (spend, response, marginal response) observations per channel from allocator frames"""
+    columns = [('initSpendUnit', 'initResponseUnit', 'initResponseMargUnit'),
+               ('optmSpendUnit', 'optmResponseUnit', 'optmResponseMargUnit'),
+               ('optmSpendUnitUnbound', 'optmResponseUnitUnbound', 'optmResponseMargUnitUnbound')]
+    frames = []
+    for scenario in scenarios:
+        for spend, response, marginal in columns:
+            points = scenario[['channels', spend, response, marginal]]
+            frames.append(points.set_axis(['channel', 'spend', 'response', 'marginal'], axis=1))
+    points = pd.concat(frames, ignore_index=True)
+    # Unbounded solutions that zero out spend while reporting a response are not points on the curve
+    points = points[(points['spend'] > 0) & (points['response'] > 0)]
+    return points.round({'spend': 9}).drop_duplicates(['channel', 'spend'])
+
+def fit_curve(spend, response, marginal):
+    """Least-squares Hill fit in log space to responses and marginal responses"""
+    init = np.argmin(spend)
+    kappa0, alpha0 = 2 * spend.max(), 2.0
+    beta0 = response[init] * (spend[init] ** alpha0 + kappa0 ** alpha0) / spend[init] ** alpha0
+
+    def residuals(params):
+        beta, alpha, kappa = np.exp(params)
+        return np.concatenate([
+            np.log(hill_response(spend, beta, alpha, kappa) / response),
+            np.log(hill_marginal(spend, beta, alpha, kappa) / marginal)
+        ])
+
+    bounds = ([np.log(response.max()), np.log(0.5), np.log(spend.min() / 10)],
+              [np.log(response.max() * 1e3), np.log(5.0), np.log(spend.max() * 1e2)])
+    start = np.clip(np.log([beta0, alpha0, kappa0]), bounds[0], bounds[1])
+    fit = opt.least_squares(residuals, start, bounds=bounds)
+    return np.exp(fit.x)
+
+def fit_response_curves(scenarios):
+    """Hill parameters and initial spend/response per channel; one row per channel"""
+    points = curve_points(scenarios)
+    base = scenarios[0].set_index('channels')
+    rows = []
+    for channel in base.index:
+        channel_points = points[points['channel'] == channel]
+        beta, alpha, kappa = fit_curve(*(channel_points[col].to_numpy(float) for col in ['spend', 'response', 'marginal']))
+        rows.append([channel, beta, alpha, kappa, base.loc[channel, 'initSpendUnit'], base.loc[channel, 'initResponseUnit']])
+    curves = pd.DataFrame(rows, columns=['channel', 'beta', 'alpha', 'kappa', 'init_spend', 'init_response'])
+    curves.attrs['sol_id'] = str(base['solID'].iloc[0])
+    return curves.set_index('channel')
+
+def solve_allocation(curves, budget, lower, upper, objective='max_response', target_roas=None, x0=None):
+    """Solve one allocation with SLSQP; bounds are absolute spends per channel"""
+    beta, alpha, kappa = (curves[col].to_numpy(float) for col in ['beta', 'alpha', 'kappa'])
+    lower, upper = np.asarray(lower, dtype=float), np.asarray(upper, dtype=float)
+    # Responses are in the hundreds of millions; scale them to keep the solver well conditioned
+    scale = max(curves['init_response'].sum(), 1.0)
+
+    def objective_value(spend):
+        return -hill_response(spend, beta, alpha, kappa).sum() / scale
+
+    def objective_grad(spend):
+        return -hill_marginal(spend, beta, alpha, kappa) / scale
+
+    if objective == 'max_response':
+        if not lower.sum() - 1e-9 <= budget <= upper.sum() + 1e-9:
+            raise ValueError(f"Budget {budget:,.2f} is outside the bounds total ({lower.sum():,.2f} to {upper.sum():,.2f})")
+        constraints = [{'type': 'eq', 'fun': lambda s: s.sum() - budget, 'jac': lambda s: np.ones_like(s)}]
+    elif objective == 'target_efficiency':
+        if target_roas is None:
+            raise ValueError("target_efficiency needs a target ROAS")
+        constraints = [
+            {'type': 'ineq', 'fun': lambda s: budget - s.sum(), 'jac': lambda s: -np.ones_like(s)},
+            {'type': 'ineq',
+             'fun': lambda s: (hill_response(s, beta, alpha, kappa).sum() - target_roas * s.sum()) / scale,
+             'jac': lambda s: (hill_marginal(s, beta, alpha, kappa) - target_roas) / scale}
+        ]
+    else:
+        raise ValueError(f"objective must be one of {', '.join(OBJECTIVES)}")
+
+    if x0 is None:
+        x0 = curves['init_spend'].to_numpy(float)
+        if objective == 'max_response':
+            x0 = x0 * budget / x0.sum()
+    x0 = np.clip(x0, lower, upper)
+
+    result = opt.minimize(objective_value, x0, jac=objective_grad, bounds=list(zip(lower, upper)),
+                          constraints=constraints, method='SLSQP', options={'maxiter': 500, 'ftol': 1e-12})
+    spend = np.clip(result.x, lower, upper)
+    response = hill_response(spend, beta, alpha, kappa)
+    return {
+        'channels': curves.index.tolist(),
+        'spend': spend.tolist(),
+        'response': response.tolist(),
+        'total_spend': float(spend.sum()),
+        'total_response': float(response.sum()),
+        'success': bool(result.success),
+        'message': str(result.message),
+        'iterations': int(result.nit)
+    }
+
+def curves_fingerprint(curves):
+    """Hash of the curve parameters: refreshed model outputs or calibrated curves get a new fingerprint"""
+    values = curves[CURVE_COLUMNS].to_numpy(dtype=np.float64)
+    digest = hashlib.blake2b(json.dumps(curves.index.tolist()).encode(), digest_size=8)
+    digest.update(values.tobytes())
+    return f"{curves.attrs.get('sol_id', '')}:{digest.hexdigest()}"
+
+def plan_key(model, objective, budget, target_roas, channels, low, up):
+    """Stable hash of a plan request; floats are rounded so equal plans from widgets hash equally"""
+    request = {
+        'model': model,
+        'objective': objective,
+        'budget': round(float(budget), 6),
+        'target_roas': None if target_roas is None else round(float(target_roas), 6),
+        'bounds': {channel: [round(float(l), 6), round(float(u), 6)] for channel, l, u in zip(channels, low, up)}
+    }
+    return hashlib.blake2b(json.dumps(request, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+class MemoStore:
+    """SQLite store of solved allocations, shared by every session and process"""
+
+    def __init__(self, path=MEMO_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with closing(self._connect()) as db, db:
+            # sol_id holds the curves fingerprint: the solution ID and a hash of the curve parameters
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS allocations (
+                    key TEXT PRIMARY KEY,
+                    sol_id TEXT NOT NULL,
+                    objective TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created REAL NOT NULL
+                )""")
+            db.execute("CREATE INDEX IF NOT EXISTS allocations_plan ON allocations (sol_id, objective, created)")
+
+    def _connect(self):
+        # Callers use `with closing(self._connect()) as db, db:` -- the connection's own
+        # context manager only commits or rolls back, closing() releases it
+        db = sqlite3.connect(self.path, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def get(self, key):
+        with closing(self._connect()) as db, db:
+            row = db.execute("SELECT result FROM allocations WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, model, objective, params, result):
+        with closing(self._connect()) as db, db:
+            db.execute("INSERT OR REPLACE INTO allocations VALUES (?, ?, ?, ?, ?, ?)",
+                       (key, model, objective, json.dumps(list(map(float, params))), json.dumps(result), time.time()))
+
+    def nearest(self, model, objective, params):
+        """Spend of the cached plan whose (budget, target, bounds) vector is closest, or None"""
+        with closing(self._connect()) as db, db:
+            rows = db.execute(
+                "SELECT params, result FROM allocations WHERE sol_id = ? AND objective = ? ORDER BY created DESC LIMIT ?",
+                (model, objective, WARM_START_CANDIDATES)).fetchall()
+        params = np.asarray(params, dtype=float)
+        candidates = [(np.asarray(json.loads(p)), r) for p, r in rows if len(json.loads(p)) == len(params)]
+        if not candidates:
+            return None
+        # Relative distance, so the budget and the bound multipliers weigh alike
+        scale = np.maximum(np.abs(params), 1e-9)
+        distances = [np.linalg.norm((vector - params) / scale) for vector, _ in candidates]
+        return np.asarray(json.loads(candidates[int(np.argmin(distances))][1])['spend'])
+
+    def clear(self):
+        with closing(self._connect()) as db, db:
+            db.execute("DELETE FROM allocations")
+
+def optimize(curves, budget, low, up, objective='max_response', target_roas=None, store=None):
+    """Solve a plan or return it from the memo store.
+
+    ``low`` and ``up`` are spend multipliers of each channel's initial spend.
+    The result carries ``cached`` (served from the store), ``warm_start``
+    (started from a cached neighbour) and ``solve_seconds``.
+    """
+    store = store or MemoStore()
+    model = curves_fingerprint(curves)
+    channels = curves.index.tolist()
+    low, up = np.asarray(low, dtype=float), np.asarray(up, dtype=float)
+    if objective == 'max_response':
+        target_roas = None
+    key = plan_key(model, objective, budget, target_roas, channels, low, up)
+
+    started = time.perf_counter()
+    cached = store.get(key)
+    if cached is not None:
+        return dict(cached, cached=True, solve_seconds=time.perf_counter() - started)
+
+    params = np.concatenate([[budget, target_roas or 0.0], low, up])
+    x0 = store.nearest(model, objective, params)
+    init_spend = curves['init_spend'].to_numpy(float)
+    result = solve_allocation(curves, budget, low * init_spend, up * init_spend, objective, target_roas, x0)
+    result['warm_start'] = x0 is not None
+    if result['success']:
+        store.put(key, model, objective, params, result)
+    return dict(result, cached=False, solve_seconds=time.perf_counter() - started)
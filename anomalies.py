@@ -0,0 +1,236 @@
+"""Streaming anomaly detection over metric series.
+
+Every series keeps a constant-size state: a robust location and scale
+(exponentially weighted, with residuals clipped before they update it so an
+outlier barely moves them), optional seasonal offsets (day of week for daily
+series), the last date processed and the run of consecutive anomalies. Each
+new point is scored against the state and then folded into it, so partitions
+are processed as they arrive without rescanning history. All series of a
+stream are updated together, one vectorized step per date.
+
+Positive series are compared on a log scale relative to their first value,
+so a drop to a fraction of the usual level scores the same for GMV as for
+ROAS; series that start at or below zero are compared linearly. A second
+anomaly in a row in the same direction is a level shift: the series restarts
+from the new level instead of flagging every later point.
+
+State and alerts are kept in SQLite (``.cache/anomalies.sqlite``, override
+with ``ANOMALY_STORE``), shared by every session and process.
+
+Usage:
+    python anomalies.py            # update from the data assets and print the alerts
+"""
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+STORE_PATH = os.environ.get(
+    'ANOMALY_STORE', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'anomalies.sqlite')
+)
+
+ALPHA = 0.2          # weight of a new point in the location and scale
+SEASON_ALPHA = 0.1   # weight of a new point in its seasonal offset
+THRESHOLD = 5.0      # |robust z| at or above which a point is an anomaly
+CLIP = 2.0           # residuals are clipped to this many scales before updating the state
+PRIOR_SCALE = 0.5    # scale of a new series (log units, or multiples of the first value)
+MIN_SCALE = 0.05
+LOG_FLOOR = 0.01     # log(value / first value + LOG_FLOOR) keeps zeros finite
+SHIFT_RUN = 2        # consecutive same-direction anomalies that make a level shift
+# Seasonal period per stream frequency
+SEASONS = {'D': 7}
+
+STATE_FIELDS = ['log', 'reference', 'location', 'scale', 'run']
+ALERT_COLUMNS = ['stream', 'series', 'date', 'value', 'expected', 'score', 'kind', 'created']
+
+def transform(values, log, reference):
+    """Values on the comparison scale of each series"""
+    relative = values / reference
+    return np.where(log, np.log(np.maximum(relative, 0) + LOG_FLOOR), relative)
+
+def untransform(values, log, reference):
+    return np.where(log, np.exp(values) - LOG_FLOOR, values) * reference
+
+def new_state(values, season):
+    """State of series whose first point is ``values``"""
+    n = len(values)
+    return {
+        'log': values > 0,
+        'reference': np.where(values != 0, np.abs(values), 1.0),
+        'location': np.zeros(n),
+        'scale': np.full(n, PRIOR_SCALE),
+        'run': np.zeros(n, dtype=np.int64),
+        'seasonal': np.zeros((n, season))
+    }
+
+def restart(state, mask, values):
+    """Restart the masked series at ``values`` (their first point or a level shift)"""
+    fresh = new_state(values[mask], state['seasonal'].shape[1])
+    for field, value in fresh.items():
+        state[field][mask] = value
+    state['location'][mask] = transform(values[mask], fresh['log'], fresh['reference'])
+
+def step(state, values, position):
+    """Score one date's values (NaN = no value) and fold them into the state.
+
+    Returns (robust z-score, expected value, anomaly kind) per series; the
+    kind is '' for normal points, 'spike' or 'shift'.
+    """
+    present = ~np.isnan(values)
+    y = transform(np.nan_to_num(values), state['log'], state['reference'])
+    seasonal = state['seasonal'][:, position]
+    expected = state['location'] + seasonal
+    score = np.where(present, (y - expected) / state['scale'], 0.0)
+    anomaly = np.abs(score) >= THRESHOLD
+
+    # Runs count consecutive anomalies, signed by direction
+    direction = np.sign(score).astype(np.int64)
+    same = np.sign(state['run']) == direction
+    run = np.where(anomaly, np.where(same, state['run'] + direction, direction), 0)
+    shift = anomaly & (np.abs(run) >= SHIFT_RUN)
+    kind = np.where(shift, 'shift', np.where(anomaly, 'spike', ''))
+    expected_value = untransform(expected, state['log'], state['reference'])
+
+    # Huber-style update: the clipped residual moves the location, seasonal offset and scale
+    residual = np.clip(y - expected, -CLIP * state['scale'], CLIP * state['scale'])
+    update = present & ~shift
+    state['location'] = np.where(update, state['location'] + ALPHA * residual, state['location'])
+    if state['seasonal'].shape[1] > 1:
+        # The seasonal offset takes a share of what the location did not absorb
+        state['seasonal'][:, position] = np.where(update, seasonal + SEASON_ALPHA * (1 - ALPHA) * residual, seasonal)
+    scale = np.maximum((1 - ALPHA) * state['scale'] + ALPHA * np.abs(residual), MIN_SCALE)
+    state['scale'] = np.where(update, scale, state['scale'])
+    state['run'] = np.where(present, np.where(shift, 0, run), state['run'])
+    if shift.any():
+        restart(state, shift, values)
+    return score, expected_value, kind
+
+def load_state(saved, columns, season):
+    """Stacked state, last processed date and known flag of each column from saved rows"""
+    n = len(columns)
+    state = new_state(np.zeros(n), season)
+    last = np.full(n, np.datetime64('1970-01-01', 'ns'))
+    known = np.zeros(n, dtype=bool)
+    for i, column in enumerate(columns):
+        if column not in saved:
+            continue
+        last_date, fields = saved[column]
+        for field in STATE_FIELDS:
+            state[field][i] = fields[field]
+        if len(fields['seasonal']) == season:
+            state['seasonal'][i] = fields['seasonal']
+        last[i] = np.datetime64(last_date, 'ns')
+        known[i] = True
+    return last, state, known
+
+class AnomalyStore:
+    """SQLite store of detector state per series and the alerts raised so far"""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with closing(self._connect()) as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS detector_state (
+                    stream TEXT NOT NULL,
+                    series TEXT NOT NULL,
+                    last_date TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    PRIMARY KEY (stream, series)
+                )""")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS alerts (
+                    stream TEXT NOT NULL,
+                    series TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    expected REAL NOT NULL,
+                    score REAL NOT NULL,
+                    kind TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (stream, series, date)
+                )""")
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def update(self, stream, df, columns, freq='MS'):
+        """Run new rows of a Date-sorted frame through the detector; returns the new alerts.
+
+        Only dates after the last one processed for a series are scored, so
+        each call costs O(new rows x series) however long the history is.
+        """
+        season = SEASONS.get(freq, 1)
+        dates = pd.to_datetime(df['Date'])
+        values = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        db = self._connect()
+        try:
+            # Serializes concurrent updates of the same store, so no point is scored twice
+            db.execute("BEGIN IMMEDIATE")
+            saved = {series: (last_date, json.loads(fields)) for series, last_date, fields in db.execute(
+                "SELECT series, last_date, state FROM detector_state WHERE stream = ?", (stream,))}
+            last, state, known = load_state(saved, columns, season)
+
+            alerts = []
+            for row, date in enumerate(dates):
+                new = ~np.isnan(values[row]) & (np.datetime64(date) > last)
+                current = np.where(new, values[row], np.nan)
+                # The first point of a series starts its state and is not scored
+                first = new & ~known
+                if first.any():
+                    restart(state, first, current)
+                    known |= first
+                    current[first] = np.nan
+                score, expected, kind = step(state, current, date.dayofweek % season)
+                last = np.where(new, np.datetime64(date), last)
+                for i in np.flatnonzero(kind != ''):
+                    alerts.append((stream, columns[i], date.strftime('%Y-%m-%d'), float(values[row, i]),
+                                   float(expected[i]), float(score[i]), str(kind[i]), time.time()))
+
+            db.executemany("INSERT OR REPLACE INTO alerts VALUES (?, ?, ?, ?, ?, ?, ?, ?)", alerts)
+            db.executemany("INSERT OR REPLACE INTO detector_state VALUES (?, ?, ?, ?)", [
+                (stream, column, pd.Timestamp(last[i]).strftime('%Y-%m-%d'), json.dumps(
+                    {**{field: state[field][i].item() for field in STATE_FIELDS},
+                     'seasonal': state['seasonal'][i].tolist()}))
+                for i, column in enumerate(columns) if known[i]
+            ])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+        return pd.DataFrame(alerts, columns=ALERT_COLUMNS)
+
+    def alerts(self, stream=None):
+        """Alerts raised so far, newest first"""
+        query = "SELECT * FROM alerts" + (" WHERE stream = ?" if stream else "") + " ORDER BY date DESC, stream, series"
+        with closing(self._connect()) as db:
+            rows = db.execute(query, (stream,) if stream else ()).fetchall()
+        alerts = pd.DataFrame(rows, columns=ALERT_COLUMNS)
+        alerts['date'] = pd.to_datetime(alerts['date'])
+        return alerts
+
+    def clear(self):
+        with closing(self._connect()) as db:
+            db.execute("DELETE FROM detector_state")
+            db.execute("DELETE FROM alerts")
+
+def main():
+    from utils import ANOMALY_STREAMS, update_anomalies
+
+    for name in ANOMALY_STREAMS:
+        new = update_anomalies(name)
+        print(f"{name}: {len(new)} new alert(s)")
+    alerts = AnomalyStore().alerts()
+    print(alerts.drop(columns='created').to_string(index=False) if len(alerts) else "No alerts")
+
+if __name__ == '__main__':
+    main()
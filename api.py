@@ -0,0 +1,223 @@
+"""Async HTTP API serving the dashboard aggregates.
+
+A plain ASGI application (no web framework) exposing the same rollups the
+pages chart, computed with the loaders in ``utils.py``. Responses are Arrow
+IPC streams when the client sends ``Accept: application/vnd.apache.arrow.stream``
+and column-oriented JSON otherwise, gzip compressed when the client accepts
+it. Every response carries a content-derived ETag so clients can revalidate
+with ``If-None-Match`` and get an empty 304.
+
+Run with any ASGI server, for example:
+    uvicorn api:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from urllib.parse import parse_qsl
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from cache_budget import clear_caches
+from utils import (
+    DATA_DIR,
+    KPI_COLUMNS,
+    asset_path,
+    load_merged_data,
+    load_channel_allocation,
+    load_monthly_revenue,
+    load_robyn_max_response,
+    load_robyn_target_efficiency,
+    compute_monthly_category_gmv,
+    compute_category_gmv,
+    compute_channel_spend,
+    compute_kpi_series,
+    compute_robyn_allocation
+)
+
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+JSON_MEDIA_TYPE = 'application/json'
+
+# How often (seconds) the asset files are checked for changes
+DATA_VERSION_TTL = 5.0
+# Maximum number of encoded responses kept in memory
+RESPONSE_CACHE_SIZE = 1024
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_BYTES = 512
+
+class BadRequest(ValueError):
+    """Raised by route handlers for invalid query parameters"""
+
+def date_param(params, name):
+    """A date query parameter as a Timestamp, or None when absent"""
+    if not params.get(name):
+        return None
+    try:
+        return pd.Timestamp(params[name])
+    except ValueError:
+        raise BadRequest(f"{name} must be a date (YYYY-MM-DD), got {params[name]!r}") from None
+
+def gmv_monthly(params):
+    return compute_monthly_category_gmv(load_merged_data())
+
+def gmv_categories(params):
+    return compute_category_gmv(load_merged_data(), params.get('month'))
+
+def channel_spend(params):
+    return compute_channel_spend(load_merged_data())
+
+def kpi_series(params):
+    kpis = params['kpi'].split(',') if params.get('kpi') else KPI_COLUMNS
+    unknown = [kpi for kpi in kpis if kpi not in KPI_COLUMNS]
+    if unknown:
+        raise BadRequest(f"Unknown KPI(s): {', '.join(unknown)}")
+    return compute_kpi_series(load_merged_data(), kpis)
+
+def optym_allocation(params):
+    start, end = date_param(params, 'start'), date_param(params, 'end')
+    if start is not None and end is not None and end < start:
+        raise BadRequest("end must not be before start")
+    allocation = load_channel_allocation('optimized', start, end)
+    return allocation.rename_axis('Channel').reset_index(name='Allocation')
+
+def robyn_allocation(params):
+    scenario = params.get('scenario', 'max_response')
+    if scenario == 'max_response':
+        return compute_robyn_allocation(load_robyn_max_response())
+    if scenario == 'target_efficiency':
+        return compute_robyn_allocation(load_robyn_target_efficiency())
+    raise BadRequest("scenario must be 'max_response' or 'target_efficiency'")
+
+def monthly_revenue(params):
+    return load_monthly_revenue()[['month', 'baseline', 'optimized', 'improvement']]
+
+ROUTES = {
+    '/gmv/monthly': gmv_monthly,
+    '/gmv/categories': gmv_categories,
+    '/spend/channels': channel_spend,
+    '/kpis': kpi_series,
+    '/allocations/optym': optym_allocation,
+    '/allocations/robyn': robyn_allocation,
+    '/revenue/monthly': monthly_revenue
+}
+
+_response_cache = {}
+_data_version = {'value': None, 'checked': 0.0}
+
+def data_version():
+    """Fingerprint of the asset files; loader caches are cleared when it changes"""
+    now = time.monotonic()
+    if _data_version['value'] is None or now - _data_version['checked'] > DATA_VERSION_TTL:
+        stats = []
+        for name in sorted(os.listdir(DATA_DIR)):
+            stat = os.stat(asset_path(name))
+            stats.append(f'{name}:{stat.st_size}:{stat.st_mtime_ns}')
+        version = hashlib.blake2b('|'.join(stats).encode(), digest_size=6).hexdigest()
+        if _data_version['value'] is not None and version != _data_version['value']:
+            st.cache_data.clear()
+            clear_caches()
+            _response_cache.clear()
+        _data_version['value'] = version
+        _data_version['checked'] = now
+    return _data_version['value']
+
+def encode_frame(df, media_type):
+    """Serialize a DataFrame as an Arrow IPC stream or column-oriented JSON"""
+    if media_type == ARROW_MEDIA_TYPE:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    return df.to_json(orient='split', index=False, date_format='iso').encode()
+
+def build_response(path, params, media_type, use_gzip):
+    """Return (etag, headers, body) for a route, encoding it once per data version"""
+    version = data_version()
+    key = (version, path, tuple(sorted(params.items())), media_type, use_gzip)
+    cached = _response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    body = encode_frame(ROUTES[path](params), media_type)
+    headers = [
+        (b'content-type', media_type.encode()),
+        (b'cache-control', b'no-cache'),
+        (b'vary', b'accept, accept-encoding')
+    ]
+    if use_gzip and len(body) >= GZIP_MIN_BYTES:
+        # mtime=0 keeps the compressed bytes, and therefore the ETag, deterministic
+        body = gzip.compress(body, compresslevel=6, mtime=0)
+        headers.append((b'content-encoding', b'gzip'))
+    etag = f'"{version}-{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+    headers.append((b'etag', etag.encode()))
+
+    if len(_response_cache) >= RESPONSE_CACHE_SIZE:
+        _response_cache.clear()
+    _response_cache[key] = (etag, headers, body)
+    return etag, headers, body
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+async def send_response(send, status, headers, body=b'', head=False):
+    headers = headers + [(b'content-length', str(len(body)).encode())]
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b'' if head else body})
+
+async def send_json(send, status, payload):
+    await send_response(send, status, [(b'content-type', JSON_MEDIA_TYPE.encode())], json.dumps(payload).encode())
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                data_version()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+
+    path = scope['path'].rstrip('/') or '/'
+    if scope['method'] not in ('GET', 'HEAD'):
+        await send_json(send, 405, {'error': 'Method not allowed'})
+        return
+    if path == '/health':
+        await send_json(send, 200, {'status': 'ok', 'data_version': await asyncio.to_thread(data_version)})
+        return
+    if path not in ROUTES:
+        await send_json(send, 404, {'error': f'Unknown route {path}', 'routes': sorted(ROUTES)})
+        return
+
+    request_headers = {name.decode().lower(): value.decode() for name, value in scope['headers']}
+    params = dict(parse_qsl(scope['query_string'].decode()))
+    media_type = ARROW_MEDIA_TYPE if ARROW_MEDIA_TYPE in request_headers.get('accept', '') else JSON_MEDIA_TYPE
+    use_gzip = 'gzip' in request_headers.get('accept-encoding', '')
+
+    try:
+        # Handlers are blocking pandas code; run them off the event loop
+        etag, headers, body = await asyncio.to_thread(build_response, path, params, media_type, use_gzip)
+    except BadRequest as e:
+        await send_json(send, 400, {'error': str(e)})
+        return
+
+    if etag_matches(request_headers.get('if-none-match'), etag):
+        await send_response(send, 304, [(b'etag', etag.encode())])
+        return
+    await send_response(send, 200, headers, body, head=scope['method'] == 'HEAD')
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run('api:app', host='0.0.0.0', port=int(os.environ.get('PORT', 8000)), log_level='warning')
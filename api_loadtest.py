@@ -0,0 +1,128 @@
+"""Local load test for the aggregates API.
+
+Opens many keep-alive HTTP/1.1 connections with asyncio and hammers the API
+routes for a fixed duration, then prints throughput and latency percentiles.
+Without ``--url`` it starts ``uvicorn api:app`` on a free local port first.
+
+Usage:
+    python api_loadtest.py --connections 64 --duration 15 --conditional
+"""
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from api import ARROW_MEDIA_TYPE, JSON_MEDIA_TYPE, ROUTES
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, headers, body)"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers, body
+
+async def run_connection(host, port, paths, accept, conditional, deadline, stats, offset):
+    """Issue requests back to back on one connection until the deadline"""
+    reader, writer = await asyncio.open_connection(host, port)
+    etags = {}
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            request = (f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: {accept}\r\n'
+                       f'Accept-Encoding: gzip\r\n')
+            if conditional and path in etags:
+                request += f'If-None-Match: {etags[path]}\r\n'
+            writer.write((request + '\r\n').encode())
+
+            started = time.perf_counter()
+            status, headers, body = await read_response(reader)
+            stats['latencies'].append(time.perf_counter() - started)
+            stats['status'][status] = stats['status'].get(status, 0) + 1
+            stats['bytes'] += len(body)
+            if 'etag' in headers:
+                etags[path] = headers['etag']
+    finally:
+        writer.close()
+
+async def run_load(url, paths, connections, duration, accept, conditional):
+    parts = urlsplit(url)
+    stats = {'latencies': [], 'status': {}, 'bytes': 0}
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        run_connection(parts.hostname, parts.port or 80, paths, accept, conditional, deadline, stats, i)
+        for i in range(connections)
+    ])
+    stats['elapsed'] = time.perf_counter() - started
+    return stats
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(port):
+    """Start uvicorn serving api:app and wait until it accepts connections"""
+    server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'api:app', '--port', str(port), '--log-level', 'warning'])
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError('API server did not start')
+
+def print_report(stats, connections):
+    latencies = np.array(stats['latencies']) * 1000
+    requests = len(latencies)
+    print(f"Connections:  {connections}")
+    print(f"Requests:     {requests} in {stats['elapsed']:.1f}s ({requests / stats['elapsed']:,.0f} req/s)")
+    print(f"Status codes: {stats['status']}")
+    print(f"Body bytes:   {stats['bytes']:,} ({stats['bytes'] / max(requests, 1):,.0f} per request)")
+    if requests:
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        print(f"Latency ms:   p50 {p50:.2f}  p90 {p90:.2f}  p99 {p99:.2f}  max {latencies.max():.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the aggregates API')
+    parser.add_argument('--url', help='Base URL of a running API (default: start one locally)')
+    parser.add_argument('--path', action='append', help='Route to request (repeatable, default: every route)')
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run')
+    parser.add_argument('--arrow', action='store_true', help='Request Arrow IPC instead of JSON')
+    parser.add_argument('--conditional', action='store_true', help='Revalidate with If-None-Match after the first response')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        server = start_server(port)
+        url = f'http://127.0.0.1:{port}'
+
+    try:
+        accept = ARROW_MEDIA_TYPE if args.arrow else JSON_MEDIA_TYPE
+        stats = asyncio.run(run_load(url, args.path or sorted(ROUTES), args.connections,
+                                     args.duration, accept, args.conditional))
+        print_report(stats, args.connections)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,6 @@
 import streamlit as st
+from cache_budget import budget_summary, cache_metrics, session_metrics
+from utils import load_validation_report
 
 # Set page configuration
 st.set_page_config(
@@ -9,4 +11,32 @@ st.set_page_config(
 )
 
 # Page title
-st.title("WELCOME")
\ No newline at end of file
+st.title("WELCOME")
+
+# Data assets are checked against their schema contracts once, when first loaded
+report = load_validation_report()
+quarantined = report[report['Status'] != 'ok']
+
+if not quarantined.empty:
+    st.warning(
+        f"{len(quarantined)} data asset(s) had rows quarantined during validation: "
+        f"{', '.join(quarantined['Asset'])}. Charts use the remaining rows."
+    )
+
+with st.expander("Data validation report"):
+    st.dataframe(report, hide_index=True, use_container_width=True)
+
+# Memory held by the governed caches, against the process and per-session budgets
+with st.expander("Cache memory"):
+    budget = budget_summary()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Cached data", f"{budget['held_mb']:,.1f} MB", help=f"Process budget: {budget['budget_mb']:,.0f} MB")
+    col2.metric("Active sessions", budget['sessions'], help=f"Per-session budget: {budget['session_budget_mb']:,.0f} MB")
+    metrics = cache_metrics()
+    lookups = metrics['Hits'].sum() + metrics['Misses'].sum()
+    col3.metric("Hit rate", f"{metrics['Hits'].sum() / lookups:.0%}" if lookups else "–")
+    
+    st.dataframe(metrics.style.format({'MB': '{:.2f}', 'Cap MB': '{:.0f}', 'Hit Rate': '{:.0%}'}, na_rep='–'),
+                 hide_index=True, use_container_width=True)
+    st.dataframe(session_metrics().style.format({'MB': '{:.2f}', 'Exclusive MB': '{:.2f}', 'Idle s': '{:.0f}'}),
+                 hide_index=True, use_container_width=True)
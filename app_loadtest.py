@@ -0,0 +1,346 @@
+"""Concurrent-session load test for the Streamlit dashboard.
+
+Drives N headless sessions over Streamlit's own websocket protocol, as
+browsers would: each session opens ``app.py``, visits every page and
+changes widgets (the category multiselect, the product selectbox, the
+granularity), then waits for the rerun to finish. Each rerun is timed from
+the request to the server's script-finished message. While the sessions
+run, the server's CPU and RSS (including worker processes) are sampled from
+``/proc``.
+
+With several ``--sessions`` levels the levels are run one after another,
+and the capacity is the largest level whose p90 rerun latency stays within
+``--slo``. Every run is appended to a JSON Lines history, so capacity can be
+tracked across commits.
+
+Without ``--url`` it starts ``streamlit run app.py`` on a free local port first.
+
+Usage:
+    python app_loadtest.py --sessions 1 5 10 20 --rounds 3 --slo 2.0
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+try:
+    import websockets
+except ImportError:
+    raise SystemExit("app_loadtest.py needs the 'websockets' package (uv sync --group dev, or pip install websockets)") from None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+HISTORY_PATH = os.path.join(ROOT, '.cache', 'app_loadtest.jsonl')
+# Widgets changed on every page they appear on, by label
+INTERACTIONS = ['Select Product Categories for GMV Chart', 'Select Product Category', 'Granularity']
+WIDGET_TYPES = ['multiselect', 'selectbox', 'radio']
+# script_finished status of a run that was interrupted by a newer rerun request
+FINISHED_EARLY_FOR_RERUN = ForwardMsg.ScriptFinishedStatus.Value('FINISHED_EARLY_FOR_RERUN')
+
+def widget_state(widget, values):
+    """WidgetState proto setting a select widget to option values"""
+    state = WidgetState()
+    state.id = widget.id
+    # Newer Streamlit versions exchange select values as strings, older ones as option indices
+    by_value = 'raw_value' in widget.DESCRIPTOR.fields_by_name or 'raw_values' in widget.DESCRIPTOR.fields_by_name
+    indices = [list(widget.options).index(value) for value in values]
+    if widget.DESCRIPTOR.name == 'MultiSelect':
+        if by_value:
+            state.string_array_value.data.extend(values)
+        else:
+            state.int_array_value.data.extend(indices)
+    elif by_value:
+        state.string_value = values[0]
+    else:
+        state.int_value = indices[0]
+    return state
+
+class Session:
+    """One websocket session against the app, with per-rerun timings"""
+
+    def __init__(self, url, rng):
+        self.url = url
+        self.rng = rng
+        self.pages = {}
+        self.widgets = {}
+        self.reruns = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.exceptions = 0
+
+    async def __aenter__(self):
+        self.socket = await websockets.connect(self.url, subprotocols=['streamlit'], max_size=None, compression=None)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.socket.close()
+
+    async def rerun(self, page, page_hash='', widget=None, fragment_id=''):
+        """Request a rerun and read messages until the script finishes; returns the latency"""
+        message = BackMsg()
+        message.rerun_script.page_script_hash = page_hash
+        message.rerun_script.fragment_id = fragment_id
+        if widget is not None:
+            message.rerun_script.widget_states.widgets.append(widget)
+        payload = message.SerializeToString()
+
+        started = time.perf_counter()
+        await self.socket.send(payload)
+        self.bytes_out += len(payload)
+        rerun_bytes = 0
+        self.widgets = {} if widget is None else self.widgets
+        while True:
+            data = await self.socket.recv()
+            rerun_bytes += len(data)
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            kind = msg.WhichOneof('type')
+            if kind == 'new_session':
+                self.pages = {page.page_name: page.page_script_hash for page in msg.new_session.app_pages}
+            elif kind == 'navigation':
+                self.pages = {page.page_name: page.page_script_hash for page in msg.navigation.app_pages}
+            elif kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                self.record_element(msg.delta.new_element, msg.delta.fragment_id)
+            elif kind == 'script_finished' and msg.script_finished != FINISHED_EARLY_FOR_RERUN:
+                break
+        latency = time.perf_counter() - started
+        self.bytes_in += rerun_bytes
+        self.reruns.append({'page': page, 'interaction': widget is not None, 'latency': latency, 'bytes': rerun_bytes})
+        return latency
+
+    def record_element(self, element, fragment_id):
+        kind = element.WhichOneof('type')
+        if kind == 'exception':
+            self.exceptions += 1
+        elif kind in WIDGET_TYPES:
+            widget = getattr(element, kind)
+            if widget.label in INTERACTIONS:
+                self.widgets[widget.label] = (widget, fragment_id)
+
+    async def interact(self, page, page_hash):
+        """Change each known widget on the page to a random other value"""
+        for label in INTERACTIONS:
+            if label not in self.widgets:
+                continue
+            widget, fragment_id = self.widgets[label]
+            options = list(widget.options)
+            if widget.DESCRIPTOR.name == 'MultiSelect':
+                values = self.rng.sample(options, self.rng.randint(1, len(options)))
+            else:
+                values = [self.rng.choice(options)]
+            await self.rerun(page, page_hash, widget_state(widget, values), fragment_id)
+
+async def run_session(url, rounds, seed, deadline):
+    """Open the app, then visit every page and change its widgets, for a number of rounds"""
+    async with Session(url, random.Random(seed)) as session:
+        await session.rerun('app')
+        pages = dict(session.pages)
+        for _ in range(rounds):
+            for name, page_hash in pages.items():
+                if time.perf_counter() > deadline:
+                    return session
+                await session.rerun(name, page_hash)
+                await session.interact(name, page_hash)
+        return session
+
+def process_tree(pid):
+    """The pid and all its descendants"""
+    pids, queue = [], [pid]
+    while queue:
+        current = queue.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as f:
+                    queue.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+def sample_process(pids):
+    """(CPU seconds, RSS bytes) summed over processes"""
+    ticks, rss = 0, 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            ticks += int(fields[11]) + int(fields[12])
+            with open(f'/proc/{pid}/statm') as f:
+                rss += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            continue
+    return ticks / os.sysconf('SC_CLK_TCK'), rss
+
+async def monitor(pid, interval, samples, stop):
+    """Sample the server's CPU share and RSS until stopped"""
+    last_cpu, last_time = sample_process(process_tree(pid))[0], time.perf_counter()
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        cpu, rss = sample_process(process_tree(pid))
+        now = time.perf_counter()
+        samples.append({'cpu': (cpu - last_cpu) / (now - last_time), 'rss': rss})
+        last_cpu, last_time = cpu, now
+
+async def run_level(url, sessions, rounds, duration, pid):
+    samples, stop = [], asyncio.Event()
+    watcher = asyncio.create_task(monitor(pid, 0.5, samples, stop)) if pid else None
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        run_session(url, rounds, seed, started + duration) for seed in range(sessions)
+    ], return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    if watcher:
+        stop.set()
+        await watcher
+    return summarize(sessions, results, samples, elapsed)
+
+def percentiles(latencies):
+    if not len(latencies):
+        return {}
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {'p50': p50, 'p90': p90, 'p99': p99, 'max': float(np.max(latencies))}
+
+def summarize(sessions, results, samples, elapsed):
+    """Rerun latency percentiles overall and per page, bytes and server usage of one level"""
+    finished = [result for result in results if isinstance(result, Session)]
+    reruns = [rerun for session in finished for rerun in session.reruns]
+    latencies = np.array([rerun['latency'] for rerun in reruns])
+    pages = {}
+    for name in dict.fromkeys(rerun['page'] for rerun in reruns):
+        page_reruns = [rerun for rerun in reruns if rerun['page'] == name]
+        pages[name] = {
+            'reruns': len(page_reruns),
+            'latency': percentiles([rerun['latency'] for rerun in page_reruns]),
+            'bytes_per_rerun': float(np.mean([rerun['bytes'] for rerun in page_reruns]))
+        }
+    return {
+        'sessions': sessions,
+        'failed_sessions': len(results) - len(finished),
+        'errors': [repr(result) for result in results if not isinstance(result, Session)][:5],
+        'script_exceptions': sum(session.exceptions for session in finished),
+        'reruns': len(reruns),
+        'elapsed': elapsed,
+        'reruns_per_second': len(reruns) / elapsed,
+        'latency': percentiles(latencies),
+        'interaction_latency': percentiles([rerun['latency'] for rerun in reruns if rerun['interaction']]),
+        'websocket_bytes_in': sum(session.bytes_in for session in finished),
+        'websocket_bytes_out': sum(session.bytes_out for session in finished),
+        'cpu_mean': float(np.mean([s['cpu'] for s in samples])) if samples else None,
+        'cpu_max': float(np.max([s['cpu'] for s in samples])) if samples else None,
+        'rss_peak': max((s['rss'] for s in samples), default=None),
+        'pages': pages
+    }
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(port):
+    """Start ``streamlit run app.py`` headless and wait until it reports healthy"""
+    server = subprocess.Popen([
+        sys.executable, '-m', 'streamlit', 'run', os.path.join(ROOT, 'app.py'), '--server.headless', 'true',
+        '--server.port', str(port), '--browser.gatherUsageStats', 'false', '--logger.level', 'warning'
+    ], cwd=ROOT)
+    for _ in range(300):
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('Streamlit server did not start')
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_report(report):
+    print(f"{'sessions':>9}{'reruns':>8}{'rr/s':>7}{'p50 s':>8}{'p90 s':>8}{'p99 s':>8}{'MB in':>9}"
+          f"{'CPU %':>8}{'RSS MB':>9}{'failed':>8}")
+    for level in report['levels']:
+        latency = level['latency']
+        cpu = f"{level['cpu_mean'] * 100:.0f}" if level['cpu_mean'] is not None else '-'
+        rss = f"{level['rss_peak'] / 1024 ** 2:.0f}" if level['rss_peak'] is not None else '-'
+        print(f"{level['sessions']:>9}{level['reruns']:>8}{level['reruns_per_second']:>7.1f}"
+              f"{latency.get('p50', np.nan):>8.2f}{latency.get('p90', np.nan):>8.2f}{latency.get('p99', np.nan):>8.2f}"
+              f"{level['websocket_bytes_in'] / 1024 ** 2:>9.1f}{cpu:>8}{rss:>9}{level['failed_sessions']:>8}")
+        for error in level['errors']:
+            print(f"    {error}")
+
+    last = report['levels'][-1]
+    print(f"\nPer page at {last['sessions']} session(s):")
+    for name, page in last['pages'].items():
+        print(f"  {name:<28}{page['reruns']:>6} reruns  p90 {page['latency'].get('p90', np.nan):6.2f}s  "
+              f"{page['bytes_per_rerun'] / 1024:8.1f} KB/rerun")
+    capacity = report['capacity_sessions']
+    print(f"\nCapacity: {capacity if capacity else 'below the lowest level'} session(s) "
+          f"with p90 rerun latency within {report['slo']:g}s")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the dashboard with concurrent headless sessions')
+    parser.add_argument('--url', help='Base URL of a running app (default: start one locally)')
+    parser.add_argument('--pid', type=int, help='Server process to sample CPU and RSS from when using --url')
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 5, 10], help='Concurrent session levels')
+    parser.add_argument('--rounds', type=int, default=2, help='Visits of every page per session')
+    parser.add_argument('--duration', type=float, default=300.0, help='Longest time per level, in seconds')
+    parser.add_argument('--slo', type=float, default=2.0, help='p90 rerun latency target, in seconds')
+    parser.add_argument('--history', default=HISTORY_PATH, help='JSON Lines file the report is appended to')
+    args = parser.parse_args()
+
+    server, pid, url = None, args.pid, args.url
+    if url is None:
+        port = free_port()
+        server = start_server(port)
+        pid, url = server.pid, f'http://127.0.0.1:{port}'
+    stream_url = url.replace('http', 'ws', 1).rstrip('/') + '/_stcore/stream'
+
+    try:
+        levels = [asyncio.run(run_level(stream_url, sessions, args.rounds, args.duration, pid))
+                  for sessions in args.sessions]
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    # Capacity is the last level before the first one that misses the target
+    capacity = None
+    for level in sorted(levels, key=lambda level: level['sessions']):
+        if not level['latency'] or level['latency']['p90'] > args.slo or level['failed_sessions']:
+            break
+        capacity = level['sessions']
+    report = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'slo': args.slo,
+        'rounds': args.rounds,
+        'capacity_sessions': capacity,
+        'levels': levels
+    }
+    print_report(report)
+
+    os.makedirs(os.path.dirname(args.history) or '.', exist_ok=True)
+    with open(args.history, 'a') as f:
+        f.write(json.dumps(report) + '\n')
+    print(f"Report appended to {args.history}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Rolling-origin backtest of recommended budget allocations.
+
+A model's recommendation is replayed as per-channel spend multipliers on the
+spend actually made. For each origin, a response model (ridge regression of
+log GMV on log adstocked channel spend) is fitted on the months before it
+only, and then evaluates the held-out months that follow: the lift of the
+recommended spend over the actual spend in those months is the realized lift
+for that fold, to be set against the lift the model itself predicted. How
+well the response model forecasts the held-out GMV under the actual spend is
+reported alongside, as the yardstick of how far the realized lifts can be
+trusted.
+
+Folds are independent and each runs in its own worker process.
+
+Usage:
+    python backtest.py            # backtest Optym and Robyn on the dashboard data
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from transforms import geometric_adstock
+
+ADSTOCK_DECAY = 0.3
+RIDGE_PENALTY = 1.0
+MIN_TRAIN = 6
+HORIZON = 1
+FOLD_COLUMNS = ['Model', 'Origin', 'Month', 'Predicted Lift', 'Realized Lift', 'GMV Error']
+
+def features(spend, scale):
+    """log1p of adstocked spend (periods, channels), in units of each channel's training mean"""
+    adstocked = geometric_adstock(spend.T, ADSTOCK_DECAY)[0].T
+    return np.log1p(adstocked / scale)
+
+def ridge(X, y):
+    """Ridge coefficients (intercept first) on standardized features"""
+    center, spread = X.mean(axis=0), X.std(axis=0)
+    spread[spread == 0] = 1
+    Z = (X - center) / spread
+    beta = np.linalg.solve(Z.T @ Z + RIDGE_PENALTY * np.eye(Z.shape[1]), Z.T @ (y - y.mean()))
+    return lambda X_new: y.mean() + ((X_new - center) / spread) @ beta
+
+def run_fold(spend, gmv, usable, origin, horizon, plans):
+    """Fit on usable months before ``origin`` and replay every plan on the held-out months"""
+    train = np.flatnonzero(usable[:origin])
+    scale = spend[train].mean(axis=0)
+    scale[scale == 0] = 1
+    predict = ridge(features(spend, scale)[train], np.log(gmv[train]))
+
+    rows = []
+    held_out = [month for month in range(origin, min(origin + horizon, len(gmv))) if usable[month]]
+    for month in held_out:
+        actual = predict(features(spend[:month + 1], scale)[month])
+        gmv_error = np.exp(actual) / gmv[month] - 1
+        for name, (multipliers, predicted_lift) in plans.items():
+            # The recommendation applies to this month; earlier months keep their actual spend
+            replayed = spend[:month + 1].copy()
+            replayed[month] *= multipliers
+            lift = np.exp(predict(features(replayed, scale)[month]) - actual) - 1
+            rows.append([name, origin, month, predicted_lift, lift, gmv_error])
+    return rows
+
+def rolling_origin_backtest(spend, gmv, plans, usable=None, min_train=MIN_TRAIN, horizon=HORIZON, workers=None):
+    """Backtest plans on a (periods, channels) spend matrix and GMV series.
+
+    ``plans`` maps a model name to (channel spend multipliers, predicted
+    lift); ``usable`` masks periods to leave out of fitting and scoring
+    (their spend still carries over). Returns one row per (model, held-out
+    month) with month and origin as period positions.
+    """
+    spend = np.asarray(spend, dtype=np.float64)
+    gmv = np.asarray(gmv, dtype=np.float64)
+    usable = np.ones(len(gmv), dtype=bool) if usable is None else np.asarray(usable, dtype=bool)
+    origins = [origin for origin in range(min_train, len(gmv)) if usable[:origin].sum() >= min_train]
+    if not origins:
+        return pd.DataFrame(columns=FOLD_COLUMNS)
+
+    workers = min(workers or os.cpu_count() or 1, len(origins))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_fold, spend, gmv, usable, origin, horizon, plans) for origin in origins]
+            rows = [row for future in futures for row in future.result()]
+    else:
+        rows = [row for origin in origins for row in run_fold(spend, gmv, usable, origin, horizon, plans)]
+    return pd.DataFrame(rows, columns=FOLD_COLUMNS)
+
+def summarize(folds):
+    """Predicted vs realized lift (percent) per model with error metrics over the folds"""
+    grouped = folds.assign(Error=folds['Realized Lift'] - folds['Predicted Lift']).groupby('Model', sort=False)
+    summary = pd.DataFrame({
+        'Predicted Lift': grouped['Predicted Lift'].first() * 100,
+        'Realized Lift': grouped['Realized Lift'].mean() * 100,
+        'Realized Std': grouped['Realized Lift'].std(ddof=0) * 100,
+        'Lift MAE': grouped['Error'].apply(lambda error: error.abs().mean()) * 100,
+        'Lift Bias': grouped['Error'].mean() * 100,
+        'GMV MAPE': grouped['GMV Error'].apply(lambda error: error.abs().mean()) * 100,
+        'Folds': grouped['Origin'].nunique()
+    })
+    return summary.reset_index()
+
+if __name__ == '__main__':
+    from utils import load_backtest
+
+    folds, summary = load_backtest()
+    print(folds.to_string(index=False, float_format=lambda v: f'{v:.3f}'))
+    print()
+    print(summary.to_string(index=False, float_format=lambda v: f'{v:.2f}'))
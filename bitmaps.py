@@ -0,0 +1,192 @@
+"""Compressed bitmap indexes for cross-filtering.
+
+Rows of a fact table are indexed per dimension value with roaring-style
+bitmaps: row positions are split into chunks of 65,536 rows, and each chunk
+is held as a sorted ``uint16`` array while it has at most 4,096 rows set, or
+as a 1,024-word ``uint64`` bitset once it is denser. Selecting several
+values of a dimension ORs their bitmaps; combining filters on different
+dimensions ANDs them, chunk by chunk, so a filter costs in proportion to the
+compressed size of the bitmaps rather than to the number of rows.
+Aggregates are then reduced over the selected rows only, with ``bincount``
+over the group codes.
+
+Usage:
+    python bitmaps.py            # time filter + aggregate on a 5M-row table against pandas
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+WORDS = CHUNK_SIZE // 64
+# Containers with more rows than this are stored as bitsets
+ARRAY_MAX = 4096
+
+def is_bitset(container):
+    return container.dtype == np.uint64
+
+def to_bitset(container):
+    if is_bitset(container):
+        return container
+    bits = np.zeros(CHUNK_SIZE, dtype=bool)
+    bits[container] = True
+    return np.packbits(bits, bitorder='little').view(np.uint64)
+
+def to_array(container):
+    if not is_bitset(container):
+        return container
+    return np.flatnonzero(np.unpackbits(container.view(np.uint8), bitorder='little')).astype(np.uint16)
+
+def cardinality(container):
+    return int(np.bitwise_count(container).sum()) if is_bitset(container) else len(container)
+
+def optimize(container):
+    """The smaller representation of a container; None when it is empty"""
+    size = cardinality(container)
+    if size == 0:
+        return None
+    if is_bitset(container) and size <= ARRAY_MAX:
+        return to_array(container)
+    if not is_bitset(container) and size > ARRAY_MAX:
+        return to_bitset(container)
+    return container
+
+def intersect(a, b):
+    if is_bitset(a) and is_bitset(b):
+        return optimize(a & b)
+    if is_bitset(a):
+        a, b = b, a
+    if is_bitset(b):
+        # Keep the array's rows whose bit is set
+        words = b[a >> 6]
+        return optimize(a[(words >> (a & 63).astype(np.uint64)) & np.uint64(1) == 1])
+    return optimize(np.intersect1d(a, b, assume_unique=True))
+
+def union(a, b):
+    if not is_bitset(a) and not is_bitset(b) and len(a) + len(b) <= ARRAY_MAX:
+        return np.union1d(a, b)
+    return optimize(to_bitset(a) | to_bitset(b))
+
+class Bitmap:
+    """Set of row positions as chunk key -> container"""
+
+    def __init__(self, chunks=None):
+        self.chunks = chunks or {}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Bitmap of sorted row positions"""
+        rows = np.asarray(rows, dtype=np.int64)
+        keys = rows >> CHUNK_BITS
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+        chunks = {}
+        for part in np.split(rows, bounds):
+            if len(part):
+                chunks[int(part[0] >> CHUNK_BITS)] = optimize((part & (CHUNK_SIZE - 1)).astype(np.uint16))
+        return cls(chunks)
+
+    def __and__(self, other):
+        chunks = {}
+        for key in self.chunks.keys() & other.chunks.keys():
+            container = intersect(self.chunks[key], other.chunks[key])
+            if container is not None:
+                chunks[key] = container
+        return Bitmap(chunks)
+
+    def __or__(self, other):
+        chunks = dict(self.chunks)
+        for key, container in other.chunks.items():
+            chunks[key] = union(chunks[key], container) if key in chunks else container
+        return Bitmap(chunks)
+
+    def __len__(self):
+        return sum(cardinality(container) for container in self.chunks.values())
+
+    def nbytes(self):
+        return sum(container.nbytes for container in self.chunks.values())
+
+    def rows(self):
+        """Sorted row positions"""
+        if not self.chunks:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([(key << CHUNK_BITS) + to_array(self.chunks[key]).astype(np.int64)
+                               for key in sorted(self.chunks)])
+
+class BitmapIndex:
+    """Bitmaps per value of each dimension of a fact table, with its measures"""
+
+    def __init__(self, df, dimensions, measures):
+        self.n_rows = len(df)
+        self.codes, self.values, self.bitmaps = {}, {}, {}
+        for dimension in dimensions:
+            codes, values = pd.factorize(df[dimension], sort=True)
+            self.codes[dimension] = codes
+            self.values[dimension] = values
+            # Stable sort groups each value's rows, already in row order
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(1, len(values)))
+            self.bitmaps[dimension] = {value: Bitmap.from_rows(rows)
+                                       for value, rows in zip(values, np.split(order, bounds))}
+        self.measures = {measure: df[measure].to_numpy(dtype=np.float64) for measure in measures}
+
+    def select(self, filters):
+        """Bitmap of rows matching every filter (dimension -> values), or None when nothing is filtered"""
+        selection = None
+        for dimension, values in filters.items():
+            if values is None:
+                continue
+            bitmap = Bitmap()
+            for value in values:
+                if value in self.bitmaps[dimension]:
+                    bitmap = bitmap | self.bitmaps[dimension][value]
+            selection = bitmap if selection is None else selection & bitmap
+        return selection
+
+    def aggregate(self, by, filters=None):
+        """Sum of every measure per combination of the ``by`` dimensions over the filtered rows"""
+        selection = self.select(filters or {})
+        rows = None if selection is None else selection.rows()
+        sizes = [len(self.values[dimension]) for dimension in by]
+        group = np.zeros(self.n_rows if rows is None else len(rows), dtype=np.int64)
+        for dimension, size in zip(by, sizes):
+            codes = self.codes[dimension] if rows is None else self.codes[dimension][rows]
+            group = group * size + codes
+        n_groups = int(np.prod(sizes))
+
+        totals = {measure: np.bincount(group, weights=values if rows is None else values[rows], minlength=n_groups)
+                  for measure, values in self.measures.items()}
+        counts = np.bincount(group, minlength=n_groups)
+        index = pd.MultiIndex.from_product([self.values[dimension] for dimension in by], names=by)
+        result = pd.DataFrame(totals, index=index)[counts > 0]
+        return result.droplevel(list(range(1, len(by)))) if len(by) == 1 else result
+
+def main():
+    n_rows = 5_000_000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'YearMonth': rng.choice(pd.period_range('2023-07', '2024-06', freq='M').strftime('%Y-%m'), n_rows),
+        'Category': rng.choice(['Camera', 'CameraAccessory', 'EntertainmentSmall', 'GameCDDVD', 'GamingHardware'], n_rows),
+        'GMV': rng.gamma(2.0, 1000.0, n_rows)
+    })
+
+    started = time.perf_counter()
+    index = BitmapIndex(df, ['YearMonth', 'Category'], ['GMV'])
+    print(f"Index of {n_rows:,} rows built in {time.perf_counter() - started:.2f}s")
+
+    filters = {'YearMonth': ['2023-10', '2023-11', '2024-03'], 'Category': ['Camera', 'GameCDDVD']}
+    started = time.perf_counter()
+    result = index.aggregate(['YearMonth'], filters)
+    bitmap_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    mask = df['YearMonth'].isin(filters['YearMonth']) & df['Category'].isin(filters['Category'])
+    expected = df[mask].groupby('YearMonth')['GMV'].sum()
+    pandas_seconds = time.perf_counter() - started
+
+    assert np.allclose(result['GMV'].to_numpy(), expected.to_numpy())
+    print(f"Filter + aggregate: bitmaps {bitmap_seconds * 1000:.0f} ms, pandas {pandas_seconds * 1000:.0f} ms")
+
+if __name__ == '__main__':
+    main()
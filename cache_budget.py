@@ -0,0 +1,288 @@
+"""Memory-governed caching for the dashboard's loaders and computations.
+
+``governed_cache`` is a drop-in for ``st.cache_data`` that accounts for the
+bytes each entry holds. Every cache has an entry count, byte cap and TTL;
+on top of those, all caches share a process-wide byte budget and each
+browser session a per-session budget. When a cap is exceeded the least
+recently used entries are evicted (for a session, only entries no other
+session is using). Expired entries are dropped when they are next looked up
+and whenever a cache stores a new entry.
+
+Hits, misses, evictions and bytes are tracked per cache and per session and
+reported by ``cache_metrics`` and ``session_metrics``.
+
+Cached DataFrames are handed out as shallow copies, so callers get a view
+of the cached data without copying it. Copy-on-write (the default from
+pandas 3, switched on here for pandas 2) keeps a caller's edits from
+reaching the cached frame. Arrays are handed out as read-only views and
+dicts, lists and tuples as new containers, so cached state cannot be
+mutated through them either.
+
+Budgets (in MB) and the default TTL (in seconds) are read from
+``DASHBOARD_CACHE_MB``, ``DASHBOARD_SESSION_CACHE_MB`` and
+``DASHBOARD_CACHE_TTL``.
+"""
+import functools
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+MB = 1024 ** 2
+TOTAL_BUDGET = int(float(os.environ.get('DASHBOARD_CACHE_MB', 512)) * MB)
+SESSION_BUDGET = int(float(os.environ.get('DASHBOARD_SESSION_CACHE_MB', 128)) * MB)
+DEFAULT_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', 3600))
+# Sessions not seen for this long no longer count against anything
+SESSION_IDLE_SECONDS = 1800
+NO_SESSION = '(no session)'
+
+_lock = threading.RLock()
+CACHES = {}
+SESSIONS = {}
+
+def nbytes(value):
+    """Approximate memory held by a cached value"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(nbytes(k) + nbytes(v) for k, v in value.items())
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        # Other objects (such as bitmap indexes) hold their data in attributes
+        return sys.getsizeof(value) + nbytes(vars(value))
+    return sys.getsizeof(value)
+
+def _update_hash(digest, value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        if isinstance(value, pd.DataFrame):
+            layout = (list(value.columns), [str(dtype) for dtype in value.dtypes])
+        else:
+            layout = (value.name, str(value.dtype))
+        digest.update(repr((type(value).__name__, value.shape, layout)).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.shape, str(value.dtype))).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}[{len(value)}]'.encode())
+        for item in value:
+            _update_hash(digest, item)
+    elif isinstance(value, dict):
+        digest.update(f'dict[{len(value)}]'.encode())
+        for key in sorted(value, key=repr):
+            _update_hash(digest, key)
+            _update_hash(digest, value[key])
+    else:
+        digest.update(pickle.dumps(value))
+
+def cache_key(args, kwargs):
+    digest = hashlib.blake2b(digest_size=16)
+    _update_hash(digest, (args, kwargs))
+    return digest.hexdigest()
+
+def current_session():
+    """Id of the Streamlit session running this thread, if any"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        ctx = None
+    return ctx.session_id if ctx is not None else NO_SESSION
+
+def handout(value):
+    """The value given to callers, protecting the cached value from their edits.
+
+    pandas objects are zero-copy views (copy-on-write), arrays read-only views,
+    and dicts, lists and tuples fresh containers of handed-out items. Other
+    objects (e.g. bitmap indexes) are shared and must be treated as read-only.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, np.ndarray):
+        view = value.view()
+        view.flags.writeable = False
+        return view
+    if isinstance(value, dict):
+        return {key: handout(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(handout(item) for item in value)
+    return value
+
+class GovernedCache:
+    """LRU cache of one function's results with byte accounting"""
+
+    def __init__(self, name, max_entries=None, max_bytes=None, ttl=DEFAULT_TTL):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> [value, bytes, expires, sessions, last used]
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {'lru': 0, 'ttl': 0, 'session': 0}
+
+    def get(self, key, session, now):
+        entry = self.entries.get(key)
+        if entry is not None and entry[2] <= now:
+            self.evict(key, 'ttl')
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        entry[3].add(session)
+        entry[4] = now
+        return entry
+
+    def put(self, key, value, session, now):
+        if key in self.entries:
+            self.evict(key, None)
+        size = nbytes(value)
+        expires = now + self.ttl if self.ttl else float('inf')
+        self.entries[key] = [value, size, expires, {session}, now]
+        self.bytes += size
+        self.expire(now)
+        while len(self.entries) > 1 and (
+            (self.max_entries and len(self.entries) > self.max_entries)
+            or (self.max_bytes and self.bytes > self.max_bytes)
+        ):
+            self.evict(next(iter(self.entries)), 'lru')
+
+    def expire(self, now):
+        for key in [key for key, entry in self.entries.items() if entry[2] <= now]:
+            self.evict(key, 'ttl')
+
+    def evict(self, key, reason):
+        size = self.entries.pop(key)[1]
+        self.bytes -= size
+        if reason:
+            self.evictions[reason] += 1
+
+    def clear(self):
+        with _lock:
+            self.entries.clear()
+            self.bytes = 0
+
+def _touch_session(session, now):
+    SESSIONS.setdefault(session, {'first_seen': now})['last_seen'] = now
+    for idle in [s for s, info in SESSIONS.items() if now - info['last_seen'] > SESSION_IDLE_SECONDS]:
+        del SESSIONS[idle]
+        for cache in CACHES.values():
+            for entry in cache.entries.values():
+                entry[3].discard(idle)
+
+def _session_entries(session):
+    """(cache, key, bytes) of entries a session uses, least recently used first"""
+    entries = [(entry[4], cache, key, entry[1]) for cache in CACHES.values()
+               for key, entry in cache.entries.items() if session in entry[3]]
+    return [(cache, key, size) for _, cache, key, size in sorted(entries, key=lambda item: item[0])]
+
+def _enforce_budgets(session):
+    # A session over its budget gives up the entries only it is using
+    if session != NO_SESSION:
+        entries = _session_entries(session)
+        held = sum(size for _, _, size in entries)
+        for cache, key, size in entries:
+            if held <= SESSION_BUDGET:
+                break
+            if cache.entries[key][3] == {session}:
+                cache.evict(key, 'session')
+                held -= size
+
+    # Then the process budget, evicting the least recently used entry of the largest cache
+    while sum(cache.bytes for cache in CACHES.values()) > TOTAL_BUDGET:
+        largest = max(CACHES.values(), key=lambda cache: cache.bytes)
+        if len(largest.entries) <= 1:
+            break
+        largest.evict(next(iter(largest.entries)), 'lru')
+
+def governed_cache(func=None, *, max_entries=None, max_bytes=None, ttl=DEFAULT_TTL, name=None):
+    """Cache a function's results within the memory budgets (usable like ``st.cache_data``)"""
+    def decorator(func):
+        cache = GovernedCache(name or func.__name__, max_entries, max_bytes, ttl)
+        CACHES[cache.name] = cache
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = cache_key(args, kwargs)
+            session = current_session()
+            now = time.time()
+            with _lock:
+                _touch_session(session, now)
+                entry = cache.get(key, session, now)
+            if entry is not None:
+                return handout(entry[0])
+
+            value = func(*args, **kwargs)
+            with _lock:
+                cache.put(key, value, session, time.time())
+                _enforce_budgets(session)
+            return handout(value)
+
+        wrapper.clear = cache.clear
+        wrapper.cache = cache
+        return wrapper
+    return decorator(func) if func is not None else decorator
+
+def clear_caches():
+    for cache in CACHES.values():
+        cache.clear()
+
+def cache_metrics():
+    """Size, caps, hit rate and evictions of every governed cache"""
+    with _lock:
+        rows = [{
+            'Cache': cache.name,
+            'Entries': len(cache.entries),
+            'MB': cache.bytes / MB,
+            'Cap MB': cache.max_bytes / MB if cache.max_bytes else None,
+            'TTL s': cache.ttl,
+            'Hits': cache.hits,
+            'Misses': cache.misses,
+            'Hit Rate': cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else None,
+            'LRU Evictions': cache.evictions['lru'],
+            'TTL Evictions': cache.evictions['ttl'],
+            'Session Evictions': cache.evictions['session']
+        } for cache in CACHES.values()]
+    return pd.DataFrame(rows).sort_values('MB', ascending=False, ignore_index=True)
+
+def session_metrics():
+    """Cache entries and bytes used by each active session (shared entries count for every user)"""
+    with _lock:
+        rows = []
+        for session, info in SESSIONS.items():
+            entries = _session_entries(session)
+            exclusive = sum(size for cache, key, size in entries if cache.entries[key][3] == {session})
+            rows.append({
+                'Session': session if session == NO_SESSION else session[:8],
+                'Entries': len(entries),
+                'MB': sum(size for _, _, size in entries) / MB,
+                'Exclusive MB': exclusive / MB,
+                'Idle s': time.time() - info['last_seen']
+            })
+    return pd.DataFrame(rows, columns=['Session', 'Entries', 'MB', 'Exclusive MB', 'Idle s'])
+
+def budget_summary():
+    """Bytes held by all caches against the process budget"""
+    with _lock:
+        held = sum(cache.bytes for cache in CACHES.values())
+    return {'held_mb': held / MB, 'budget_mb': TOTAL_BUDGET / MB,
+            'session_budget_mb': SESSION_BUDGET / MB, 'sessions': len(SESSIONS)}
@@ -0,0 +1,222 @@
+"""Acquisition cohorts, retention and CLV/CAC from order-level data.
+
+Customers are assigned to the cohort of the month of their first order. At
+ingest, orders are rolled up per customer and month (kept in the store so
+assignments can be recomputed) and each cohort's activity per order month
+(active customers, orders, GMV, units) is computed in parallel and written to
+one partition per cohort month. Re-ingesting a month replaces that month in
+every cohort and rebuilds the cohorts whose customers change, so new months
+update the store incrementally; months must arrive in chronological order
+(rebuild the store to backfill older ones).
+
+At query time the partitions are stacked into a cohort x months-since-
+acquisition grid:
+
+- retention: active customers / cohort size
+- CLV: cumulative GMV per acquired customer (cumsum along the period axis)
+- CAC: marketing spend of the acquisition month / cohort size, split by
+  channel in proportion to channel spend
+
+Usage:
+    python cohorts.py ingest attached_assets/orders/*.csv --store attached_assets/cohorts --workers 4
+"""
+import argparse
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from sketches import ORDER_COLUMNS
+
+ACTIVITY_COLUMNS = ['cohort', 'order_month', 'period', 'active_customers', 'orders', 'gmv', 'units']
+
+def partition_path(store_dir, cohort):
+    return os.path.join(store_dir, f'cohort={cohort}.parquet')
+
+def read_manifest(store_dir):
+    try:
+        with open(os.path.join(store_dir, 'manifest.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'months': []}
+
+def read_customer_months(store_dir):
+    """Orders, GMV and units of every customer per order month seen so far"""
+    path = os.path.join(store_dir, 'customers.parquet')
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+def read_customers(store_dir):
+    """Cohort ('YYYY-MM') of every customer seen so far, indexed by customer ID"""
+    history = read_customer_months(store_dir)
+    if history is None:
+        return pd.Series(dtype=str, name='cohort')
+    return history.groupby('customer_id')['order_month'].min().rename('cohort')
+
+def cohort_activity(cohort, customer_months):
+    """Activity of one cohort per order month; runs in a worker process"""
+    activity = customer_months.groupby('order_month').agg(
+        active_customers=('customer_id', 'nunique'),
+        orders=('orders', 'sum'),
+        gmv=('gmv', 'sum'),
+        units=('units', 'sum')
+    ).reset_index()
+    activity.insert(0, 'cohort', cohort)
+    start = pd.Period(cohort, freq='M')
+    activity['period'] = [(pd.Period(month, freq='M') - start).n for month in activity['order_month']]
+    return activity[ACTIVITY_COLUMNS]
+
+def ingest_orders(orders, store_dir, workers=1):
+    """Add (or replace) whole months of orders in a cohort store; returns the cohorts written"""
+    orders = orders[ORDER_COLUMNS].copy()
+    dates = pd.to_datetime(orders['order_date'])
+    # Integer month codes keep the grouping in compiled code; labels are formatted once per distinct month
+    codes = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy()
+    labels = {code: f'{code // 12:04d}-{code % 12 + 1:02d}' for code in np.unique(codes)}
+    orders['order_month'] = pd.Categorical.from_codes(np.searchsorted(list(labels), codes), list(labels.values()))
+    months = list(labels.values())
+
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = read_manifest(store_dir)
+    latest = max(manifest['months'], default=None)
+    backfill = [month for month in months if latest and month < latest and month not in manifest['months']]
+    if backfill:
+        raise ValueError(f"Months {', '.join(backfill)} are older than the latest ingested month {latest}; "
+                         "rebuild the store with the full history to backfill them")
+
+    batch = orders.groupby(['customer_id', 'order_month'], observed=True).agg(
+        orders=('customer_id', 'size'),
+        gmv=('gmv', 'sum'),
+        units=('units', 'sum')
+    ).reset_index()
+    batch['order_month'] = batch['order_month'].astype(str)
+
+    # The batch's months replace whatever the store held for them, for every customer
+    history = read_customer_months(store_dir)
+    if history is None:
+        before, replaced = pd.Series(dtype=str), set()
+        history = batch
+    else:
+        before = history.groupby('customer_id')['order_month'].min()
+        in_batch_months = history['order_month'].isin(months)
+        replaced = set(before.reindex(history.loc[in_batch_months, 'customer_id'].unique()))
+        history = pd.concat([history[~in_batch_months], batch], ignore_index=True)
+    after = history.groupby('customer_id')['order_month'].min()
+
+    # Cohorts that gained or lost customers (new customers, or customers whose first month was
+    # replaced) are rebuilt from the full history; the others only recompute the batch's months
+    customers = before.index.union(after.index)
+    was, now = before.reindex(customers), after.reindex(customers)
+    moved = was.ne(now)
+    rebuilt = set(was[moved].dropna()) | set(now[moved].dropna())
+    updated = (replaced | set(after.reindex(batch['customer_id'].unique()))) - rebuilt
+
+    history['cohort'] = after.reindex(history['customer_id']).to_numpy()
+    selected = history['cohort'].isin(rebuilt) | (history['cohort'].isin(updated) & history['order_month'].isin(months))
+    groups = [(cohort, group) for cohort, group in history[selected].groupby('cohort')]
+    if workers > 1 and len(groups) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(cohort_activity, *zip(*groups)))
+    else:
+        results = [cohort_activity(cohort, group) for cohort, group in groups]
+
+    activities = {activity['cohort'].iloc[0]: activity for activity in results}
+    for cohort in sorted(rebuilt | updated):
+        path = partition_path(store_dir, cohort)
+        activity = activities.get(cohort, pd.DataFrame(columns=ACTIVITY_COLUMNS))
+        if cohort in updated and os.path.exists(path):
+            existing = pd.read_parquet(path)
+            kept = existing[~existing['order_month'].isin(months)]
+            activity = pd.concat([kept, activity]) if len(activity) else kept
+        if len(activity):
+            activity.sort_values('order_month').to_parquet(path, index=False)
+        elif os.path.exists(path):
+            # Every customer of the cohort was first seen in a replaced month
+            os.remove(path)
+
+    history.drop(columns='cohort').to_parquet(os.path.join(store_dir, 'customers.parquet'), index=False)
+    manifest['months'] = sorted(set(manifest['months']) | set(months))
+    with open(os.path.join(store_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+    return sorted(rebuilt | updated)
+
+def read_activity(store_dir):
+    """All cohort partitions of a store as one frame (empty when nothing is ingested)"""
+    paths = sorted(glob.glob(os.path.join(store_dir, 'cohort=*.parquet')))
+    if not paths:
+        return pd.DataFrame(columns=ACTIVITY_COLUMNS)
+    return pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+
+def cohort_grid(activity, column):
+    """Cohort x period grid of an activity column; cells after the last ingested month are NaN"""
+    grid = activity.pivot_table(index='cohort', columns='period', values=column, aggfunc='sum')
+    grid = grid.reindex(columns=range(int(activity['period'].max()) + 1))
+    # A cohort can only be observed up to the latest month in the store
+    last = pd.Period(activity['order_month'].max(), freq='M')
+    observed = np.array([(last - pd.Period(cohort, freq='M')).n for cohort in grid.index])
+    beyond = grid.columns.to_numpy()[None, :] > observed[:, None]
+    return grid.fillna(0).mask(beyond)
+
+def cohort_sizes(activity):
+    """Customers acquired per cohort (everyone in a cohort orders in its first month)"""
+    return activity[activity['period'] == 0].set_index('cohort')['active_customers'].sort_index()
+
+def retention_matrix(activity):
+    """Share of each cohort's customers active in each month since acquisition"""
+    return cohort_grid(activity, 'active_customers').div(cohort_sizes(activity), axis=0)
+
+def clv_matrix(activity, margin=1.0):
+    """Cumulative value per acquired customer by month since acquisition"""
+    gmv = cohort_grid(activity, 'gmv')
+    # NaN cells (not observed yet) stay NaN through the cumulative sum
+    return (gmv.cumsum(axis=1, skipna=False) * margin).div(cohort_sizes(activity), axis=0)
+
+def cohort_summary(activity, spend, channel_spend=None, horizon=None, margin=1.0):
+    """Per-cohort customers, CLV, CAC and per-channel CAC.
+
+    ``spend`` is total marketing spend indexed by month start date;
+    ``channel_spend`` (same index, one column per channel) splits CAC by
+    channel share. CLV is taken at ``horizon`` months since acquisition, or
+    at the latest observed month of each cohort.
+    """
+    sizes = cohort_sizes(activity)
+    clv = clv_matrix(activity, margin)
+    if horizon is not None:
+        cohort_clv = clv.reindex(columns=[horizon]).iloc[:, 0]
+    else:
+        cohort_clv = clv.ffill(axis=1).iloc[:, -1]
+
+    dates = pd.PeriodIndex(sizes.index, freq='M').to_timestamp()
+    summary = pd.DataFrame({
+        'Date': dates,
+        'Cohort': sizes.index,
+        'Customers': sizes.to_numpy(),
+        'CLV': cohort_clv.reindex(sizes.index).to_numpy(),
+        'Spend': spend.reindex(dates).to_numpy()
+    })
+    summary['CAC'] = summary['Spend'] / summary['Customers']
+    if channel_spend is not None:
+        shares = channel_spend.reindex(dates)
+        shares = shares.div(shares.sum(axis=1), axis=0).to_numpy()
+        for i, channel in enumerate(channel_spend.columns):
+            summary[f'CAC {channel}'] = summary['CAC'].to_numpy() * shares[:, i]
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Build acquisition cohorts from order files')
+    parser.add_argument('command', choices=['ingest'])
+    parser.add_argument('files', nargs='+', help='Order CSV files with columns ' + ', '.join(ORDER_COLUMNS))
+    parser.add_argument('--store', default=os.path.join('attached_assets', 'cohorts'))
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    for path in args.files:
+        cohorts = ingest_orders(pd.read_csv(path), args.store, args.workers)
+        print(f"{path}: updated {len(cohorts)} cohort partition(s)")
+
+if __name__ == '__main__':
+    main()
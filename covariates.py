@@ -0,0 +1,195 @@
+"""As-of and windowed joins of external covariates onto the merged data.
+
+A covariate source (daily weather per city, intraday stock prices, ...) is
+ingested into its own store: one Parquet partition per month of
+observations, each sorted by time, plus a manifest describing how the source
+joins onto a period of the merged data:
+
+- ``window``: the observations inside the period are aggregated (``mean``,
+  ``sum``, ``min``, ``max`` or ``last``), e.g. the month's mean daily
+  temperature over all cities
+- ``asof``: the last observation before the period ends, no older than the
+  tolerance, e.g. the month's closing stock price. With a key column the last
+  observation is taken per key and averaged over the keys
+
+Partitions are read in order, so observations arrive sorted and both joins
+are a single ``merge_asof`` pass over the periods and the observations:
+linear in their number, with partitions outside the merged date range
+skipped. Joined columns replace the pre-joined monthly values of the same
+name where the source covers a period, and new columns are appended.
+Loaders cache joined frames per ``store_version``, so an ingest shows up on
+the next load.
+
+Usage:
+    python covariates.py ingest weather daily_weather/*.csv --time Date --by City --columns tavg prcp wspd pres
+    python covariates.py ingest stock ticks/*.parquet --time Timestamp --columns "Stock Index" --how asof --tolerance 5D
+    python covariates.py list
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+AGGREGATIONS = ['mean', 'sum', 'min', 'max', 'last']
+# The merged data has one row per month, dated the first of the month
+PERIOD = pd.offsets.MonthBegin(1)
+
+def partition_name(month):
+    return f'month={month}.parquet'
+
+def read_manifest(source_dir):
+    try:
+        with open(os.path.join(source_dir, 'manifest.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def list_sources(store_dir):
+    """Manifest of every source in a store, by source name"""
+    sources = {}
+    for source_dir in sorted(glob.glob(os.path.join(store_dir, '*'))):
+        manifest = read_manifest(source_dir)
+        if manifest is not None:
+            sources[os.path.basename(source_dir)] = manifest
+    return sources
+
+def store_version(store_dir):
+    """Fingerprint of a store's manifests and partitions; None when nothing is ingested"""
+    paths = sorted(glob.glob(os.path.join(store_dir, '*', '*')))
+    if not paths:
+        return None
+    stats = [f'{os.path.relpath(path, store_dir)}:{os.stat(path).st_size}:{os.stat(path).st_mtime_ns}' for path in paths]
+    return hashlib.blake2b('|'.join(stats).encode(), digest_size=8).hexdigest()
+
+def write_source(observations, source_dir, time, columns, by=None, how='window', agg='mean', tolerance=None):
+    """Add observations to a source store, replacing earlier observations with the same time and key"""
+    if how not in ('window', 'asof'):
+        raise ValueError(f"Unknown join {how!r}; expected 'window' or 'asof'")
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation {agg!r}; expected one of {', '.join(AGGREGATIONS)}")
+    keys = [time] + ([by] if by else [])
+    observations = observations[keys + list(columns)].copy()
+    observations[time] = pd.to_datetime(observations[time])
+
+    os.makedirs(source_dir, exist_ok=True)
+    months = observations[time].dt.strftime('%Y-%m')
+    for month, part in observations.groupby(months, sort=True):
+        path = os.path.join(source_dir, partition_name(month))
+        if os.path.exists(path):
+            part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+        part = part.drop_duplicates(subset=keys, keep='last').sort_values(keys, kind='stable')
+        part.to_parquet(path, index=False)
+    with open(os.path.join(source_dir, 'manifest.json'), 'w') as f:
+        json.dump({'time': time, 'by': by, 'columns': list(columns), 'how': how, 'agg': agg,
+                   'tolerance': tolerance}, f)
+
+def read_source(source_dir, manifest, start, end):
+    """Observations from start (inclusive) to end (exclusive), sorted by time, reading only the partitions in range"""
+    first, last = start.strftime('%Y-%m'), (end - pd.Timedelta(1)).strftime('%Y-%m')
+    paths = [path for path in sorted(glob.glob(os.path.join(source_dir, partition_name('*'))))
+             if first <= os.path.basename(path)[len('month='):-len('.parquet')] <= last]
+    if not paths:
+        return None
+    # Partitions are month-ordered and sorted within, so the concatenation is sorted by time
+    observations = pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+    # merge_asof needs the same datetime resolution on both sides
+    times = observations[manifest['time']] = observations[manifest['time']].astype('datetime64[ns]')
+    return observations[(times >= start) & (times < end)].reset_index(drop=True)
+
+def window_join(starts, ends, observations, manifest):
+    """Aggregate of each period's observations (periods x columns)"""
+    time, columns = manifest['time'], manifest['columns']
+    periods = pd.DataFrame({'_start': starts, '_period': np.arange(len(starts))})
+    # Each observation belongs to the last period starting at or before it
+    assigned = pd.merge_asof(observations, periods, left_on=time, right_on='_start', direction='backward')
+    period = assigned['_period'].to_numpy()
+    inside = ~np.isnan(period)
+    inside[inside] = observations[time].to_numpy()[inside] < ends[period[inside].astype(np.int64)]
+    grouped = assigned[inside].groupby('_period')[columns].agg(manifest['agg'])
+    return grouped.reindex(np.arange(len(starts)))
+
+def asof_join(ends, observations, manifest):
+    """Last observation before each period's end, averaged over the keys (periods x columns)"""
+    time, columns, by = manifest['time'], manifest['columns'], manifest['by']
+    tolerance = pd.Timedelta(manifest['tolerance']) if manifest['tolerance'] else None
+    periods = pd.DataFrame({'_as_of': ends - pd.Timedelta(1), '_period': np.arange(len(ends))})
+    if by:
+        # One lookup per period and key; the keys are few next to the observations
+        keys = pd.DataFrame({by: pd.unique(observations[by])})
+        periods = periods.merge(keys, how='cross').sort_values('_as_of', kind='stable')
+    joined = pd.merge_asof(periods, observations, left_on='_as_of', right_on=time, by=by,
+                           direction='backward', tolerance=tolerance)
+    return joined.groupby('_period')[columns].mean().reindex(np.arange(len(ends)))
+
+def resample_aggregations(sources):
+    """How each joined column combines into coarser periods, consistent with how its source joins"""
+    return {column: 'last' if manifest['how'] == 'asof' else manifest['agg']
+            for manifest in sources.values() for column in manifest['columns']}
+
+def join_covariates(df, store_dir, date='Date'):
+    """The merged data with every source of the store joined onto its periods"""
+    sources = list_sources(store_dir)
+    if not sources or df.empty:
+        return df
+    df = df.copy()
+    starts = pd.DatetimeIndex(df[date]).as_unit('ns')
+    ends = starts + PERIOD
+    for name, manifest in sources.items():
+        if manifest['how'] == 'window':
+            start = starts.min()
+        elif manifest['tolerance']:
+            start = ends.min() - pd.Timedelta(manifest['tolerance'])
+        else:
+            # An as-of lookup without a tolerance can reach back to the first observation
+            start = pd.Timestamp.min
+        observations = read_source(os.path.join(store_dir, name), manifest, start, ends.max())
+        if observations is None or observations.empty:
+            continue
+        if manifest['how'] == 'window':
+            joined = window_join(starts.to_numpy(), ends.to_numpy(), observations, manifest)
+        else:
+            joined = asof_join(ends, observations, manifest)
+        for column in manifest['columns']:
+            values = joined[column].to_numpy()
+            if column in df.columns:
+                # Keep the pre-joined value for periods the source does not cover
+                values = np.where(np.isnan(values), df[column].to_numpy(dtype=np.float64), values)
+            df[column] = values
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest covariate sources joined onto the merged data')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest = subparsers.add_parser('ingest', help='Add observations to a covariate source')
+    ingest.add_argument('source', help='Source name, e.g. weather')
+    ingest.add_argument('files', nargs='+', help='CSV or Parquet files of time-stamped observations')
+    ingest.add_argument('--time', required=True, help='Timestamp column')
+    ingest.add_argument('--columns', nargs='+', required=True, help='Covariate columns to join')
+    ingest.add_argument('--by', help='Key column, e.g. City')
+    ingest.add_argument('--how', choices=['window', 'asof'], default='window')
+    ingest.add_argument('--agg', choices=AGGREGATIONS, default='mean', help='Aggregation of a window join')
+    ingest.add_argument('--tolerance', help='Maximum age of an as-of observation, e.g. 5D')
+    listing = subparsers.add_parser('list', help='Show the sources of the store')
+    for subparser in (ingest, listing):
+        subparser.add_argument('--store', default=os.path.join('attached_assets', 'covariates'))
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for name, manifest in list_sources(args.store).items():
+            join = f"as of, tolerance {manifest['tolerance']}" if manifest['how'] == 'asof' else f"{manifest['agg']} per period"
+            print(f"{name}: {', '.join(manifest['columns'])} ({join})")
+        return
+
+    columns = [args.time] + ([args.by] if args.by else []) + args.columns
+    observations = pd.concat([pd.read_parquet(path, columns=columns) if path.endswith('.parquet')
+                              else pd.read_csv(path, usecols=columns) for path in args.files], ignore_index=True)
+    write_source(observations, os.path.join(args.store, args.source), args.time, args.columns,
+                 args.by, args.how, args.agg, args.tolerance)
+    print(f"{args.source}: {len(observations):,} observations ingested")
+
+if __name__ == '__main__':
+    main()
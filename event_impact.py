@@ -0,0 +1,114 @@
+"""Holiday and sale-event uplift per category.
+
+An event's exposure in a period is the share of its days covered by the event
+(``Holiday Percentage`` / ``Sales Percentage``), so monthly, weekly and daily
+frames are handled alike. Uplift is the extra GMV of an event day over a
+regular day, estimated on log GMV in two ways:
+
+- regression adjustment: log GMV on event exposures, a trend and log
+  marketing spend, solved for every series at once with one least squares
+  call because all series share the design matrix
+- matched controls: each period with an event is paired with the most
+  similar period (trend, spend, other events) that had less of it; the
+  paired differences, corrected for the remaining covariate gap with the
+  regression coefficients, are pooled per unit of exposure
+
+Both are vectorized over series, so adding categories (or SKUs) adds columns
+to one matrix rather than more fits.
+"""
+import numpy as np
+import pandas as pd
+
+# Event type -> exposure column (percent of days in the period)
+EVENTS = {'Holiday': 'Holiday Percentage', 'Sale': 'Sales Percentage'}
+SPEND_COLUMN = 'Total Investment'
+# Minimum exposure difference (share of days) for a treated/control pair
+MIN_EXPOSURE_GAP = 0.01
+IMPACT_COLUMNS = ['Event', 'Series', 'Lift', 'Lift Error', 'Regression Lift', 'Regression Error', 'Pairs']
+
+def design(df, events):
+    """Exposures (share of days) and covariates (trend, log spend) of a Date-sorted frame"""
+    exposures = df[[EVENTS[event] for event in events]].to_numpy(dtype=np.float64) / 100
+    trend = np.arange(len(df), dtype=np.float64) / max(len(df) - 1, 1)
+    covariates = [trend]
+    if SPEND_COLUMN in df.columns:
+        covariates.append(np.log1p(df[SPEND_COLUMN].to_numpy(dtype=np.float64)))
+    return exposures, np.column_stack(covariates)
+
+def regression_lift(y, exposures, covariates):
+    """Batched least squares of every column of y on exposures and covariates.
+
+    Returns (exposure coefficients, their standard errors, covariate
+    coefficients), each with one column per series.
+    """
+    X = np.column_stack([np.ones(len(y)), exposures, covariates])
+    coefficients, _, rank, _ = np.linalg.lstsq(X, y, rcond=None)
+    dof = len(y) - rank
+    residuals = y - X @ coefficients
+    sigma2 = (residuals ** 2).sum(axis=0) / dof if dof > 0 else np.full(y.shape[1], np.nan)
+    variance = np.diag(np.linalg.pinv(X.T @ X))[:, None] * sigma2[None, :]
+    n_events = exposures.shape[1]
+    events = slice(1, 1 + n_events)
+    return coefficients[events], np.sqrt(variance[events]), coefficients[1 + n_events:]
+
+def matched_pairs(exposure, balance):
+    """(treated, control) period indices: each exposed period and its nearest less-exposed period"""
+    spread = balance.std(axis=0)
+    spread[spread == 0] = 1
+    z = balance / spread
+    distance = ((z[:, None, :] - z[None, :, :]) ** 2).sum(axis=2)
+    # Only periods with clearly less of the event can serve as controls
+    distance[exposure[None, :] > exposure[:, None] - MIN_EXPOSURE_GAP] = np.inf
+    treated = np.flatnonzero((exposure > 0) & np.isfinite(distance).any(axis=1))
+    return treated, np.argmin(distance[treated], axis=1)
+
+def matched_lift(y, exposure, balance, gamma):
+    """Pooled, regression-corrected paired differences per unit of exposure, with a standard error"""
+    treated, control = matched_pairs(exposure, balance)
+    if len(treated) == 0:
+        nan = np.full(y.shape[1], np.nan)
+        return nan, nan, 0
+    gap = exposure[treated] - exposure[control]
+    # Remove what the covariate difference within each pair explains
+    difference = (y[treated] - y[control]) - (balance[treated] - balance[control]) @ gamma
+    lift = difference.sum(axis=0) / gap.sum()
+    error = np.sqrt(((difference - gap[:, None] * lift[None, :]) ** 2).sum(axis=0)) / gap.sum()
+    return lift, error, len(treated)
+
+def as_percent(coefficient, error):
+    """Log-scale lift and standard error as percent uplift (delta method for the error)"""
+    return (np.exp(coefficient) - 1) * 100, np.exp(coefficient) * error * 100
+
+def event_lift(df, series, events=None):
+    """Uplift of an event day over a regular day, in percent, per event type and series.
+
+    ``df`` is a Date-sorted period frame. Errors are standard errors in
+    percentage points; ``Pairs`` is the number of matched periods.
+    """
+    events = [event for event in (events or EVENTS) if EVENTS[event] in df.columns]
+    values = df[series].to_numpy(dtype=np.float64)
+    # Log GMV; periods where any series is not positive are left out
+    usable = (values > 0).all(axis=1)
+    df, values = df[usable], values[usable]
+    if not events:
+        return pd.DataFrame(columns=IMPACT_COLUMNS)
+
+    y = np.log(values)
+    exposures, covariates = design(df, events)
+    # The regression needs more periods than coefficients
+    if len(df) <= 1 + exposures.shape[1] + covariates.shape[1]:
+        return pd.DataFrame(columns=IMPACT_COLUMNS)
+    beta, beta_error, gamma = regression_lift(y, exposures, covariates)
+
+    rows = []
+    for i, event in enumerate(events):
+        # Pairs are balanced on the covariates and the other events' exposures
+        others = np.delete(exposures, i, axis=1)
+        balance = np.column_stack([covariates, others])
+        gamma_balance = np.vstack([gamma, np.delete(beta, i, axis=0)])
+        lift, error, pairs = matched_lift(y, exposures[:, i], balance, gamma_balance)
+        lift, error = as_percent(lift, error)
+        regression, regression_error = as_percent(beta[i], beta_error[i])
+        for j, name in enumerate(series):
+            rows.append([event, name, lift[j], error[j], regression[j], regression_error[j], pairs])
+    return pd.DataFrame(rows, columns=IMPACT_COLUMNS)
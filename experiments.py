@@ -0,0 +1,254 @@
+"""Geo-lift experiment analysis and calibration of the response curves.
+
+An experiment changes one channel's spend in a set of test geos over a test
+window (a holdout switches it off, a boost raises it) while control geos
+carry on. Its panel holds a response (GMV) per geo and day, and whether each
+geo was treated. The incremental response of the test geos over the window
+is estimated with either:
+
+- ``did``: difference-in-differences of the mean response before and
+  during the test, test geos against control geos
+- ``synthetic_control``: the test geos' response is tracked by a
+  non-negative, sum-to-one weighting of control geos fitted on the
+  pre-period; the lift is the gap between the two during the test
+
+Uncertainty comes from placebo permutations: the estimator is rerun with the
+treatment reassigned to random sets of control geos, which gives the
+estimator's distribution under no effect. Difference-in-differences is
+linear in the assignment, so all placebos are one matrix product; synthetic
+control placebos are refitted in parallel worker processes. A few hundred
+geos and a few thousand placebos take seconds to minutes.
+
+Each experiment's lift per unit of spend change (its incremental ROAS) is a
+prior on the channel's marginal ROAS. ``calibrate_curves`` scales each Hill
+curve's ``beta`` toward it, shrunk by the experiment's uncertainty, so the
+allocator on the Budget Optimization page plans on calibrated curves.
+
+Experiments are ingested into ``attached_assets/experiments`` and analyzed
+once, at ingest:
+
+Usage:
+    python experiments.py ingest tv_holdout panel.csv --channel Sponsorship --start 2024-04-01 --end 2024-05-31 --spend-change -4.5
+    python experiments.py list
+    python experiments.py bench            # time 300 geos x 2,000 placebos with both methods
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import optimize as opt
+
+from allocator import hill_marginal
+
+METHODS = ['did', 'synthetic_control']
+PERMUTATIONS = 2000
+# Prior standard deviation of a curve's ROAS multiplier: how far the model may be off before any experiment
+CALIBRATION_PRIOR_SD = 0.5
+# Calibration never scales a curve below this share of the model's response
+CALIBRATION_FLOOR = 0.1
+# Weight of the sum-to-one row in the synthetic control fit
+SUM_TO_ONE_WEIGHT = 1e3
+RESULT_COLUMNS = ['experiment', 'channel', 'method', 'start', 'end', 'treated_geos', 'control_geos',
+                  'lift', 'lift_low', 'lift_high', 'p_value', 'spend_change', 'iroas', 'iroas_se']
+
+def panel_matrix(panel, geo='Geo', date='Date', response='Response', treated='Treated'):
+    """(responses geos x dates, dates, treated flag per geo) of a long experiment panel"""
+    panel = panel.assign(**{date: pd.to_datetime(panel[date])})
+    matrix = panel.pivot_table(index=geo, columns=date, values=response, aggfunc='sum')
+    if matrix.isna().any().any():
+        raise ValueError("The experiment panel has geos without a response on every date")
+    flags = panel.groupby(geo)[treated].max().reindex(matrix.index).astype(bool).to_numpy()
+    return matrix.to_numpy(dtype=np.float64), matrix.columns, flags
+
+def placebo_draws(n_control, n_treated, permutations, seed=0):
+    """Indices of the control geos pretending to be treated, one row per placebo"""
+    rng = np.random.default_rng(seed)
+    return np.argsort(rng.random((permutations, n_control)), axis=1)[:, :n_treated]
+
+def did_lift(Y_treated, Y_control, pre, post):
+    """Total incremental response of the treated geos by difference-in-differences"""
+    change_treated = Y_treated[:, post].mean() - Y_treated[:, pre].mean()
+    change_control = Y_control[:, post].mean() - Y_control[:, pre].mean()
+    return (change_treated - change_control) * len(Y_treated) * post.sum()
+
+def did_placebos(Y_control, pre, post, draws):
+    """Difference-in-differences of every placebo assignment at once"""
+    change = Y_control[:, post].mean(axis=1) - Y_control[:, pre].mean(axis=1)
+    n_treated, n_control = draws.shape[1], len(change)
+    treated_sum = change[draws].sum(axis=1)
+    placebo = treated_sum / n_treated - (change.sum() - treated_sum) / (n_control - n_treated)
+    return placebo * n_treated * post.sum()
+
+def synthetic_weights(donors_pre, target_pre):
+    """Non-negative, sum-to-one donor weights tracking the target over the pre-period"""
+    scale = max(np.abs(target_pre).mean(), 1e-12)
+    A = np.vstack([donors_pre / scale, np.full(donors_pre.shape[1], SUM_TO_ONE_WEIGHT)])
+    b = np.append(target_pre / scale, SUM_TO_ONE_WEIGHT)
+    return opt.nnls(A, b)[0]
+
+def synthetic_lift(Y_treated, Y_donors, pre, post):
+    """Total incremental response of the treated geos against their synthetic control"""
+    target = Y_treated.mean(axis=0)
+    weights = synthetic_weights(Y_donors[:, pre].T, target[pre])
+    gap = target[post] - weights @ Y_donors[:, post]
+    return gap.sum() * len(Y_treated)
+
+def synthetic_placebos(Y_control, pre, post, draws):
+    """Synthetic control lift of each placebo assignment, donors being the other control geos"""
+    placebos = np.empty(len(draws))
+    for i, treated in enumerate(draws):
+        donors = np.ones(len(Y_control), dtype=bool)
+        donors[treated] = False
+        placebos[i] = synthetic_lift(Y_control[treated], Y_control[donors], pre, post)
+    return placebos
+
+def analyze(Y, dates, treated, start, end, method='synthetic_control', permutations=PERMUTATIONS, workers=None, seed=0):
+    """Lift, 95% placebo interval and p-value of one experiment"""
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    dates = pd.DatetimeIndex(dates)
+    pre = np.asarray(dates < pd.Timestamp(start))
+    post = np.asarray((dates >= pd.Timestamp(start)) & (dates <= pd.Timestamp(end)))
+    if not pre.any() or not post.any():
+        raise ValueError("The experiment needs dates both before and during the test window")
+    Y_treated, Y_control = Y[treated], Y[~treated]
+    if len(Y_treated) == 0 or len(Y_control) <= len(Y_treated):
+        raise ValueError("Placebos need more control geos than treated geos")
+
+    draws = placebo_draws(len(Y_control), len(Y_treated), permutations, seed)
+    if method == 'did':
+        lift = did_lift(Y_treated, Y_control, pre, post)
+        placebos = did_placebos(Y_control, pre, post, draws)
+    else:
+        lift = synthetic_lift(Y_treated, Y_control, pre, post)
+        workers = min(workers or os.cpu_count() or 1, len(draws))
+        chunks = np.array_split(draws, workers)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                placebos = np.concatenate(list(pool.map(synthetic_placebos, [Y_control] * workers, [pre] * workers,
+                                                        [post] * workers, chunks)))
+        else:
+            placebos = synthetic_placebos(Y_control, pre, post, draws)
+
+    # Placebos are the estimator's error under no effect: invert them around the estimate
+    low, high = np.quantile(placebos, [0.025, 0.975])
+    return {
+        'lift': float(lift),
+        'lift_low': float(lift - high),
+        'lift_high': float(lift - low),
+        'lift_se': float(placebos.std()),
+        'p_value': float((1 + (np.abs(placebos) >= abs(lift)).sum()) / (1 + len(placebos))),
+        'treated_geos': int(treated.sum()),
+        'control_geos': int((~treated).sum())
+    }
+
+def write_experiment(store_dir, name, panel, manifest, result):
+    experiment_dir = os.path.join(store_dir, name)
+    os.makedirs(experiment_dir, exist_ok=True)
+    panel.to_parquet(os.path.join(experiment_dir, 'panel.parquet'), index=False)
+    with open(os.path.join(experiment_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+    # Written last, so an experiment with a result is complete
+    with open(os.path.join(experiment_dir, 'result.json'), 'w') as f:
+        json.dump(result, f)
+
+def read_results(store_dir):
+    """One row per analyzed experiment, with its incremental ROAS and standard error"""
+    rows = []
+    for experiment_dir in sorted(glob.glob(os.path.join(store_dir, '*'))):
+        try:
+            with open(os.path.join(experiment_dir, 'manifest.json')) as f:
+                manifest = json.load(f)
+            with open(os.path.join(experiment_dir, 'result.json')) as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            continue
+        spend_change = manifest['spend_change']
+        rows.append(dict(manifest, **result, experiment=os.path.basename(experiment_dir),
+                         iroas=result['lift'] / spend_change, iroas_se=result['lift_se'] / abs(spend_change)))
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+def calibrate_curves(curves, results, prior_sd=CALIBRATION_PRIOR_SD):
+    """Response curves with each tested channel's beta scaled toward its experiments' incremental ROAS.
+
+    Per channel, experiments are pooled by inverse variance into a ratio of
+    measured to modelled ROAS at the initial spend; the multiplier applied
+    is that ratio shrunk toward 1 by its uncertainty against ``prior_sd``.
+    """
+    curves = curves.copy()
+    curves['calibration'] = 1.0
+    for channel, tests in results.groupby('channel'):
+        if channel not in curves.index:
+            continue
+        beta, alpha, kappa, init_spend = curves.loc[channel, ['beta', 'alpha', 'kappa', 'init_spend']]
+        model_roas = hill_marginal(init_spend, beta, alpha, kappa)
+        precision = 1 / np.maximum(tests['iroas_se'].to_numpy() / model_roas, 1e-9) ** 2
+        ratio = (tests['iroas'].to_numpy() / model_roas * precision).sum() / precision.sum()
+        shrink = prior_sd ** 2 / (prior_sd ** 2 + 1 / precision.sum())
+        curves.loc[channel, 'calibration'] = max(1 + shrink * (ratio - 1), CALIBRATION_FLOOR)
+    curves['beta'] *= curves['calibration']
+    curves['init_response'] *= curves['calibration']
+    return curves
+
+def simulate_panel(n_geos=300, n_days=120, n_treated=30, test_days=30, effect=0.05, seed=0):
+    """A synthetic geo panel with a multiplicative lift in the treated geos, for benchmarks"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2024-01-01', periods=n_days, freq='D')
+    factors = rng.normal(size=(3, n_days)).cumsum(axis=1)
+    loadings = rng.gamma(2.0, 1.0, size=(n_geos, 3))
+    Y = 1000 + 50 * loadings @ factors + rng.normal(0, 20, (n_geos, n_days))
+    treated = np.zeros(n_geos, dtype=bool)
+    treated[rng.choice(n_geos, n_treated, replace=False)] = True
+    Y[np.ix_(treated, np.arange(n_days - test_days, n_days))] *= 1 + effect
+    return Y, dates, treated, dates[n_days - test_days], dates[-1]
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze geo-lift experiments that calibrate the response curves')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest = subparsers.add_parser('ingest', help='Analyze an experiment and add it to the store')
+    ingest.add_argument('name', help='Experiment name, e.g. sponsorship_holdout_q2')
+    ingest.add_argument('panel', help='CSV or Parquet panel with Geo, Date, Response and Treated columns')
+    ingest.add_argument('--channel', required=True, help='Tested channel, as named in the Robyn curves')
+    ingest.add_argument('--start', required=True, help='First day of the test window')
+    ingest.add_argument('--end', required=True, help='Last day of the test window')
+    ingest.add_argument('--spend-change', type=float, required=True,
+                        help='Spend change in the test geos over the window, in the curves\' spend units')
+    ingest.add_argument('--method', choices=METHODS, default='synthetic_control')
+    ingest.add_argument('--permutations', type=int, default=PERMUTATIONS)
+    ingest.add_argument('--workers', type=int)
+    listing = subparsers.add_parser('list', help='Show the analyzed experiments')
+    for subparser in (ingest, listing):
+        subparser.add_argument('--store', default=os.path.join('attached_assets', 'experiments'))
+    bench = subparsers.add_parser('bench', help='Time both methods on a simulated panel')
+    bench.add_argument('--geos', type=int, default=300)
+    bench.add_argument('--permutations', type=int, default=PERMUTATIONS)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        print(read_results(args.store).to_string(index=False))
+    elif args.command == 'bench':
+        Y, dates, treated, start, end = simulate_panel(n_geos=args.geos, n_treated=args.geos // 10)
+        truth = 0.05 * Y[treated][:, dates >= start].sum() / 1.05
+        for method in METHODS:
+            started = time.perf_counter()
+            result = analyze(Y, dates, treated, start, end, method, args.permutations)
+            print(f"{method}: lift {result['lift']:,.0f} (95% {result['lift_low']:,.0f} to {result['lift_high']:,.0f}, "
+                  f"true {truth:,.0f}), p={result['p_value']:.4f}, {args.geos} geos x {args.permutations:,} placebos "
+                  f"in {time.perf_counter() - started:.1f}s")
+    else:
+        panel = pd.read_parquet(args.panel) if args.panel.endswith('.parquet') else pd.read_csv(args.panel)
+        Y, dates, treated = panel_matrix(panel)
+        result = analyze(Y, dates, treated, args.start, args.end, args.method, args.permutations, args.workers)
+        manifest = {'channel': args.channel, 'method': args.method, 'start': args.start, 'end': args.end,
+                    'spend_change': args.spend_change}
+        write_experiment(args.store, args.name, panel, manifest, result)
+        print(f"{args.name}: lift {result['lift']:,.0f} (95% {result['lift_low']:,.0f} to {result['lift_high']:,.0f}), "
+              f"p={result['p_value']:.4f}")
+
+if __name__ == '__main__':
+    main()
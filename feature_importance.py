@@ -0,0 +1,196 @@
+"""Per-category channel importance and monthly SHAP attributions.
+
+One gradient-boosted tree model per product category is fitted to the
+category's GMV from the channel spend of the merged data, and categories
+are trained in parallel worker processes. Each model yields:
+
+- importance: the total squared-error reduction of the splits on each
+  channel, normalized to sum to one per category (the layout of
+  ``feature_importance_values.csv``: index by product, columns by channel)
+- SHAP values: each channel's contribution to the model's GMV for every
+  month, in GMV units. Trees are shallow, so each tree uses only a few
+  channels, and its exact (path-dependent) Shapley values are computed by
+  enumerating the subsets of those channels, batched over all months at once
+
+Results are written to a store directory per data version
+(``.cache/feature_importance/<version>``, override the root with
+``FEATURE_IMPORTANCE_STORE``) as ``importance.csv`` and one
+``shap_<YYYY-MM>.csv`` per month, and read back while the data is unchanged.
+
+Usage:
+    python feature_importance.py            # train on the dashboard data and print the importances
+"""
+import glob
+import hashlib
+import math
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+STORE_ROOT = os.environ.get(
+    'FEATURE_IMPORTANCE_STORE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'feature_importance')
+)
+N_TREES = 200
+LEARNING_RATE = 0.05
+MAX_DEPTH = 2
+MIN_LEAF = 2
+
+def best_split(X, residual, rows):
+    """(gain, feature, threshold) of the best split of the rows, or None"""
+    best = None
+    y = residual[rows]
+    total, n = y.sum(), len(rows)
+    for feature in range(X.shape[1]):
+        order = np.argsort(X[rows, feature], kind='stable')
+        values, sorted_y = X[rows, feature][order], y[order]
+        left_sum = np.cumsum(sorted_y)[:-1]
+        left_n = np.arange(1, n)
+        # Split only between distinct values, leaving MIN_LEAF rows on each side
+        valid = (values[1:] > values[:-1]) & (left_n >= MIN_LEAF) & (n - left_n >= MIN_LEAF)
+        if not valid.any():
+            continue
+        gain = left_sum ** 2 / left_n + (total - left_sum) ** 2 / (n - left_n) - total ** 2 / n
+        gain[~valid] = -np.inf
+        i = int(np.argmax(gain))
+        if best is None or gain[i] > best[0]:
+            best = (gain[i], feature, (values[i] + values[i + 1]) / 2)
+    return best
+
+def fit_tree(X, residual):
+    """Regression tree of depth MAX_DEPTH as node arrays; feature -1 marks a leaf"""
+    nodes = {'feature': [], 'threshold': [], 'left': [], 'right': [], 'value': [], 'cover': [], 'gain': []}
+
+    def grow(rows, depth):
+        node = len(nodes['feature'])
+        for field, value in [('feature', -1), ('threshold', 0.0), ('left', -1), ('right', -1),
+                             ('value', residual[rows].mean()), ('cover', len(rows)), ('gain', 0.0)]:
+            nodes[field].append(value)
+        split = best_split(X, residual, rows) if depth < MAX_DEPTH else None
+        if split is not None and split[0] > 0:
+            gain, feature, threshold = split
+            nodes['feature'][node], nodes['threshold'][node], nodes['gain'][node] = feature, threshold, gain
+            nodes['left'][node] = grow(rows[X[rows, feature] <= threshold], depth + 1)
+            nodes['right'][node] = grow(rows[X[rows, feature] > threshold], depth + 1)
+        return node
+
+    grow(np.arange(len(X)), 0)
+    return {field: np.asarray(values) for field, values in nodes.items()}
+
+def predict_tree(tree, X, fixed=None, node=0):
+    """Tree output per row; with a feature mask, the path-dependent expectation given only those features"""
+    feature = tree['feature'][node]
+    if feature < 0:
+        return np.full(len(X), tree['value'][node])
+    left = predict_tree(tree, X, fixed, tree['left'][node])
+    right = predict_tree(tree, X, fixed, tree['right'][node])
+    if fixed is None or fixed[feature]:
+        return np.where(X[:, feature] <= tree['threshold'][node], left, right)
+    # Unknown feature: average the branches by the training rows that went down each
+    cover_left, cover_right = tree['cover'][tree['left'][node]], tree['cover'][tree['right'][node]]
+    return (cover_left * left + cover_right * right) / (cover_left + cover_right)
+
+def tree_shap(tree, X):
+    """Exact path-dependent SHAP values (rows, features) of one tree, by subset enumeration"""
+    phi = np.zeros(X.shape)
+    used = np.unique(tree['feature'][tree['feature'] >= 0])
+    k = len(used)
+    if k == 0:
+        return phi
+    # Expected output for every subset of the tree's features, each over all rows at once
+    expected = {}
+    for size in range(k + 1):
+        for subset in combinations(used, size):
+            fixed = np.zeros(X.shape[1], dtype=bool)
+            fixed[list(subset)] = True
+            expected[subset] = predict_tree(tree, X, fixed)
+    for feature in used:
+        others = [f for f in used if f != feature]
+        for size in range(k):
+            weight = math.factorial(size) * math.factorial(k - size - 1) / math.factorial(k)
+            for subset in combinations(others, size):
+                with_feature = tuple(sorted(subset + (feature,)))
+                phi[:, feature] += weight * (expected[with_feature] - expected[subset])
+    return phi
+
+def fit_category(X, y):
+    """Boosted trees for one category; returns (gain importance, SHAP values in units of y)"""
+    center, spread = y.mean(), y.std() or 1.0
+    residual = (y - center) / spread
+    gains = np.zeros(X.shape[1])
+    shap = np.zeros(X.shape)
+    for _ in range(N_TREES):
+        tree = fit_tree(X, residual)
+        splits = tree['feature'] >= 0
+        np.add.at(gains, tree['feature'][splits], tree['gain'][splits])
+        residual = residual - LEARNING_RATE * predict_tree(tree, X)
+        shap += LEARNING_RATE * tree_shap(tree, X)
+    importance = gains / gains.sum() if gains.sum() > 0 else gains
+    return importance, shap * spread
+
+def compute_attributions(df, categories, channels, workers=None):
+    """Importance (category x channel) and SHAP values per month ({YYYY-MM: category x channel})"""
+    X = df[channels].to_numpy(dtype=np.float64)
+    targets = [df[category].to_numpy(dtype=np.float64) for category in categories]
+    workers = min(workers or os.cpu_count() or 1, len(categories))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(fit_category, [X] * len(targets), targets))
+    else:
+        results = [fit_category(X, y) for y in targets]
+
+    importance = pd.DataFrame([result[0] for result in results], index=categories, columns=channels)
+    months = pd.to_datetime(df['Date']).dt.strftime('%Y-%m').tolist()
+    shap = {month: pd.DataFrame([result[1][i] for result in results], index=categories, columns=channels)
+            for i, month in enumerate(months)}
+    return importance, shap
+
+def data_version(df, categories, channels):
+    """Short hash of the training data"""
+    values = pd.util.hash_pandas_object(df[['Date'] + list(channels) + list(categories)], index=False)
+    return hashlib.blake2b(values.to_numpy().tobytes(), digest_size=8).hexdigest()
+
+def write_attributions(store_dir, importance, shap):
+    """Write a version's files into a staging directory and move it into place"""
+    staging = f'{store_dir}.{os.getpid()}.tmp'
+    os.makedirs(staging, exist_ok=True)
+    for month, values in shap.items():
+        values.to_csv(os.path.join(staging, f'shap_{month}.csv'))
+    importance.to_csv(os.path.join(staging, 'importance.csv'))
+    try:
+        os.rename(staging, store_dir)
+    except OSError:
+        # Another process stored the same version first
+        shutil.rmtree(staging, ignore_errors=True)
+
+def read_attributions(store_dir):
+    """Stored (importance, SHAP values per month), or None when this version has not been computed"""
+    path = os.path.join(store_dir, 'importance.csv')
+    if not os.path.exists(path):
+        return None
+    shap = {os.path.basename(shap_path)[len('shap_'):-len('.csv')]: pd.read_csv(shap_path, index_col=0)
+            for shap_path in sorted(glob.glob(os.path.join(store_dir, 'shap_*.csv')))}
+    return pd.read_csv(path, index_col=0), shap
+
+def load_attributions(df, categories, channels, store_root=STORE_ROOT, workers=None):
+    """Attributions of the current data version, computed and stored on first use"""
+    store_dir = os.path.join(store_root, data_version(df, categories, channels))
+    stored = read_attributions(store_dir)
+    if stored is not None:
+        return stored
+    importance, shap = compute_attributions(df, categories, channels, workers)
+    write_attributions(store_dir, importance, shap)
+    return importance, shap
+
+if __name__ == '__main__':
+    from utils import load_feature_attributions
+
+    importance, shap = load_feature_attributions()
+    print(importance.round(3).to_string())
+    latest = max(shap)
+    print(f"\nSHAP values for {latest}:")
+    print(shap[latest].round(0).to_string())
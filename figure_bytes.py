@@ -0,0 +1,79 @@
+"""Measure the Plotly figure bytes each dashboard page sends to the browser.
+
+Every page is run headless with Streamlit's AppTest and the figure specs it
+would ship are collected. For each page the script reports the number of
+figures, the JSON and gzip sizes, how much of it is template, and the
+estimated transfer time on a slow link.
+
+Usage:
+    python figure_bytes.py                 # current settings
+    python figure_bytes.py --compare       # also measure with Plotly's stock template
+    python figure_bytes.py --kbps 400 pages/4_Budget_Optimization.py
+"""
+import argparse
+import glob
+import gzip
+import json
+import logging
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def measure_page(page):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(ROOT, page), default_timeout=300).run()
+    if app.exception:
+        raise RuntimeError(f"{page} failed: {app.exception[0].value}")
+    specs = [chart.proto.spec for chart in app.get('plotly_chart')]
+    return {
+        'page': page,
+        'figures': len(specs),
+        'json_bytes': sum(len(spec.encode()) for spec in specs),
+        'gzip_bytes': sum(len(gzip.compress(spec.encode())) for spec in specs),
+        'template_bytes': sum(len(json.dumps(json.loads(spec)['layout'].get('template', {}))) for spec in specs)
+    }
+
+def measure(pages):
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    logging.disable(logging.WARNING)
+    return [measure_page(page) for page in pages]
+
+def print_table(label, results, kbps):
+    print(f"\n{label}")
+    print(f"{'page':<40}{'figures':>8}{'json KB':>10}{'gzip KB':>10}{'template KB':>13}{'transfer s':>12}")
+    for row in results:
+        seconds = row['gzip_bytes'] * 8 / (kbps * 1000)
+        print(f"{row['page']:<40}{row['figures']:>8}{row['json_bytes'] / 1024:>10.1f}"
+              f"{row['gzip_bytes'] / 1024:>10.1f}{row['template_bytes'] / 1024:>13.1f}{seconds:>12.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure figure bytes per dashboard page')
+    parser.add_argument('pages', nargs='*', help='Pages to measure (default: all pages)')
+    parser.add_argument('--kbps', type=float, default=400, help='Link speed for the transfer estimate')
+    parser.add_argument('--compare', action='store_true', help="Also measure with Plotly's stock template")
+    parser.add_argument('--json', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    pages = args.pages or sorted(glob.glob('pages/*.py', root_dir=ROOT))
+    results = measure(pages)
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print_table(f"Template '{os.environ.get('DASHBOARD_PLOTLY_TEMPLATE', 'dashboard')}'", results, args.kbps)
+    if args.compare:
+        # The template is chosen when utils is imported, so the stock run needs its own process
+        env = dict(os.environ, DASHBOARD_PLOTLY_TEMPLATE='plotly')
+        output = subprocess.run([sys.executable, __file__, '--json', *pages], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        stock = json.loads(output.strip().splitlines()[-1])
+        print_table("Template 'plotly' (stock)", stock, args.kbps)
+        saved = 1 - sum(r['gzip_bytes'] for r in results) / sum(r['gzip_bytes'] for r in stock)
+        print(f"\nCompressed figure bytes saved: {saved:.0%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""Time-phased budget flighting with adstock carryover.
+
+Spend in a period keeps working in later ones: channel c's effective spend
+(adstock) is ``A[c, t] = x[c, t] + decay[c] * A[c, t - 1]``, starting from
+the carryover left by the spend before the plan. Each channel's response per
+period is concave in its adstock, ``weight * log1p(A / scale)``, with weights
+taken from the backtest's response model (ridge regression of log GMV on log
+adstocked spend), so the whole horizon is planned at once: spending early
+on a channel that carries over pays off in later months too.
+
+The plan maximizes the total response over the horizon subject to
+
+- the total budget (all channels and periods)
+- per-channel spend bounds in every period
+- per-period pacing: a minimum and maximum of the total spend in each period
+
+It is solved as one problem with ``trust-constr``. Adstock is a lower
+triangular operator, so it and its transpose are applied as causal and
+anti-causal filters in O(channels x periods) (``transforms.geometric_adstock``)
+instead of as dense matrices; gradients and Hessian-vector products are
+analytic, and the budget and pacing rows are a sparse constraint matrix. A
+52-week plan over nine channels solves in about a second.
+
+Usage:
+    python flighting.py            # plan the dashboard's months and time a 52-week plan
+"""
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import optimize as opt
+from scipy import sparse
+
+from backtest import ADSTOCK_DECAY, RIDGE_PENALTY
+from transforms import geometric_adstock
+
+CURVE_COLUMNS = ['weight', 'scale', 'decay', 'carry']
+
+def adstock(spend, decay, carry=None):
+    """Adstock of a (channels, periods) spend matrix, plus the decaying carryover from before the plan"""
+    adstocked = geometric_adstock(spend, np.asarray(decay, dtype=np.float64)[None, :])[0]
+    if carry is not None:
+        powers = np.arange(1, spend.shape[1] + 1)
+        adstocked = adstocked + carry[:, None] * decay[:, None] ** powers[None, :]
+    return adstocked
+
+def adstock_transpose(grad, decay):
+    """Transpose of the adstock operator: carries each period's gradient back to the spend that fed it"""
+    return geometric_adstock(grad[:, ::-1], np.asarray(decay, dtype=np.float64)[None, :])[0][:, ::-1]
+
+def fit_flighting_curves(spend, gmv, channels, usable=None, decay=ADSTOCK_DECAY):
+    """Response weight, scale, decay and end-of-history carryover per channel.
+
+    ``spend`` is a (periods, channels) history and ``gmv`` its GMV. The log
+    GMV ridge fit gives each channel's elasticity to log1p(adstock / scale);
+    times the mean GMV it is the channel's response weight. Channels the fit
+    finds no positive effect for get a weight of zero.
+    """
+    spend = np.asarray(spend, dtype=np.float64)
+    gmv = np.asarray(gmv, dtype=np.float64)
+    usable = np.ones(len(gmv), dtype=bool) if usable is None else np.asarray(usable, dtype=bool)
+    decay = np.broadcast_to(np.asarray(decay, dtype=np.float64), (spend.shape[1],)).copy()
+
+    adstocked = adstock(spend.T, decay)
+    scale = spend[usable].mean(axis=0)
+    scale[scale == 0] = 1
+    X = np.log1p(adstocked.T / scale)[usable]
+    y = np.log(gmv[usable])
+    spread = X.std(axis=0)
+    spread[spread == 0] = 1
+    Z = (X - X.mean(axis=0)) / spread
+    beta = np.linalg.solve(Z.T @ Z + RIDGE_PENALTY * np.eye(Z.shape[1]), Z.T @ (y - y.mean())) / spread
+
+    curves = pd.DataFrame({
+        'weight': np.maximum(beta, 0) * gmv[usable].mean(),
+        'scale': scale,
+        'decay': decay,
+        'carry': adstocked[:, -1]
+    }, index=pd.Index(channels, name='channel'))
+    return curves
+
+def plan_response(curves, spend):
+    """Response per (channel, period) of a (channels, periods) plan"""
+    weight, scale, decay, carry = (curves[col].to_numpy(float) for col in CURVE_COLUMNS)
+    return weight[:, None] * np.log1p(adstock(np.asarray(spend, dtype=np.float64), decay, carry) / scale[:, None])
+
+def solve_flighting(curves, budget, n_periods, lower, upper, pace_min=None, pace_max=None, x0=None):
+    """Maximize the total response of a (channels, n_periods) plan.
+
+    ``lower`` and ``upper`` are spend bounds per channel and period
+    (broadcast to (channels, periods)); ``pace_min`` and ``pace_max`` bound
+    the total spend of each period.
+    """
+    weight, scale, decay, carry = (curves[col].to_numpy(float) for col in CURVE_COLUMNS)
+    lower, upper = np.asarray(lower, dtype=float), np.asarray(upper, dtype=float)
+    n_channels = len(curves)
+    lower = np.broadcast_to(lower if lower.ndim == 2 else lower[:, None], (n_channels, n_periods))
+    upper = np.broadcast_to(upper if upper.ndim == 2 else upper[:, None], (n_channels, n_periods))
+    pace_min = np.zeros(n_periods) if pace_min is None else np.broadcast_to(np.asarray(pace_min, dtype=float), (n_periods,))
+    pace_max = np.full(n_periods, np.inf) if pace_max is None else np.broadcast_to(np.asarray(pace_max, dtype=float), (n_periods,))
+
+    if not lower.sum() - 1e-9 <= budget <= upper.sum() + 1e-9:
+        raise ValueError(f"Budget {budget:,.2f} is outside the bounds total ({lower.sum():,.2f} to {upper.sum():,.2f})")
+    low_pace, up_pace = np.maximum(pace_min, lower.sum(axis=0)), np.minimum(pace_max, upper.sum(axis=0))
+    if (low_pace > up_pace + 1e-9).any() or not low_pace.sum() - 1e-9 <= budget <= up_pace.sum() + 1e-9:
+        raise ValueError("The pacing limits cannot be met with this budget and these spend bounds")
+
+    # Flattened channel-major: x[c * n_periods + t]
+    shape = (n_channels, n_periods)
+    scale_2d = scale[:, None]
+    weight_2d = weight[:, None]
+    # Responses are in the hundreds of millions; scale them to keep the solver well conditioned
+    norm = max(weight.sum(), 1.0)
+
+    def objective_value(x):
+        A = adstock(x.reshape(shape), decay, carry)
+        return -(weight_2d * np.log1p(A / scale_2d)).sum() / norm
+
+    def objective_grad(x):
+        A = adstock(x.reshape(shape), decay, carry)
+        return -adstock_transpose(weight_2d / (scale_2d + A), decay).ravel() / norm
+
+    def objective_hessp(x, v):
+        A = adstock(x.reshape(shape), decay, carry)
+        curvature = weight_2d / (scale_2d + A) ** 2
+        return adstock_transpose(curvature * adstock(v.reshape(shape), decay), decay).ravel() / norm
+
+    # One budget row and one pacing row per period, as a sparse matrix
+    period_sums = sparse.kron(sparse.csr_matrix(np.ones((1, n_channels))), sparse.identity(n_periods), format='csr')
+    constraints = [opt.LinearConstraint(period_sums, pace_min, pace_max)]
+    # Pacing every period exactly already fixes the total, and a redundant budget row would make the Jacobian singular
+    if not np.allclose(pace_min, pace_max):
+        constraints.append(opt.LinearConstraint(sparse.csr_matrix(np.ones((1, n_channels * n_periods))), budget, budget))
+
+    if x0 is None:
+        # Start from the bounds' midpoint scaled toward the budget
+        x0 = (lower + upper) / 2 if np.isfinite(upper).all() else lower + 1.0
+        x0 = x0 * budget / max(x0.sum(), 1e-12)
+    x0 = np.clip(np.asarray(x0, dtype=float), lower, upper).ravel()
+
+    started = time.perf_counter()
+    result = opt.minimize(objective_value, x0, jac=objective_grad, hessp=objective_hessp, method='trust-constr',
+                          bounds=opt.Bounds(lower.ravel(), upper.ravel()), constraints=constraints,
+                          options={'maxiter': 1000, 'gtol': 1e-8, 'xtol': 1e-10})
+    spend = np.clip(result.x, lower.ravel(), upper.ravel()).reshape(shape)
+    response = plan_response(curves, spend)
+    return {
+        'channels': curves.index.tolist(),
+        'spend': spend,
+        'response': response,
+        'total_spend': float(spend.sum()),
+        'total_response': float(response.sum()),
+        'success': bool(result.status in (1, 2)),
+        'message': str(result.message),
+        'iterations': int(result.nit),
+        'solve_seconds': time.perf_counter() - started
+    }
+
+def main():
+    from utils import load_flighting_inputs
+
+    curves, baseline, dates = load_flighting_inputs()
+    budget = baseline.sum()
+    result = solve_flighting(curves, budget, len(dates), 0.5 * baseline.mean(axis=1), 2 * baseline.mean(axis=1),
+                             0.75 * budget / len(dates), 1.25 * budget / len(dates))
+    plan = pd.DataFrame(result['spend'], index=curves.index, columns=dates.strftime('%Y-%m'))
+    print(plan.round(2).to_string())
+    print(f"Response {result['total_response']:,.0f} vs {plan_response(curves, baseline).sum():,.0f} actual "
+          f"({result['iterations']} iterations, {result['solve_seconds']:.2f}s)")
+
+    # A weekly horizon: weekly decay with the same monthly carryover, weekly spend at a quarter of monthly
+    weekly = curves.assign(decay=curves['decay'] ** 0.25, scale=curves['scale'] / 4, carry=curves['carry'] / 4)
+    base = np.repeat(baseline.mean(axis=1)[:, None] / 4, 52, axis=1)
+    result = solve_flighting(weekly, base.sum(), 52, 0.25 * base, 3 * base, 0.5 * base.sum(axis=0), 1.5 * base.sum(axis=0))
+    print(f"52-week plan, {len(curves)} channels: {result['iterations']} iterations, {result['solve_seconds']:.2f}s, "
+          f"converged: {result['success']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Pre-aggregated hierarchy indexes for drill-down and roll-up.
+
+A hierarchy (channel > campaign > ad set, or country > region > city) is
+stored as one table per depth. Every node of a depth holds its precomputed
+totals and its number of children, and the table is sorted by path. Nothing
+is aggregated at query time:
+
+- drill-down reads the children of one node, pushing the path filter down to
+  Parquet row groups, so the cost is O(children) and only the expanded parts
+  of the tree are ever loaded
+- roll-up reads a node's totals from its parent's children, which were
+  loaded on the way down
+
+Stores are written at ingest from fact files carrying the level and measure
+columns; ingesting a hierarchy again rebuilds it.
+
+Usage:
+    python hierarchy.py ingest campaigns attached_assets/campaigns/*.csv --store attached_assets/hierarchies
+    python hierarchy.py ingest geo attached_assets/geo/*.csv --store attached_assets/hierarchies
+"""
+import argparse
+import json
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Hierarchies the dashboard drills into: levels from the top, and summed measures
+HIERARCHIES = {
+    'campaigns': {'levels': ['Channel', 'Campaign', 'Ad Set'], 'measures': ['Spend']},
+    'geo': {'levels': ['Country', 'Region', 'City'], 'measures': ['GMV']}
+}
+ROW_GROUP_SIZE = 50_000
+
+def level_tables(facts, levels, measures):
+    """Node totals and child counts per depth (0 = the root), each sorted by path"""
+    tables = []
+    for depth in range(len(levels) + 1):
+        path = levels[:depth]
+        if path:
+            table = facts.groupby(path, sort=True, observed=True)[measures].sum().reset_index()
+        else:
+            table = facts[measures].sum().to_frame().T
+        if depth < len(levels):
+            children = facts.groupby(levels[:depth + 1], observed=True).size().reset_index()
+            counts = children.groupby(path, sort=True).size() if path else pd.Series([len(children)])
+            table['Children'] = counts.to_numpy()
+        else:
+            table['Children'] = 0
+        tables.append(table)
+    return tables
+
+def write_store(facts, store_dir, levels, measures):
+    """Write the depth tables of a hierarchy and its manifest"""
+    os.makedirs(store_dir, exist_ok=True)
+    for depth, table in enumerate(level_tables(facts, levels, measures)):
+        table.to_parquet(os.path.join(store_dir, f'depth={depth}.parquet'), index=False, row_group_size=ROW_GROUP_SIZE)
+    with open(os.path.join(store_dir, 'manifest.json'), 'w') as f:
+        json.dump({'levels': levels, 'measures': measures}, f)
+
+class HierarchyIndex:
+    """Lazily expanded tree of pre-aggregated nodes"""
+
+    def __init__(self, levels, measures, read):
+        self.levels = list(levels)
+        self.measures = list(measures)
+        self._read = read
+        self.nodes = {}
+        self.root = None
+
+    @classmethod
+    def from_store(cls, store_dir):
+        """Index over a written store, reading each expanded node's children from disk; None when there is no store"""
+        try:
+            with open(os.path.join(store_dir, 'manifest.json')) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        levels = manifest['levels']
+
+        def read(depth, path):
+            filters = [(level, '==', value) for level, value in zip(levels, path)] or None
+            return pq.read_table(os.path.join(store_dir, f'depth={depth}.parquet'), filters=filters).to_pandas()
+        return cls(levels, manifest['measures'], read)
+
+    @classmethod
+    def from_frame(cls, facts, levels, measures):
+        """Index over facts already in memory, aggregated up front"""
+        tables = level_tables(facts, list(levels), list(measures))
+
+        def read(depth, path):
+            table = tables[depth]
+            for level, value in zip(levels, path):
+                table = table[table[level] == value]
+            return table
+        return cls(levels, measures, read)
+
+    @property
+    def depth(self):
+        return len(self.levels)
+
+    def children(self, path=()):
+        """Totals and child counts of a node's children, indexed by the next level's values"""
+        path = tuple(path)
+        if len(path) >= self.depth:
+            raise ValueError(f"{' > '.join(path)} is a leaf of the {' > '.join(self.levels)} hierarchy")
+        if path not in self.nodes:
+            level = self.levels[len(path)]
+            rows = self._read(len(path) + 1, path)
+            self.nodes[path] = rows.set_index(level)[self.measures + ['Children']]
+        return self.nodes[path]
+
+    def total(self, path=()):
+        """Totals of a node; a roll-up from a node's parent, which drill-down has already expanded"""
+        path = tuple(path)
+        if not path:
+            if self.root is None:
+                self.root = self._read(0, ())[self.measures + ['Children']].iloc[0]
+            return self.root
+        return self.children(path[:-1]).loc[path[-1]]
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a pre-aggregated hierarchy from fact files')
+    parser.add_argument('command', choices=['ingest'])
+    parser.add_argument('hierarchy', choices=list(HIERARCHIES))
+    parser.add_argument('files', nargs='+', help='CSV or Parquet fact files with the hierarchy levels and measures')
+    parser.add_argument('--store', default=os.path.join('attached_assets', 'hierarchies'))
+    args = parser.parse_args()
+
+    spec = HIERARCHIES[args.hierarchy]
+    columns = spec['levels'] + spec['measures']
+    facts = pd.concat([pd.read_parquet(path, columns=columns) if path.endswith('.parquet')
+                       else pd.read_csv(path, usecols=columns) for path in args.files], ignore_index=True)
+    write_store(facts, os.path.join(args.store, args.hierarchy), spec['levels'], spec['measures'])
+    print(f"{args.hierarchy}: {len(facts):,} fact rows aggregated into {len(spec['levels'])} levels")
+
+if __name__ == '__main__':
+    main()
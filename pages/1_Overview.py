@@ -1,13 +1,29 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
 from utils import (
-    load_merged_data, 
+    select_periods, 
     create_monthly_gmv_chart, 
     create_product_category_breakdown,
-    BLUE_PALETTE
+    create_category_area_chart,
+    compute_holiday_impact,
+    create_holiday_impact_chart,
+    compute_order_metrics,
+    compute_forecasts,
+    forecast_controls,
+    load_alerts,
+    anomaly_periods,
+    spike_periods,
+    compute_event_impact,
+    create_event_lift_chart,
+    load_gmv_index,
+    chart_selection,
+    cross_filter_frame,
+    load_hierarchy,
+    category_hierarchy,
+    drilldown_controls,
+    create_drilldown_chart,
+    PRODUCT_CATEGORIES
 )
+from anomalies import SHIFT_RUN, THRESHOLD
 
 # Set page configuration
 st.set_page_config(
@@ -16,8 +32,8 @@ st.set_page_config(
     layout="wide"
 )
 
-# Load data
-df = load_merged_data()
+# Load data for the selected time range and granularity
+df = select_periods()
 
 # Add CSS for rounded corner boxes
 st.markdown("""
@@ -45,94 +61,146 @@ st.markdown("This dashboard provides an overview of GMV and sales data.")
 st.sidebar.header("Filters")
 
 # Add product category filter for GMV charts
-product_categories = ['Camera', 'CameraAccessory', 'EntertainmentSmall', 'GameCDDVD', 'GamingHardware']
 selected_categories = st.sidebar.multiselect(
     "Select Product Categories for GMV Chart",
-    options=product_categories,
-    default=product_categories
+    options=PRODUCT_CATEGORIES,
+    default=PRODUCT_CATEGORIES
 )
 
+forecast_horizon = forecast_controls()
+
+# Cross-filtering: months selected on the GMV trend and categories selected on the breakdown filter the other charts
+gmv_index = load_gmv_index(df)
+selected_months = chart_selection('gmv_trend_selection', df['YearMonth'])
+clicked_categories = chart_selection('category_breakdown_selection', PRODUCT_CATEGORIES)
+categories = [cat for cat in selected_categories if not clicked_categories or cat in clicked_categories]
+cross_filtered = selected_months or clicked_categories
+
 # Top metrics
+_, range_start, range_end = st.session_state['period_selection']
+order_sketch = compute_order_metrics(range_start, range_end)
+
 col1, col2, col3 = st.columns(3)
 
 with col1:
-    total_gmv = df['Total_GMV'].sum()
-    st.metric("Total GMV", f"${total_gmv:,.2f}")
-
-with col2:
-    # Use specific units sold value
-    total_units = 1685242
-    st.metric("Units Sold", f"{total_units:,.0f}")
+    if cross_filtered:
+        total_gmv = cross_filter_frame(gmv_index, selected_months, categories)['Total_GMV'].sum()
+        st.metric("Total GMV", f"${total_gmv:,.2f}", help="GMV of the selected months and categories")
+    else:
+        total_gmv = df['Total_GMV'].sum()
+        st.metric("Total GMV", f"${total_gmv:,.2f}")
 
-with col3:
-    avg_order_value = 2516.44
-    st.metric("Avg. Order Value", f"${avg_order_value:,.2f}")
+if order_sketch is None:
+    # Units and order values need order-level data, which the monthly period data does not have
+    with col2:
+        st.metric("Units Sold", "n/a")
+    
+    with col3:
+        st.metric("Avg. Order Value", "n/a")
+    
+    st.caption("Units sold and order values come from the order sketches of the selected months. "
+               "Ingest order files with `python sketches.py ingest <orders.csv> --store attached_assets/sketches`.")
+else:
+    # Metrics merged from the per-month order sketches of the selected range
+    order_metrics = order_sketch.summary()
+    
+    with col2:
+        st.metric("Units Sold", f"{order_metrics['units']:,.0f}")
+    
+    with col3:
+        st.metric(
+            "Avg. Order Value", f"${order_metrics['avg_order_value']:,.2f}",
+            help=f"Median order value: ${order_metrics['median_order_value']:,.2f} "
+                 f"(±{order_metrics['quantile_error']:.0%})"
+        )
+    
+    st.metric(
+        "Unique Customers", f"≈{order_metrics['distinct_customers']:,.0f}",
+        help=f"HyperLogLog estimate, ±{order_metrics['distinct_customers_error']:.1%} standard error"
+    )
+    
+    with st.expander("Order value quantiles by product category"):
+        st.dataframe(order_sketch.category_quantiles().style.format({
+            'p50': '${:,.2f}', 'p90': '${:,.2f}', 'p99': '${:,.2f}'
+        }), hide_index=True)
+        st.caption(f"Quantiles are within ±{order_metrics['quantile_error']:.0%} of the exact values.")
 
 # Monthly GMV chart
 st.subheader("Monthly GMV Trend")
-gmv_chart = create_monthly_gmv_chart(df, selected_categories)
-st.plotly_chart(gmv_chart, use_container_width=True)
+st.caption("Click, box or lasso months here or categories on the breakdown below to filter the other charts; "
+           "double-click a chart to clear its selection.")
+granularity = st.session_state['period_selection'][0]
+gmv = df[categories].sum(axis=1) if categories else df['Total_GMV']
+alerts = load_alerts()
+# Spikes in the plotted series are left out of the forecast fit
+gmv_spikes = spike_periods(alerts, ['Total_GMV'] + categories, granularity)
+gmv_forecast = compute_forecasts(df.assign(GMV=gmv), ('GMV',), forecast_horizon, granularity, (('GMV', gmv_spikes),))
+gmv_anomalies = anomaly_periods(alerts, ['Total_GMV'] + categories, granularity)
+gmv_chart = create_monthly_gmv_chart(df, categories, gmv_forecast, gmv_anomalies)
+st.plotly_chart(gmv_chart, use_container_width=True, key='gmv_trend_selection',
+                on_select='rerun', selection_mode=('points', 'box', 'lasso'))
+
+with st.expander(f"Anomaly alerts ({len(alerts)})"):
+    st.dataframe(
+        alerts.drop(columns='created').rename(columns=str.title),
+        hide_index=True, use_container_width=True
+    )
+    st.caption(f"Points at least {THRESHOLD:g} robust deviations from a metric's running level are flagged; "
+               f"{SHIFT_RUN} in a row in the same direction mark a level shift.")
+
+# Drill-down from country to region to city, on pre-aggregated totals
+st.subheader("GMV Drill-down by Region")
+
+@st.fragment
+def region_drilldown_section():
+    index = load_hierarchy('geo')
+    if index is None:
+        st.caption("Regional GMV has not been ingested (`python hierarchy.py ingest geo ...`); showing national GMV by category.")
+        index = category_hierarchy(df)
+    path = drilldown_controls(index, 'geo_drilldown')
+    total = index.total(path)
+    st.plotly_chart(create_drilldown_chart(index, path, 'GMV'), use_container_width=True)
+    st.caption(f"{' > '.join(path) or 'All'}: ${total['GMV']:,.2f} GMV across {int(total['Children'])} "
+               f"{index.levels[len(path)].lower()} node(s)")
+
+region_drilldown_section()
 
 # Product Category GMV Breakdown
 st.subheader("GMV Breakdown by Product Category")
-category_chart = create_product_category_breakdown(df, df['YearMonth'].iloc[-1])  # Use latest month
-st.plotly_chart(category_chart, use_container_width=True)
+if selected_months:
+    category_chart = create_product_category_breakdown(cross_filter_frame(gmv_index, selected_months))
+    st.caption(f"Selected periods: {', '.join(selected_months)}")
+else:
+    category_chart = create_product_category_breakdown(df, df['YearMonth'].iloc[-1])  # Use latest month
+st.plotly_chart(category_chart, use_container_width=True, key='category_breakdown_selection',
+                on_select='rerun', selection_mode=('points', 'box', 'lasso'))
 
 # Monthly GMV by Product Category
 st.subheader("Monthly GMV by Product Category")
 
-# Melt the dataframe to get it in the right format for a stacked area chart
-melted_df = pd.melt(
-    df, 
-    id_vars=['YearMonth'], 
-    value_vars=product_categories,
-    var_name='Category', 
-    value_name='GMV'
-)
-
-# Create stacked area chart
-fig = px.area(
-    melted_df, 
-    x='YearMonth', 
-    y='GMV', 
-    color='Category',
-    title='Monthly GMV by Product Category',
-    color_discrete_sequence=BLUE_PALETTE
-)
-
-fig.update_layout(
-    plot_bgcolor='white',
-    xaxis_title='Month',
-    yaxis_title='GMV',
-    hovermode='x unified',
-    legend_title='Product Category'
-)
-
+if cross_filtered:
+    fig = create_category_area_chart(cross_filter_frame(gmv_index, selected_months, categories), categories)
+else:
+    fig = create_category_area_chart(df)
 st.plotly_chart(fig, use_container_width=True)
 
 # Holiday Impact Analysis
 st.subheader("Holiday Impact on GMV")
 
-# Group by 'Has Holiday' and calculate mean GMV
-holiday_impact = df.groupby('Has Holiday')['Total_GMV'].mean().reset_index()
-holiday_impact['Has Holiday'] = holiday_impact['Has Holiday'].map({0: 'No Holiday', 1: 'Holiday'})
-
-fig = px.bar(
-    holiday_impact, 
-    x='Has Holiday', 
-    y='Total_GMV',
-    color='Has Holiday',
-    title='Average GMV: Holiday vs. Non-Holiday Periods',
-    color_discrete_sequence=[BLUE_PALETTE[0], BLUE_PALETTE[2]]
-)
-
-fig.update_layout(
-    plot_bgcolor='white',
-    xaxis_title='',
-    yaxis_title='Average GMV',
-    hovermode='closest',
-    showlegend=False
-)
+# Event uplift adjusted for spend and trend, leaving out periods with anomalous spikes
+excluded_periods = spike_periods(alerts, ['Total_GMV'] + PRODUCT_CATEGORIES, granularity)
+event_impact = compute_event_impact(df, tuple(['Total_GMV'] + categories), excluded_periods)
+adjusted = event_impact.dropna(subset=['Lift']).set_index(['Event', 'Series'])
+
+if cross_filtered:
+    # GMV of the selected months and categories, with each period's holiday flag
+    holiday_df = df[['YearMonth', 'Has Holiday']].merge(
+        cross_filter_frame(gmv_index, selected_months, categories)[['YearMonth', 'Total_GMV']], on='YearMonth'
+    )
+else:
+    holiday_df = df
+holiday_impact = compute_holiday_impact(holiday_df)
+fig = create_holiday_impact_chart(holiday_impact)
 
 col1, col2 = st.columns([2, 1])
 
@@ -141,8 +209,10 @@ with col1:
 
 with col2:
     # Calculate and display holiday impact statistics
-    holiday_gmv = holiday_impact[holiday_impact['Has Holiday'] == 'Holiday']['Total_GMV'].values[0]
-    non_holiday_gmv = holiday_impact[holiday_impact['Has Holiday'] == 'No Holiday']['Total_GMV'].values[0]
+    # A narrow date range may contain only holiday or only non-holiday periods
+    holiday_means = holiday_impact.set_index('Has Holiday')['Total_GMV']
+    holiday_gmv = holiday_means.get('Holiday', 0)
+    non_holiday_gmv = holiday_means.get('No Holiday', 0)
     
     if non_holiday_gmv > 0:
         impact_pct = ((holiday_gmv - non_holiday_gmv) / non_holiday_gmv) * 100
@@ -155,7 +225,26 @@ with col2:
     - **Holiday GMV**: ${holiday_gmv:,.2f}
     - **Non-Holiday GMV**: ${non_holiday_gmv:,.2f}
     - **Impact**: {impact_pct:.2f}%
-    
-    Holidays have a significant impact on GMV, with an average 
-    increase of {impact_pct:.2f}% compared to non-holiday periods.
     """)
+    
+    # The raw comparison ignores how many days were holidays and how much was spent
+    if ('Holiday', 'Total_GMV') in adjusted.index:
+        holiday_lift = adjusted.loc[('Holiday', 'Total_GMV')]
+        st.markdown(
+            f"Adjusted for marketing spend, trend and sale days, a holiday day has "
+            f"**{holiday_lift['Lift']:+.1f}%** GMV (±{holiday_lift['Lift Error'] * 1.96:.1f} points) "
+            f"compared to a regular day."
+        )
+
+# Per-category uplift of holidays and sale days
+st.subheader("Event Lift by Product Category")
+
+if adjusted.empty:
+    st.info("The selected range has too few periods to estimate event lift.")
+else:
+    st.plotly_chart(create_event_lift_chart(adjusted.reset_index()), use_container_width=True)
+    st.caption(
+        "Each period with an event is matched to the most similar period (trend, spend, other events) with less of it, "
+        "and the remaining differences are regression-adjusted. Error bars are 95% intervals"
+        + (f"; anomalous periods left out: {', '.join(excluded_periods)}." if len(excluded_periods) else ".")
+    )
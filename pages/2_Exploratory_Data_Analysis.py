@@ -1,14 +1,14 @@
 import streamlit as st
-import plotly.express as px
-import pandas as pd
 from utils import (
-    load_merged_data,
+    select_periods,
+    covariate_columns,
+    WEATHER_COLUMNS,
     create_correlation_heatmap,
     create_nps_gmv_chart,
     create_stock_gmv_chart,
     create_marketing_channel_chart,
     create_weather_correlation_chart,
-    BLUE_PALETTE
+    create_category_trend_chart
 )
 
 # Set page configuration
@@ -18,8 +18,10 @@ st.set_page_config(
     layout="wide"
 )
 
-# Load data
-df = load_merged_data()
+# Load data for the selected time range and granularity
+df = select_periods()
+# Weather columns, plus the columns of any ingested covariate source
+factor_columns = covariate_columns()
 
 # Add CSS for rounded corner boxes
 st.markdown("""
@@ -54,6 +56,11 @@ The scatter plot above shows the relationship between NPS (Net Promoter Score) a
 The trend line indicates the general relationship between customer satisfaction and sales.
 """)
 
+# Stock Index vs GMV Plot
+st.subheader("Stock Index vs GMV")
+stock_gmv_chart = create_stock_gmv_chart(df)
+st.plotly_chart(stock_gmv_chart, use_container_width=True)
+
 
 
 # Marketing Channel Investment
@@ -64,40 +71,7 @@ st.plotly_chart(marketing_chart, use_container_width=True)
 # Monthly GMV Trend by Product Category
 st.subheader("Monthly GMV Trend by Product Category")
 
-# Filter columns for product categories
-product_categories = ['Camera', 'CameraAccessory', 'EntertainmentSmall', 'GameCDDVD', 'GamingHardware']
-
-# Create a DataFrame with product categories over time
-product_df = df[['YearMonth'] + product_categories]
-
-# Melt the DataFrame for plotting
-melted_df = pd.melt(
-    product_df,
-    id_vars=['YearMonth'],
-    value_vars=product_categories,
-    var_name='Category',
-    value_name='GMV'
-)
-
-# Create the line chart
-fig = px.line(
-    melted_df,
-    x='YearMonth',
-    y='GMV',
-    color='Category',
-    title='Monthly GMV by Product Category',
-    color_discrete_sequence=BLUE_PALETTE,
-    markers=True
-)
-
-fig.update_layout(
-    plot_bgcolor='white',
-    xaxis_title='Month',
-    yaxis_title='GMV',
-    hovermode='x unified',
-    legend_title='Product Category'
-)
-
+fig = create_category_trend_chart(df)
 st.plotly_chart(fig, use_container_width=True)
 
 # Create two columns for weather correlation analysis
@@ -106,16 +80,18 @@ col1, col2 = st.columns(2)
 with col1:
     # Weather Factors Correlation with GMV
     st.subheader("Weather Factors Correlation with Total GMV")
-    weather_corr_chart = create_weather_correlation_chart(df)
+    weather_corr_chart = create_weather_correlation_chart(df, factor_columns)
     st.plotly_chart(weather_corr_chart, use_container_width=True)
 
     # Explanation
-    st.markdown("""
+    extra_factors = ''.join(f"\n    - **{col}**: From an ingested covariate source"
+                            for col in factor_columns if col not in WEATHER_COLUMNS)
+    st.markdown(f"""
     These charts show the correlation between various weather factors and total GMV:
     - **tavg**: Average temperature
     - **prcp**: Precipitation
     - **wspd**: Wind speed
-    - **pres**: Atmospheric pressure
+    - **pres**: Atmospheric pressure{extra_factors}
     """)
 
 with col2:
@@ -123,9 +99,7 @@ with col2:
     st.subheader("Weather Correlation Heatmap")
 
     # Select weather-related columns for correlation
-    corr_columns = [
-        'Total_GMV', 'tavg', 'prcp', 'wspd', 'pres'
-    ]
+    corr_columns = ['Total_GMV'] + factor_columns
 
     # Filter out columns that don't exist in the DataFrame
     corr_columns = [col for col in corr_columns if col in df.columns]
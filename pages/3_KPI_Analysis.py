@@ -1,15 +1,26 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
 from utils import (
-    load_merged_data,
+    select_periods,
     create_kpi_time_series,
     create_clv_cac_comparison,
     create_performance_metrics_chart,
     create_nps_stock_chart,
-    BLUE_PALETTE
+    create_procurement_gmv_chart,
+    create_retention_heatmap,
+    create_cohort_clv_chart,
+    create_cohort_cac_chart,
+    compute_order_metrics,
+    compute_cohort_summary,
+    apply_cohort_kpis,
+    load_cohort_activity,
+    load_merged_data,
+    compute_forecasts,
+    forecast_controls,
+    load_alerts,
+    anomaly_periods,
+    spike_periods
 )
+from cohorts import clv_matrix, retention_matrix
 
 # Set page configuration
 st.set_page_config(
@@ -18,67 +29,76 @@ st.set_page_config(
     layout="wide"
 )
 
-# Load data
-df = load_merged_data()
+# Load data for the selected time range and granularity
+df = select_periods()
+granularity, range_start, range_end = st.session_state['period_selection']
+
+# Cohort-based CLV and CAC replace the static columns when order-level data has been ingested
+cohort_activity = load_cohort_activity()
+if not cohort_activity.empty:
+    cohort_summary = compute_cohort_summary(cohort_activity, load_merged_data())
+    df = apply_cohort_kpis(df, cohort_summary, granularity)
 
 # Page title
 st.title("KPI/KRA/KRI Analysis")
 st.markdown("This dashboard analyzes key performance indicators over time.")
 
+# All KPI series are forecast together in one batch
+forecast_horizon = forecast_controls()
+
+# Anomalies are detected on the merged metrics, so cohort-based CLV and CAC are not marked
+alerts = load_alerts()
+marked = ['ROI'] + (['CLV', 'CAC'] if cohort_activity.empty else [])
+kpi_anomalies = {kpi: anomaly_periods(alerts, [kpi] if kpi in marked else [], granularity) for kpi in ['ROI', 'CLV', 'CAC']}
+
+# Spikes are left out of the forecast fits
+kpi_spikes = tuple((kpi, spike_periods(alerts, [kpi], granularity)) for kpi in marked)
+kpi_forecasts = compute_forecasts(df, ('ROI', 'CLV', 'CAC'), forecast_horizon, granularity, kpi_spikes)
+if forecast_horizon and kpi_forecasts.empty:
+    st.caption("Forecasts need a longer range of complete periods.")
+
 # ROAS over time
 st.subheader("ROAS (Return on Ad Spend) Over Time")
-roas_chart = create_kpi_time_series(df, 'ROI', 'Monthly ROAS Trend', 'ROAS')
+roas_chart = create_kpi_time_series(df, 'ROI', 'Monthly ROAS Trend', 'ROAS', kpi_forecasts, kpi_anomalies['ROI'])
 st.plotly_chart(roas_chart, use_container_width=True)
 
 # CLV by month
 st.subheader("Customer Lifetime Value (CLV) by Month")
-clv_chart = create_kpi_time_series(df, 'CLV', 'Monthly CLV Trend', 'CLV')
+clv_chart = create_kpi_time_series(df, 'CLV', 'Monthly CLV Trend', 'CLV', kpi_forecasts, kpi_anomalies['CLV'])
 st.plotly_chart(clv_chart, use_container_width=True)
 
 # Normalized Procurement Performance
 st.subheader("Procurement Performance vs Total GMV")
 
-# Calculate normalized procurement performance
-df['Procurement_Performance_Normalized'] = df['Procurement_Performance'] / df['Procurement_Performance'].max()
-df['GMV_Normalized'] = df['Total_GMV'] / df['Total_GMV'].max()
-
-# Create the dual line chart
-fig = go.Figure()
-
-fig.add_trace(go.Scatter(
-    x=df['YearMonth'],
-    y=df['Procurement_Performance_Normalized'],
-    name='Normalized Procurement Performance',
-    mode='lines+markers',
-    line=dict(color=BLUE_PALETTE[0], width=2),
-    marker=dict(color=BLUE_PALETTE[0], size=8)
-))
-
-fig.add_trace(go.Scatter(
-    x=df['YearMonth'],
-    y=df['GMV_Normalized'],
-    name='Normalized GMV',
-    mode='lines+markers',
-    line=dict(color=BLUE_PALETTE[2], width=2),
-    marker=dict(color=BLUE_PALETTE[2], size=8)
-))
-
-fig.update_layout(
-    title='Normalized Procurement Performance vs GMV',
-    plot_bgcolor='white',
-    xaxis_title='Month',
-    yaxis_title='Normalized Value (0-1)',
-    hovermode='x unified',
-    legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
-)
-
+fig = create_procurement_gmv_chart(df)
 st.plotly_chart(fig, use_container_width=True)
 
 # CAC by month
 st.subheader("Customer Acquisition Cost (CAC) by Month")
-cac_chart = create_kpi_time_series(df, 'CAC', 'Monthly CAC Trend', 'CAC')
+cac_chart = create_kpi_time_series(df, 'CAC', 'Monthly CAC Trend', 'CAC', kpi_forecasts, kpi_anomalies['CAC'])
 st.plotly_chart(cac_chart, use_container_width=True)
 
+# CAC from order sketches, when order-level data has been ingested
+order_sketch = compute_order_metrics(range_start, range_end)
+
+if order_sketch is not None:
+    order_metrics = order_sketch.summary()
+    customers = order_metrics['distinct_customers']
+    customer_error = order_metrics['distinct_customers_error']
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric(
+            "Unique Customers", f"≈{customers:,.0f}",
+            help=f"HyperLogLog estimate, ±{customer_error:.1%} standard error"
+        )
+    with col2:
+        blended_cac = df['Total Investment'].sum() / customers
+        st.metric(
+            "Blended CAC (spend / unique customers)", f"${blended_cac:,.2f}",
+            help=f"±{customer_error:.1%}, inherited from the customer count estimate"
+        )
+
 # CLV vs CAC Comparison
 st.subheader("CLV vs CAC Comparison")
 clv_cac_chart = create_clv_cac_comparison(df)
@@ -94,6 +114,29 @@ The chart above compares Customer Lifetime Value (CLV) with Customer Acquisition
 A higher CLV/CAC ratio indicates more efficient customer acquisition and better long-term profitability.
 """)
 
+if not cohort_activity.empty:
+    # Acquisition cohorts starting in the selected range
+    st.subheader("Acquisition Cohorts")
+    in_range = cohort_summary[cohort_summary['Date'].between(range_start, range_end)]
+    
+    if in_range.empty:
+        st.info("No acquisition cohorts start in the selected date range.")
+    else:
+        cohorts_in_range = in_range['Cohort'].tolist()
+        fig = create_retention_heatmap(retention_matrix(cohort_activity).loc[cohorts_in_range])
+        st.plotly_chart(fig, use_container_width=True)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            fig = create_cohort_clv_chart(clv_matrix(cohort_activity).loc[cohorts_in_range])
+            st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            fig = create_cohort_cac_chart(in_range)
+            st.plotly_chart(fig, use_container_width=True)
+        
+        st.caption("CLV is cumulative GMV per acquired customer up to the latest ingested month; "
+                   "CAC is the acquisition month's spend per new customer, split by channel spend share.")
+
 # Delivery and Procurement Performance
 st.subheader("Delivery and Procurement Performance")
 performance_chart = create_performance_metrics_chart(df)
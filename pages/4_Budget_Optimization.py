@@ -1,11 +1,38 @@
 import streamlit as st
-import plotly.graph_objects as go
-import pandas as pd
-import numpy as np
-import plotly.express as px
-
-# Blue color palette
-BLUE_PALETTE = ['#0D2A63', '#2073BC', '#2196f3', '#64b5f6', '#bbdefb']
+from utils import (
+    load_merged_data,
+    load_revenue_periods,
+    load_spend_plan_comparison,
+    load_robyn_budget_allocation,
+    load_robyn_max_response,
+    load_robyn_target_efficiency,
+    load_response_curves,
+    load_calibrated_response_curves,
+    load_experiment_results,
+    load_feature_attributions,
+    load_backtest,
+    snapshot_label,
+    compare_snapshots,
+    compute_flighting_plan,
+    load_hierarchy,
+    channel_hierarchy,
+    drilldown_controls,
+    create_drilldown_chart,
+    create_monthly_revenue_chart,
+    create_month_revenue_grid,
+    create_spend_plan_comparison_chart,
+    create_robyn_budget_comparison_chart,
+    create_allocation_result_chart,
+    create_experiment_lift_chart,
+    create_feature_importance_chart,
+    create_budget_comparison_chart,
+    create_flighting_chart,
+    create_snapshot_allocation_chart,
+    period_controls,
+    slice_periods
+)
+from allocator import OBJECTIVES, optimize
+from snapshots import list_versions
 
 # Set page configuration
 st.set_page_config(
@@ -39,335 +66,275 @@ st.markdown("""
 # Page title
 st.title("Budget Optimization Analysis")
 
-# Big number metrics for model comparison
-col1, col2 = st.columns(2)
-
-with col1:
-    st.metric("Optym Model Revenue Improvement", "32.44%", delta="Better performance")
+# Big number metrics for model comparison, from the rolling-origin backtest of each recommendation
+backtest_folds, backtest_summary = load_backtest()
+backtest = backtest_summary.set_index('Model')
 
-with col2:
-    st.metric("Robyn Model Revenue Improvement", "31.90%", delta="Strong performance")
+col1, col2 = st.columns(2)
 
-# Load monthly revenue data
-revenue_data = pd.read_csv('attached_assets/overall_revenue_monthly.csv')
-revenue_data['month'] = ['March', 'April', 'May', 'June']
+for col, model in [(col1, 'Optym'), (col2, 'Robyn MMM')]:
+    with col:
+        if model in backtest.index:
+            result = backtest.loc[model]
+            st.metric(
+                f"{model.split()[0]} Model Revenue Improvement", f"{result['Realized Lift']:.2f}%",
+                delta=f"{result['Realized Lift'] - result['Predicted Lift']:+.2f} pts vs predicted {result['Predicted Lift']:.2f}%",
+                help=f"Mean lift over {int(result['Folds'])} held-out months of the backtest"
+            )
 
-# Create four bar charts, one for each month
-st.subheader("Monthly Revenue Comparison: Baseline vs Optimized")
+st.subheader("Backtested Revenue Improvement")
 
-# Create a combined chart for all months
-fig = go.Figure()
-
-# Add baseline bars
-fig.add_trace(go.Bar(
-    x=revenue_data['month'],
-    y=revenue_data['baseline'],
-    name='Baseline',
-    marker_color=BLUE_PALETTE[0],
-    text=revenue_data['baseline'].round(1),
-    textposition='auto'
-))
-
-# Add optimized bars
-fig.add_trace(go.Bar(
-    x=revenue_data['month'],
-    y=revenue_data['optimized'],
-    name='Optimized',
-    marker_color=BLUE_PALETTE[1],
-    text=revenue_data['optimized'].round(1),
-    textposition='auto'
-))
-
-# Add percentage labels
-for i, row in revenue_data.iterrows():
-    improvement_pct = (row['optimized'] - row['baseline']) / row['baseline'] * 100
+if backtest_summary.empty:
+    st.info("Not enough history to backtest the recommendations.")
+else:
+    fig = create_budget_comparison_chart(backtest_summary, 'Predicted vs Realized Revenue Improvement')
+    st.plotly_chart(fig, use_container_width=True)
     
-    # Create a percentage label with a box around it
-    fig.add_annotation(
-        x=row['month'],
-        y=row['optimized'] + 30,  # Position above the optimized bar
-        text=f"{improvement_pct:.1f}%",
-        showarrow=False,
-        font=dict(size=12, color="black"),
-        bgcolor="white",
-        bordercolor="#2196f3",
-        borderwidth=2,
-        borderpad=4,
-        opacity=0.8
-    )
+    with st.expander("Backtest details"):
+        st.markdown(
+            "Each model's recommended spend multipliers are replayed on held-out months. For every origin, a response "
+            "model fitted only on earlier months scores the recommended against the actual spend."
+        )
+        st.dataframe(backtest_summary.style.format(precision=2), hide_index=True, use_container_width=True)
+        st.dataframe(backtest_folds.style.format(precision=3), hide_index=True, use_container_width=True)
 
-# Update layout
-fig.update_layout(
-    barmode='group',
-    plot_bgcolor='white',
-    font=dict(family="Arial", size=12),
-    legend=dict(
-        orientation="h",
-        yanchor="bottom",
-        y=1.02,
-        xanchor="right",
-        x=1
-    ),
-    margin=dict(l=50, r=50, t=80, b=50),
-    yaxis=dict(
-        title="Revenue",
-        gridcolor='lightgrey',
-        zerolinecolor='lightgrey'
-    ),
-    xaxis=dict(
-        title="Month",
-        tickfont=dict(size=14)
-    ),
-    height=500
-)
+# Global time range and granularity
+granularity, start, end = period_controls(load_merged_data()['Date'])
 
-st.plotly_chart(fig, use_container_width=True)
+# Load plan revenue data for the selected range
+revenue_data = slice_periods(load_revenue_periods(granularity), start, end)
 
-# Separate charts for individual months
-cols = st.columns(4)
-months = ['March', 'April', 'May', 'June']
+# Create one bar chart per period
+st.subheader("Monthly Revenue Comparison: Baseline vs Optimized")
 
-for i, (col, month) in enumerate(zip(cols, months)):
-    with col:
-        monthly_data = revenue_data[revenue_data['month'] == month].iloc[0]
-        
-        # Create individual chart
-        fig = go.Figure()
-        
-        # Add baseline bar
-        fig.add_trace(go.Bar(
-            x=['Baseline'],
-            y=[monthly_data['baseline']],
-            marker_color=BLUE_PALETTE[0],
-            width=0.4,
-            text=[round(monthly_data['baseline'], 1)],
-            textposition='auto'
-        ))
-        
-        # Add optimized bar
-        fig.add_trace(go.Bar(
-            x=['Optimized'],
-            y=[monthly_data['optimized']],
-            marker_color=BLUE_PALETTE[1],
-            width=0.4,
-            text=[round(monthly_data['optimized'], 1)],
-            textposition='auto'
-        ))
-        
-        # Calculate improvement percentage
-        improvement_pct = (monthly_data['optimized'] - monthly_data['baseline']) / monthly_data['baseline'] * 100
-        
-        # Add percentage label
-        fig.add_annotation(
-            x=0.5,
-            y=monthly_data['optimized'] + (monthly_data['optimized'] * 0.1),
-            text=f"{improvement_pct:.1f}%",
-            showarrow=False,
-            font=dict(size=12, color="black"),
-            bgcolor="white",
-            bordercolor="#2196f3",
-            borderwidth=2,
-            borderpad=4,
-            opacity=0.8
-        )
-        
-        # Update layout
-        fig.update_layout(
-            title=month,
-            plot_bgcolor='white',
-            showlegend=False,
-            margin=dict(l=10, r=10, t=40, b=10),
-            height=250,
-            yaxis=dict(
-                gridcolor='lightgrey',
-                zerolinecolor='lightgrey'
-            )
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+if revenue_data.empty:
+    st.info("The optimization plan has no periods in the selected date range.")
+else:
+    # Create a combined chart for all periods
+    fig = create_monthly_revenue_chart(revenue_data)
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Small charts for individual periods, sent as one figure with a shared layout
+    fig = create_month_revenue_grid(revenue_data)
+    st.plotly_chart(fig, use_container_width=True)
 
 # Channel Budget Allocation Chart
 st.subheader("Optym Model: Average Channel Budget Allocation")
 
-# Load data from merged_file.csv
-df = pd.read_csv('attached_assets/merged_file.csv')
-
-# Get the latest date's data
-latest_date = df['Unnamed: 0_baseline'].iloc[0]
-baseline_data = df[df['Unnamed: 0_baseline'] == latest_date].iloc[0]
-optimized_data = df[df['Unnamed: 0_optimized'] == latest_date].iloc[0]
-
-# Create channel names list (excluding Total and Unnamed columns)
-channels = [col.replace('_baseline', '') for col in df.columns if col.endswith('_baseline') 
-           and not col.startswith('Unnamed') and not col.startswith('Total')]
-
-# Create the grouped bar chart
-fig = go.Figure()
-
-# Add baseline bars
-fig.add_trace(go.Bar(
-    name='Baseline',
-    x=channels,
-    y=[baseline_data[f'{channel}_baseline'] for channel in channels],
-    marker_color='#2073BC',
-    opacity=0.8
-))
-
-# Add optimized bars
-fig.add_trace(go.Bar(
-    name='Optimized',
-    x=channels,
-    y=[optimized_data[f'{channel}_optimized'] for channel in channels],
-    marker_color='#2196f3',
-    opacity=0.8
-))
-
-# Update layout
-fig.update_layout(
-    barmode='group',
-    height=500,
-    margin=dict(l=50, r=50, t=50, b=50),
-    showlegend=True,
-    legend=dict(
-        orientation="h",
-        yanchor="bottom",
-        y=1.02,
-        xanchor="right",
-        x=1
-    ),
-    xaxis_title="Marketing Channels",
-    yaxis_title="Budget Allocation ($)",
-    plot_bgcolor='white',
-    paper_bgcolor='white',
-    font=dict(
-        size=12,
-        color='#333333'
-    )
-)
+# Load data from merged_file.csv, keeping plan dates in the selected range
+df = slice_periods(load_spend_plan_comparison(), start, end)
 
-# Update axes
-fig.update_xaxes(
-    showgrid=False,
-    gridwidth=1,
-    gridcolor='LightGrey'
-)
-
-fig.update_yaxes(
-    showgrid=True,
-    gridwidth=1,
-    gridcolor='LightGrey'
-)
-
-# Display the chart
-st.plotly_chart(fig, use_container_width=True)
+if df.empty:
+    st.info("The optimization plan has no periods in the selected date range.")
+else:
+    fig = create_spend_plan_comparison_chart(df)
+    
+    # Display the chart
+    st.plotly_chart(fig, use_container_width=True)
+
+# Drill-down from channel to campaign to ad set, on pre-aggregated totals
+st.subheader("Spend Drill-down by Campaign")
+
+@st.fragment
+def campaign_drilldown_section():
+    index = load_hierarchy('campaigns')
+    if index is None:
+        st.caption("Campaign spend has not been ingested (`python hierarchy.py ingest campaigns ...`); "
+                   "showing spend by channel for the selected range.")
+        index = channel_hierarchy(slice_periods(load_merged_data(), start, end))
+    path = drilldown_controls(index, 'campaign_drilldown')
+    total = index.total(path)
+    st.plotly_chart(create_drilldown_chart(index, path, 'Spend'), use_container_width=True)
+    st.caption(f"{' > '.join(path) or 'All'}: {total['Spend']:,.2f} spend across {int(total['Children'])} "
+               f"{index.levels[len(path)].lower()} node(s)")
+
+campaign_drilldown_section()
 
 # Chart 1: Robyn Model Channel Budget Comparison
 st.subheader("Robyn Model Channel Budget Comparison")
 
 # Load and prepare Robyn budget data
-robyn_budget_data = pd.read_csv('attached_assets/Robyn_marketing_budget_allocation.csv')
-
-# Create clustered bar chart for Robyn channels
-fig1 = go.Figure()
-
-# Add bars for original budget
-fig1.add_trace(go.Bar(
-    x=robyn_budget_data['Channel'],
-    y=robyn_budget_data['Original_Budget'],
-    name='Original Budget',
-    marker_color=BLUE_PALETTE[0],
-    text=robyn_budget_data['Original_Budget'],
-    textposition='outside'
-))
-
-# Add bars for new budget
-fig1.add_trace(go.Bar(
-    x=robyn_budget_data['Channel'],
-    y=robyn_budget_data['New_Budget'],
-    name='New Budget',
-    marker_color=BLUE_PALETTE[1],
-    text=robyn_budget_data['New_Budget'],
-    textposition='outside'
-))
-
-# Update layout
-fig1.update_layout(
-    title='Robyn Model: Channel Budget Comparison',
-    xaxis_title='Marketing Channel',
-    yaxis_title='Budget (Million $)',
-    barmode='group',
-    plot_bgcolor='white',
-    font=dict(color='#424242'),
-    legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
-    margin=dict(l=10, r=10, t=30, b=10),
-    hovermode='x unified',
-    bargap=0.2,
-    bargroupgap=0.1
-)
-
+robyn_budget_data = load_robyn_budget_allocation()
+fig1 = create_robyn_budget_comparison_chart(robyn_budget_data)
 st.plotly_chart(fig1, use_container_width=True)
 
-# Feature Importance chart with slicer
-st.subheader("Product-wise Feature Importance by Marketing Channel")
+# Interactive allocator over the fitted Robyn response curves
+st.subheader("Interactive Budget Allocator")
 
-# Load feature importance data
-feature_data = pd.read_csv('attached_assets/feature_importance_values.csv', index_col=0)
+# Widget changes in this section rerun only the section, so only its chart is sent again
+@st.fragment
+def allocator_section():
+    experiments = load_experiment_results()
+    calibrated = not experiments.empty and st.toggle(
+        "Calibrate curves with experiment lift", value=True, key="allocator_calibrated"
+    )
+    curves = load_calibrated_response_curves() if calibrated else load_response_curves()
+    objective = st.radio(
+        "Objective", OBJECTIVES, horizontal=True,
+        format_func=lambda name: {'max_response': 'Maximize response', 'target_efficiency': 'Target efficiency'}[name]
+    )
+    scenario = load_robyn_max_response() if objective == 'max_response' else load_robyn_target_efficiency()
+    scenario = scenario.set_index('channels').loc[curves.index]
+
+    col1, col2 = st.columns([1, 2])
+
+    low, up = [], []
+    with col2:
+        # Bounds default to the scenario's Robyn constraints, as multipliers of initial spend
+        for channel in curves.index:
+            channel_low, channel_up = st.slider(
+                f"{channel.replace('_', ' ')} spend bounds (× initial)", 0.0, 3.0,
+                (float(scenario.loc[channel, 'constr_low']), float(scenario.loc[channel, 'constr_up'])),
+                step=0.05, key=f"allocator_bounds_{objective}_{channel}"
+            )
+            low.append(channel_low)
+            up.append(channel_up)
+
+    with col1:
+        init_spend = curves['init_spend']
+        if objective == 'max_response':
+            budget = st.number_input(
+                "Budget per period", min_value=0.0,
+                value=float(scenario['total_budget_unit'].iloc[0]), step=1.0, key="allocator_budget"
+            )
+            target_roas = None
+        else:
+            budget = st.number_input(
+                "Maximum budget per period", min_value=0.0,
+                value=float(init_spend.sum()), step=1.0, key="allocator_max_budget"
+            )
+            target_roas = st.number_input(
+                "Target ROAS", min_value=0.0,
+                value=float(scenario['optmResponseUnitTotal'].iloc[0] / scenario['optmSpendUnitTotal'].iloc[0]),
+                step=1e5, format="%.0f", key="allocator_target_roas"
+            )
 
-# Add product selector
-product_options = feature_data.index.tolist()
-product_options.insert(0, "All Products")  # Add "All Products" option
-selected_product = st.selectbox("Select Product Category", product_options)
+    try:
+        result = optimize(curves, budget, low, up, objective, target_roas)
+    except ValueError as e:
+        st.warning(str(e))
+    else:
+        initial_response = curves['init_response'].sum()
+        with col1:
+            st.metric(
+                "Allocated Response", f"{result['total_response']:,.0f}",
+                delta=f"{result['total_response'] / initial_response - 1:.2%} vs initial"
+            )
+            st.metric("Allocated Spend", f"{result['total_spend']:,.2f}")
+            if result['cached']:
+                st.caption("Served from the allocation memo store.")
+            else:
+                start_note = " (warm start from a cached plan)" if result['warm_start'] else ""
+                st.caption(f"Solved in {result['solve_seconds'] * 1000:,.0f} ms{start_note}.")
+            if not result['success']:
+                st.warning(f"The solver did not converge: {result['message']}")
+    
+        fig = create_allocation_result_chart(curves, result)
+        st.plotly_chart(fig, use_container_width=True)
+
+allocator_section()
 
-# Filter data based on selection
-if selected_product == "All Products":
-    # Calculate average across all products
-    feature_importance_data = feature_data.mean().reset_index()
-    feature_importance_data.columns = ['Channel', 'Importance']
+# Geo-lift experiments that calibrate the allocator's curves
+st.subheader("Incrementality Experiments")
+
+experiments = load_experiment_results()
+if experiments.empty:
+    st.info("No geo-lift experiments yet. Ingest one with `python experiments.py ingest` "
+            "to calibrate the allocator's response curves.")
+else:
+    fig = create_experiment_lift_chart(experiments)
+    st.plotly_chart(fig, use_container_width=True)
+    calibration = load_calibrated_response_curves()['calibration']
+    st.caption("Curve multipliers from the experiments: " + ", ".join(
+        f"{channel.replace('_', ' ')} × {multiplier:.2f}" for channel, multiplier in calibration.items()
+    ))
+
+# Multi-period plan with carryover across months
+st.subheader("Phased Budget Plan")
+
+@st.fragment
+def flighting_section():
+    col1, col2 = st.columns([1, 2])
     
-    # Create bar chart for all products
-    fig3 = px.bar(
-        feature_importance_data, 
-        x='Channel', 
-        y='Importance',
-        title='Average Feature Importance Across All Products',
-        color='Importance',
-        color_continuous_scale=px.colors.sequential.Blues,
-        text='Importance'
-    )
+    with col1:
+        budget_share = st.slider("Budget (% of actual spend over the plan months)", 50, 150, 100, step=5, key="flighting_budget")
+        low, up = st.slider("Channel spend bounds (× mean monthly spend)", 0.0, 3.0, (0.5, 2.0), step=0.05, key="flighting_bounds")
+        pace_low, pace_up = st.slider("Monthly pacing (% of an even split)", 0, 200, (75, 125), step=5, key="flighting_pacing")
     
-    fig3.update_traces(
-        texttemplate='%{text:.3f}',
-        textposition='outside'
-    )
-else:
-    # Get data for selected product
-    product_data = feature_data.loc[selected_product].reset_index()
-    product_data.columns = ['Channel', 'Importance']
+    try:
+        plan, result = compute_flighting_plan(budget_share / 100, low, up, pace_low / 100, pace_up / 100)
+    except ValueError as e:
+        st.warning(str(e))
+        return
     
-    # Create bar chart for selected product
-    fig3 = px.bar(
-        product_data, 
-        x='Channel', 
-        y='Importance',
-        title=f'Feature Importance for {selected_product}',
-        color='Importance',
-        color_continuous_scale=px.colors.sequential.Blues,
-        text='Importance'
-    )
+    with col1:
+        actual_response = plan['Actual Response'].sum()
+        st.metric(
+            "Planned Response", f"{result['total_response']:,.0f}",
+            delta=f"{result['total_response'] / actual_response - 1:.2%} vs actual spend"
+        )
+        st.caption(
+            f"All {len(plan)} months solved together in {result['solve_seconds'] * 1000:,.0f} ms; "
+            "spend in a month keeps working in the months after it."
+        )
+        if not result['success']:
+            st.warning(f"The solver did not converge: {result['message']}")
     
-    fig3.update_traces(
-        texttemplate='%{text:.3f}',
-        textposition='outside'
-    )
+    with col2:
+        fig = create_flighting_chart(plan)
+        st.plotly_chart(fig, use_container_width=True)
 
-# Update layout
-fig3.update_layout(
-    plot_bgcolor='white',
-    font=dict(color='#424242'),
-    xaxis_title='Marketing Channel',
-    yaxis_title='Feature Importance',
-    margin=dict(l=10, r=10, t=50, b=10),
-    coloraxis_showscale=False
-)
+flighting_section()
+
+# Feature Importance chart with slicer
+st.subheader("Product-wise Feature Importance by Marketing Channel")
+
+@st.fragment
+def feature_importance_section():
+    # Importance and monthly SHAP values, retrained when the data changes
+    feature_data, shap_values = load_feature_attributions()
+
+    # Add product selector
+    product_options = feature_data.index.tolist()
+    product_options.insert(0, "All Products")  # Add "All Products" option
+    col1, col2 = st.columns(2)
+    with col1:
+        selected_product = st.selectbox("Select Product Category", product_options)
+    with col2:
+        selected_month = st.selectbox("Attribution Month", ["All Months"] + sorted(shap_values, reverse=True))
+
+    if selected_month == "All Months":
+        fig3 = create_feature_importance_chart(feature_data, selected_product)
+    else:
+        fig3 = create_feature_importance_chart(shap_values[selected_month], selected_product, selected_month)
+    st.plotly_chart(fig3, use_container_width=True)
+
+feature_importance_section()
+
+# Compare the KPIs and allocations of two data snapshots
+st.subheader("Snapshot Comparison")
+
+@st.fragment
+def snapshot_comparison_section():
+    versions = list_versions()
+    if len(versions) < 2:
+        st.info("Snapshots are taken by `python snapshots.py commit` after each refresh; compare versions here once there are two.")
+        return
+    
+    labels = {manifest['version']: snapshot_label(manifest) for manifest in versions}
+    options = list(labels)[::-1]
+    col1, col2 = st.columns(2)
+    with col1:
+        version_a = st.selectbox("Snapshot A", options, index=1, format_func=labels.get, key="snapshot_a")
+    with col2:
+        version_b = st.selectbox("Snapshot B", options, index=0, format_func=labels.get, key="snapshot_b")
+    
+    kpis, allocation = compare_snapshots(version_a, version_b)
+    st.dataframe(
+        kpis.style.format('{:,.2f}', na_rep='–'), use_container_width=True,
+        column_config={'A': labels[version_a], 'B': labels[version_b]}
+    )
+    fig = create_snapshot_allocation_chart(allocation, labels[version_a], labels[version_b])
+    st.plotly_chart(fig, use_container_width=True)
 
-st.plotly_chart(fig3, use_container_width=True)
\ No newline at end of file
+snapshot_comparison_section()
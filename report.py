@@ -0,0 +1,234 @@
+"""Headless batch renderer for the dashboard charts.
+
+Builds every chart of every page with the same loaders and ``create_*``
+builders as the live app, without starting a Streamlit server, and exports
+them as static images. Each run produces one bundle directory (plus a zip
+archive) with a manifest describing what was rendered.
+
+Usage:
+    python report.py --tenant default=attached_assets --format png --workers 8
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils import (
+    DATA_DIR,
+    PRODUCT_CATEGORIES,
+    load_merged_data,
+    load_monthly_revenue,
+    load_spend_plan_comparison,
+    load_robyn_budget_allocation,
+    load_feature_importance,
+    create_monthly_gmv_chart,
+    create_product_category_breakdown,
+    create_category_area_chart,
+    compute_holiday_impact,
+    create_holiday_impact_chart,
+    create_nps_gmv_chart,
+    create_stock_gmv_chart,
+    create_marketing_channel_chart,
+    create_category_trend_chart,
+    create_weather_correlation_chart,
+    create_correlation_heatmap,
+    create_kpi_time_series,
+    create_procurement_gmv_chart,
+    create_clv_cac_comparison,
+    create_performance_metrics_chart,
+    create_nps_stock_chart,
+    create_monthly_revenue_chart,
+    create_month_revenue_chart,
+    create_spend_plan_comparison_chart,
+    create_robyn_budget_comparison_chart,
+    create_feature_importance_chart
+)
+
+IMAGE_FORMATS = ['png', 'pdf', 'svg', 'jpeg']
+EXPORT_FORMATS = IMAGE_FORMATS + ['html']
+
+# Default static image size, roughly matching a wide dashboard column
+IMAGE_WIDTH = 1200
+IMAGE_HEIGHT = 600
+
+def section_slug(label):
+    """File-name part of a chart variant, e.g. 'All Products' -> 'all_products'"""
+    return label.lower().replace(' ', '_')
+
+def build_overview_figures(data):
+    """Build the Overview page charts"""
+    df = data['merged']
+    return {
+        'monthly_gmv': create_monthly_gmv_chart(df, PRODUCT_CATEGORIES),
+        'category_breakdown': create_product_category_breakdown(df, df['YearMonth'].iloc[-1]),
+        'category_area': create_category_area_chart(df),
+        'holiday_impact': create_holiday_impact_chart(compute_holiday_impact(df))
+    }
+
+def build_eda_figures(data):
+    """Build the Exploratory Data Analysis page charts"""
+    df = data['merged']
+    corr_columns = [col for col in ['Total_GMV', 'tavg', 'prcp', 'wspd', 'pres'] if col in df.columns]
+    return {
+        'nps_gmv': create_nps_gmv_chart(df),
+        'stock_gmv': create_stock_gmv_chart(df),
+        'marketing_channels': create_marketing_channel_chart(df),
+        'category_trend': create_category_trend_chart(df),
+        'weather_correlation': create_weather_correlation_chart(df),
+        'weather_heatmap': create_correlation_heatmap(df, corr_columns)
+    }
+
+def build_kpi_figures(data):
+    """Build the KPI Analysis page charts"""
+    df = data['merged']
+    return {
+        'roas': create_kpi_time_series(df, 'ROI', 'Monthly ROAS Trend', 'ROAS'),
+        'clv': create_kpi_time_series(df, 'CLV', 'Monthly CLV Trend', 'CLV'),
+        'procurement_gmv': create_procurement_gmv_chart(df),
+        'cac': create_kpi_time_series(df, 'CAC', 'Monthly CAC Trend', 'CAC'),
+        'clv_cac': create_clv_cac_comparison(df),
+        'performance': create_performance_metrics_chart(df),
+        'nps_stock': create_nps_stock_chart(df)
+    }
+
+def build_budget_figures(data):
+    """Build the Budget Optimization page charts, including one feature importance chart per product"""
+    revenue_data = data['monthly_revenue']
+    feature_data = data['feature_importance']
+
+    figures = {'monthly_revenue': create_monthly_revenue_chart(revenue_data)}
+    for month in revenue_data['month']:
+        figures[f'revenue_{section_slug(month)}'] = create_month_revenue_chart(revenue_data, month)
+    figures['spend_plan'] = create_spend_plan_comparison_chart(data['spend_plan'])
+    figures['robyn_budget'] = create_robyn_budget_comparison_chart(data['robyn_budget'])
+    for product in ["All Products"] + feature_data.index.tolist():
+        figures[f'feature_importance_{section_slug(product)}'] = create_feature_importance_chart(feature_data, product)
+    return figures
+
+# Page name -> (figure builder, whether the page depends on the report month)
+PAGE_BUILDERS = {
+    '1_Overview': (build_overview_figures, True),
+    '2_Exploratory_Data_Analysis': (build_eda_figures, True),
+    '3_KPI_Analysis': (build_kpi_figures, True),
+    '4_Budget_Optimization': (build_budget_figures, False)
+}
+
+def load_report_data(data_dir=DATA_DIR, month=None):
+    """Load every dataset used by the pages, keeping merged data up to and including the given month"""
+    merged = load_merged_data(data_dir)
+    if month is not None:
+        merged = merged[merged['YearMonth'] <= month].reset_index(drop=True)
+    return {
+        'merged': merged,
+        'monthly_revenue': load_monthly_revenue(data_dir),
+        'spend_plan': load_spend_plan_comparison(data_dir),
+        'robyn_budget': load_robyn_budget_allocation(data_dir),
+        'feature_importance': load_feature_importance(data_dir)
+    }
+
+def export_figure(fig, path, fmt):
+    """Write a figure to disk as a static image or a standalone HTML file"""
+    if fmt == 'html':
+        fig.write_html(path, include_plotlyjs='cdn')
+    else:
+        fig.write_image(path, format=fmt, width=IMAGE_WIDTH, height=IMAGE_HEIGHT)
+
+def render_job(tenant, data_dir, month, pages, bundle_dir, fmt):
+    """Render the given pages for one tenant and month; runs inside a worker process"""
+    data = load_report_data(data_dir, month)
+    job_dir = os.path.join(bundle_dir, tenant, month or 'static')
+    os.makedirs(job_dir, exist_ok=True)
+
+    files = []
+    for page in pages:
+        builder, _ = PAGE_BUILDERS[page]
+        for section, fig in builder(data).items():
+            path = os.path.join(job_dir, f'{page}__{section}.{fmt}')
+            export_figure(fig, path, fmt)
+            files.append(os.path.relpath(path, bundle_dir))
+    return {'tenant': tenant, 'month': month, 'files': files}
+
+def plan_jobs(tenants, months=None):
+    """Split the run into (tenant, data_dir, month, pages) jobs: one per tenant and month, plus one for month-independent pages"""
+    monthly_pages = [page for page, (_, by_month) in PAGE_BUILDERS.items() if by_month]
+    static_pages = [page for page, (_, by_month) in PAGE_BUILDERS.items() if not by_month]
+
+    jobs = []
+    for tenant, data_dir in tenants.items():
+        tenant_months = months or load_merged_data(data_dir)['YearMonth'].tolist()
+        for month in tenant_months:
+            jobs.append((tenant, data_dir, month, monthly_pages))
+        jobs.append((tenant, data_dir, None, static_pages))
+    return jobs
+
+def check_export_format(fmt):
+    """Fail early when the format needs kaleido and it is not installed"""
+    if fmt in IMAGE_FORMATS and importlib.util.find_spec('kaleido') is None:
+        raise RuntimeError(f"{fmt} export needs the 'kaleido' package (uv sync --extra report, or pip install kaleido), "
+                           "or use --format html")
+
+def run_reports(tenants, output_dir='reports', fmt='png', months=None, workers=None):
+    """Render every page for every tenant and month in parallel and bundle the result; returns the bundle path"""
+    check_export_format(fmt)
+
+    run_id = time.strftime('%Y%m%d-%H%M%S')
+    bundle_dir = os.path.join(output_dir, f'run_{run_id}')
+    os.makedirs(bundle_dir, exist_ok=True)
+
+    jobs = plan_jobs(tenants, months)
+    started = time.time()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_job, *job, bundle_dir, fmt) for job in jobs]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    results.sort(key=lambda r: (r['tenant'], r['month'] or ''))
+    manifest = {
+        'run_id': run_id,
+        'format': fmt,
+        'tenants': tenants,
+        'jobs': len(jobs),
+        'figures': sum(len(r['files']) for r in results),
+        'elapsed_seconds': round(time.time() - started, 2),
+        'reports': results
+    }
+    with open(os.path.join(bundle_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.make_archive(bundle_dir, 'zip', bundle_dir)
+    return bundle_dir
+
+def parse_tenants(values):
+    """Parse NAME=DIR tenant arguments into a dict"""
+    if not values:
+        return {'default': DATA_DIR}
+    tenants = {}
+    for value in values:
+        name, _, data_dir = value.partition('=')
+        tenants[name] = data_dir or DATA_DIR
+    return tenants
+
+def main():
+    parser = argparse.ArgumentParser(description='Render dashboard reports without a Streamlit server')
+    parser.add_argument('--tenant', action='append', metavar='NAME=DIR',
+                        help='Tenant name and its data directory (repeatable, default: the app data directory)')
+    parser.add_argument('--month', action='append', metavar='YYYY-MM',
+                        help='Report month (repeatable, default: every month in the data)')
+    parser.add_argument('--format', default='png', choices=EXPORT_FORMATS)
+    parser.add_argument('--output', default='reports', help='Directory receiving the run bundles')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    args = parser.parse_args()
+    try:
+        check_export_format(args.format)
+    except RuntimeError as e:
+        parser.error(str(e))
+
+    bundle_dir = run_reports(parse_tenants(args.tenant), args.output, args.format, args.month, args.workers)
+    print(f"Report bundle written to {bundle_dir} ({bundle_dir}.zip)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""Shared-memory datasets for multi-process deployments.
+
+One publisher process loads every dataset once and writes it as an
+uncompressed Arrow IPC file under a shared-memory directory (``/dev/shm`` by
+default). Streamlit worker processes started with ``DASHBOARD_SHARED_DATA``
+pointing at that directory memory-map the files instead of reading the CSVs,
+so the page cache holds one copy of the data no matter how many workers run.
+
+Each publish writes a new version directory and then atomically replaces the
+``CURRENT`` pointer, so workers swap to new data on their next load while
+frames they already hold stay valid.
+
+Usage:
+    python shared_data.py publish --root /dev/shm/market-insight
+    python shared_data.py check --root /dev/shm/market-insight   # compare with the files
+    DASHBOARD_SHARED_DATA=/dev/shm/market-insight streamlit run app.py
+"""
+import argparse
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+import pyarrow as pa
+from pandas.util import hash_pandas_object
+
+SHARED_DATA_ROOT = os.environ.get('DASHBOARD_SHARED_DATA')
+DEFAULT_ROOT = '/dev/shm/market-insight'
+# Seconds between checks of the CURRENT pointer in worker processes
+POLL_INTERVAL = 2.0
+
+# Dataset name -> undecorated loader, filled by the shared_loader decorator
+LOADERS = {}
+
+_attached = {'version': None, 'checked': 0.0, 'frames': {}}
+
+def current_version(root):
+    """Return the version stamp the CURRENT pointer refers to, or None if nothing is published"""
+    try:
+        with open(os.path.join(root, 'CURRENT')) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def attach(name, root=None):
+    """Memory-map a published dataset and return it as a DataFrame, or None if it is not available"""
+    root = root or SHARED_DATA_ROOT
+    if root is None:
+        return None
+
+    now = time.monotonic()
+    if now - _attached['checked'] > POLL_INTERVAL:
+        version = current_version(root)
+        if version != _attached['version']:
+            # Frames of the previous version stay valid for callers still holding them
+            _attached['version'] = version
+            _attached['frames'] = {}
+        _attached['checked'] = now
+
+    version = _attached['version']
+    if version is None:
+        return None
+    if name not in _attached['frames']:
+        path = os.path.join(root, version, f'{name}.arrow')
+        if not os.path.exists(path):
+            return None
+        _attached['frames'][name] = read_table(path)
+    # A shallow copy lets callers add columns without touching the shared frame
+    return _attached['frames'][name].copy(deep=False)
+
+def shared_loader(name):
+    """Decorator serving a loader from shared memory when the app runs in shared mode.
+
+    Only calls with the default arguments (the app data directory) are
+    redirected; the undecorated loader stays available as ``loader.read`` and in
+    ``LOADERS`` for the publisher.
+    """
+    def decorator(loader):
+        LOADERS[name] = loader
+        signature = inspect.signature(loader)
+        defaults = {key: param.default for key, param in signature.parameters.items()}
+
+        @functools.wraps(loader)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs).arguments
+            if all(defaults[key] == value for key, value in arguments.items()):
+                shared = attach(name)
+                if shared is not None:
+                    return shared
+            return loader(*args, **kwargs)
+
+        wrapper.read = loader
+        return wrapper
+    return decorator
+
+def read_table(path):
+    """Memory-map a published dataset as a DataFrame"""
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    # split_blocks keeps one block per column so numeric columns wrap the mapped buffers without copying
+    return table.to_pandas(split_blocks=True)
+
+def write_table(df, path):
+    # A RangeIndex is stored as metadata and any other index as columns, so loaders
+    # indexed by name (feature importance by product) read back the same
+    table = pa.Table.from_pandas(df, preserve_index=None)
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return table.nbytes
+
+def publish(root=DEFAULT_ROOT, data_dir=None, keep=2):
+    """Load every registered dataset, write a new version and point CURRENT at it; returns the version"""
+    # Importing utils registers its loaders on the importable module, which is
+    # not this one when the file runs as a script
+    import utils
+    from shared_data import LOADERS as loaders
+
+    data_dir = data_dir or utils.DATA_DIR
+    frames = {name: loader(data_dir) for name, loader in loaders.items()}
+
+    digest = hashlib.blake2b(digest_size=4)
+    for name in sorted(frames):
+        digest.update(name.encode())
+        digest.update(hash_pandas_object(frames[name].astype(str), index=False).values.tobytes())
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{digest.hexdigest()}"
+
+    os.makedirs(root, exist_ok=True)
+    staging = os.path.join(root, f'.{version}.tmp')
+    os.makedirs(staging)
+    manifest = {'version': version, 'data_dir': data_dir, 'created': time.time(), 'datasets': {},
+                'validation': [df.attrs['validation'] for df in frames.values() if 'validation' in df.attrs]}
+    for name, df in frames.items():
+        nbytes = write_table(df, os.path.join(staging, f'{name}.arrow'))
+        manifest['datasets'][name] = {'rows': len(df), 'bytes': nbytes}
+    mismatches = compare(staging, frames)
+    if mismatches:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise RuntimeError('Shared datasets do not read back like the files: '
+                           + '; '.join(f'{name}: {error}' for name, error in mismatches.items()))
+    with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(staging, os.path.join(root, version))
+
+    # Atomically swap the pointer; workers pick the new version up on their next poll
+    pointer = os.path.join(root, '.CURRENT.tmp')
+    with open(pointer, 'w') as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(root, 'CURRENT'))
+
+    prune(root, keep)
+    return version
+
+def compare(version_dir, frames):
+    """Datasets of a version directory that differ from the given frames, with the difference"""
+    mismatches = {}
+    for name, df in frames.items():
+        path = os.path.join(version_dir, f'{name}.arrow')
+        if not os.path.exists(path):
+            mismatches[name] = 'not published'
+            continue
+        try:
+            pd.testing.assert_frame_equal(read_table(path), df)
+        except AssertionError as e:
+            mismatches[name] = str(e).strip().splitlines()[0]
+    return mismatches
+
+def check(root=DEFAULT_ROOT, data_dir=None):
+    """Compare every dataset of the published version with its loader reading the files"""
+    import utils
+    from shared_data import LOADERS as loaders
+
+    version = current_version(root)
+    if version is None:
+        raise RuntimeError(f"Nothing is published under {root}")
+    data_dir = data_dir or utils.DATA_DIR
+    return compare(os.path.join(root, version), {name: loader(data_dir) for name, loader in loaders.items()})
+
+def prune(root, keep):
+    """Remove all but the newest versions; mapped files stay readable until their workers drop them"""
+    versions = sorted(d for d in os.listdir(root) if not d.startswith('.') and os.path.isdir(os.path.join(root, d)))
+    for version in versions[:-keep]:
+        shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+
+def status(root=DEFAULT_ROOT):
+    version = current_version(root)
+    if version is None:
+        return None
+    with open(os.path.join(root, version, 'manifest.json')) as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish dashboard datasets into shared memory')
+    parser.add_argument('command', choices=['publish', 'status', 'check'])
+    parser.add_argument('--root', default=SHARED_DATA_ROOT or DEFAULT_ROOT)
+    parser.add_argument('--data-dir', default=None, help='Asset directory to publish (default: the app data directory)')
+    parser.add_argument('--keep', type=int, default=2, help='Number of versions to keep on disk')
+    args = parser.parse_args()
+
+    if args.command == 'publish':
+        print(f"Published version {publish(args.root, args.data_dir, args.keep)} to {args.root}")
+    elif args.command == 'check':
+        mismatches = check(args.root, args.data_dir)
+        for name, error in mismatches.items():
+            print(f"{name}: {error}")
+        if mismatches:
+            raise SystemExit(1)
+        print("Every shared dataset matches its files")
+    else:
+        print(json.dumps(status(args.root), indent=2))
+
+if __name__ == '__main__':
+    main()
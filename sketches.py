@@ -0,0 +1,244 @@
+"""Mergeable sketches for order-level metrics.
+
+Raw order histories are summarised once at ingest into one sketch bundle per
+month partition. Dashboard metrics for any range of months are then answered
+by merging the bundles, which touches a few kilobytes instead of every order:
+
+- distinct customers: HyperLogLog (relative standard error 1.04 / sqrt(2**p))
+- order value and per-category GMV quantiles: a logarithmic-bucket quantile
+  sketch (DDSketch) with a guaranteed relative error bound
+- order count, GMV and units: exact running sums
+
+Usage:
+    python sketches.py ingest attached_assets/orders/*.csv --store attached_assets/sketches
+"""
+import argparse
+import glob
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+# Columns expected in order files
+ORDER_COLUMNS = ['order_date', 'customer_id', 'category', 'gmv', 'units']
+
+HLL_PRECISION = 14
+QUANTILE_RELATIVE_ACCURACY = 0.01
+
+def hash_values(values):
+    """Deterministic 64-bit hashes of an array of values"""
+    return pd.util.hash_array(np.asarray(values))
+
+def leading_zeros(values):
+    """Count leading zero bits of uint64 values (vectorized binary search)"""
+    values = values.astype(np.uint64)
+    zeros = np.zeros(len(values), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        empty = (values >> np.uint64(64 - shift)) == 0
+        zeros[empty] += shift
+        values = np.where(empty, values << np.uint64(shift), values)
+    zeros[values == 0] += 1
+    return zeros
+
+class HyperLogLog:
+    """Distinct-count sketch; merging is an element-wise max of the registers"""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        remainder = hashes << np.uint64(self.precision)
+        rank = np.minimum(leading_zeros(remainder) + 1, 64 - self.precision + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = np.count_nonzero(self.registers == 0)
+        # Linear counting is more accurate while many registers are still empty
+        if raw <= 2.5 * m and empty:
+            return m * np.log(m / empty)
+        return raw
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+class QuantileSketch:
+    """Relative-error quantile sketch (DDSketch) over logarithmic buckets.
+
+    Any reported quantile is within ``relative_accuracy`` of the exact value
+    (for values above zero). Buckets are stored as a dense count array with an
+    offset, so adding is one bincount and merging is an aligned add.
+    """
+
+    def __init__(self, relative_accuracy=QUANTILE_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+        # Values <= 0 (refunds, free items) are only counted
+        self.non_positive = 0
+        self.count = 0
+
+    def _align(self, low, high):
+        if not len(self.counts):
+            self.offset = low
+            self.counts = np.zeros(high - low + 1, dtype=np.int64)
+            return
+        new_low = min(low, self.offset)
+        new_high = max(high, self.offset + len(self.counts) - 1)
+        if new_low == self.offset and new_high == self.offset + len(self.counts) - 1:
+            return
+        counts = np.zeros(new_high - new_low + 1, dtype=np.int64)
+        counts[self.offset - new_low:self.offset - new_low + len(self.counts)] = self.counts
+        self.offset, self.counts = new_low, counts
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        positive = values[values > 0]
+        self.non_positive += len(values) - len(positive)
+        self.count += len(values)
+        if len(positive):
+            keys = np.ceil(np.log(positive) / np.log(self.gamma)).astype(np.int64)
+            low, high = int(keys.min()), int(keys.max())
+            self._align(low, high)
+            self.counts += np.bincount(keys - self.offset, minlength=len(self.counts))
+        return self
+
+    def merge(self, other):
+        self.non_positive += other.non_positive
+        self.count += other.count
+        if len(other.counts):
+            self._align(other.offset, other.offset + len(other.counts) - 1)
+            start = other.offset - self.offset
+            self.counts[start:start + len(other.counts)] += other.counts
+        return self
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        rank = q * (self.count - 1)
+        if rank < self.non_positive:
+            return 0.0
+        bucket = int(np.searchsorted(np.cumsum(self.counts), rank - self.non_positive, side='right'))
+        bucket = min(bucket, len(self.counts) - 1)
+        return 2 * self.gamma ** (bucket + self.offset) / (self.gamma + 1)
+
+class OrderSketch:
+    """Mergeable summary of the orders in one partition"""
+
+    def __init__(self):
+        self.orders = 0
+        self.gmv = 0.0
+        self.units = 0
+        self.customers = HyperLogLog()
+        self.order_value = QuantileSketch()
+        self.category_gmv = {}
+
+    @classmethod
+    def from_orders(cls, orders):
+        sketch = cls()
+        sketch.orders = len(orders)
+        sketch.gmv = float(orders['gmv'].sum())
+        sketch.units = int(orders['units'].sum())
+        sketch.customers.add_hashes(hash_values(orders['customer_id'].values))
+        sketch.order_value.add(orders['gmv'].values)
+        for category, values in orders.groupby('category')['gmv']:
+            sketch.category_gmv[category] = QuantileSketch().add(values.values)
+        return sketch
+
+    def merge(self, other):
+        self.orders += other.orders
+        self.gmv += other.gmv
+        self.units += other.units
+        self.customers.merge(other.customers)
+        self.order_value.merge(other.order_value)
+        for category, sketch in other.category_gmv.items():
+            self.category_gmv.setdefault(category, QuantileSketch()).merge(sketch)
+        return self
+
+    def summary(self):
+        """Headline metrics with their error bounds (relative, 0 for exact values)"""
+        return {
+            'orders': self.orders,
+            'gmv': self.gmv,
+            'units': self.units,
+            'avg_order_value': self.gmv / self.orders if self.orders else np.nan,
+            'median_order_value': self.order_value.quantile(0.5),
+            'distinct_customers': self.customers.estimate(),
+            'distinct_customers_error': self.customers.relative_error,
+            'quantile_error': self.order_value.relative_accuracy
+        }
+
+    def category_quantiles(self, quantiles=(0.5, 0.9, 0.99)):
+        """Order value quantiles per category as a DataFrame"""
+        rows = []
+        for category, sketch in sorted(self.category_gmv.items()):
+            rows.append([category] + [sketch.quantile(q) for q in quantiles])
+        return pd.DataFrame(rows, columns=['Category'] + [f'p{int(q * 100)}' for q in quantiles])
+
+def ingest_orders(orders, store_dir):
+    """Sketch every month partition of an orders frame and write one bundle per partition"""
+    orders = orders[ORDER_COLUMNS].copy()
+    orders['order_date'] = pd.to_datetime(orders['order_date'])
+    os.makedirs(store_dir, exist_ok=True)
+
+    written = []
+    for period, partition_orders in orders.groupby(orders['order_date'].dt.to_period('M')):
+        partition = period.strftime('%Y-%m')
+        path = os.path.join(store_dir, f'{partition}.pkl')
+        sketch = OrderSketch.from_orders(partition_orders)
+        # Re-ingesting a partition adds the new orders to what is already stored
+        if os.path.exists(path):
+            sketch = read_partition(path).merge(sketch)
+        with open(path, 'wb') as f:
+            pickle.dump(sketch, f, protocol=pickle.HIGHEST_PROTOCOL)
+        written.append(partition)
+    return written
+
+def read_partition(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def read_store(store_dir):
+    """Load every partition bundle of a store, keyed by 'YYYY-MM'"""
+    if not os.path.isdir(store_dir):
+        return {}
+    return {
+        os.path.basename(path)[:-len('.pkl')]: read_partition(path)
+        for path in sorted(glob.glob(os.path.join(store_dir, '*.pkl')))
+    }
+
+def merge_partitions(store, partitions):
+    """Merge the bundles of the given partitions; returns None when none of them is sketched"""
+    merged = None
+    for partition in partitions:
+        if partition in store:
+            merged = (merged or OrderSketch()).merge(store[partition])
+    return merged
+
+def main():
+    parser = argparse.ArgumentParser(description='Sketch order files into per-month partitions')
+    parser.add_argument('command', choices=['ingest'])
+    parser.add_argument('files', nargs='+', help='Order CSV files with columns ' + ', '.join(ORDER_COLUMNS))
+    parser.add_argument('--store', default=os.path.join('attached_assets', 'sketches'))
+    args = parser.parse_args()
+
+    for path in args.files:
+        partitions = ingest_orders(pd.read_csv(path), args.store)
+        print(f"{path}: sketched partitions {', '.join(partitions)}")
+
+if __name__ == '__main__':
+    main()
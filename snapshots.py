@@ -0,0 +1,279 @@
+"""Versioned snapshots of the data directory with time-travel checkouts.
+
+Each snapshot records every file of the data directory (``final_merged.csv``,
+the optimization outputs, the ingested stores) as an immutable version
+manifest. Tables (CSV and Parquet) are split into content-defined
+partitions: a partition ends after each row whose hash is a multiple of
+``PARTITION_ROWS`` (so partitions average that many rows), capped at
+``MAX_PARTITION_ROWS``. Boundaries depend only on the rows around them, so
+inserting, deleting or editing rows only changes the partitions holding
+those rows. Each partition is stored once as a Parquet object named by the
+hash of its content; other files are stored whole the same way. A new
+snapshot only writes the objects that changed, so unchanged partitions are
+shared by every version that contains them and the store grows with the
+deltas between refreshes, not with the size of the data.
+
+Snapshots are taken explicitly, by ``python snapshots.py commit`` after each
+refresh of the data (e.g. as the last step of the ingest job); the app only
+reads them.
+
+Versions are append-only and named by their UTC creation time, so "as of"
+a date or time means the last version created at or before it. A version is
+opened by checking it out into a directory with the original file layout:
+tables are rebuilt from their partitions and other files are hard links to
+the stored objects. Only the ``CHECKOUTS_KEPT`` most recently used
+checkouts are kept. The dashboard's loaders read a checkout like the live
+data directory (``?as_of=<version or date>`` in the app's URL).
+
+Usage:
+    python snapshots.py commit --note "March refresh"   # after each refresh of the data
+    python snapshots.py list
+    python snapshots.py checkout 2024-06-30            # path of the data as of a date
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import stat
+import time
+
+import numpy as np
+import pandas as pd
+
+STORE_ROOT = os.environ.get(
+    'DASHBOARD_SNAPSHOTS', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'snapshots')
+)
+PARTITION_ROWS = 32
+MAX_PARTITION_ROWS = 8 * PARTITION_ROWS
+# Checked-out versions kept on disk, most recently used first
+CHECKOUTS_KEPT = int(os.environ.get('DASHBOARD_SNAPSHOT_CHECKOUTS', 4))
+TABLE_FORMATS = ('.csv', '.parquet')
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+# Parsed version manifests, reread when the files in the versions directory change
+_versions = {}
+
+def object_path(store_dir, digest, suffix):
+    return os.path.join(store_dir, 'objects', digest[:2], f'{digest}{suffix}')
+
+def put_object(store_dir, digest, suffix, write):
+    """Store an object unless it is already there; objects are never rewritten"""
+    path = object_path(store_dir, digest, suffix)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        staging = f'{path}.{os.getpid()}.tmp'
+        write(staging)
+        # Checkouts hard-link the objects, so neither side may be edited in place
+        os.chmod(staging, READ_ONLY)
+        os.replace(staging, path)
+    return digest
+
+def read_table(path):
+    """(frame, header as written) of a table file.
+
+    CSV cells are kept as their text, so a checkout reads back exactly like
+    the original, and the header is kept because pandas renames empty names.
+    """
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path), None
+    with open(path, newline='') as f:
+        header = next(csv.reader(f), [])
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return df, header if len(header) == len(df.columns) else None
+
+def partition_digest(part):
+    values = pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes()
+    schema = json.dumps([[str(column), str(dtype)] for column, dtype in part.dtypes.items()]).encode()
+    return hashlib.blake2b(schema + values, digest_size=16).hexdigest()
+
+def file_digest(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def partition_bounds(df):
+    """(start, stop) rows of a table's content-defined partitions"""
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    cuts = (np.flatnonzero(hashes % PARTITION_ROWS == 0) + 1).tolist()
+    if not cuts or cuts[-1] != len(df):
+        cuts.append(len(df))
+    bounds, start = [], 0
+    for cut in cuts:
+        # Long runs without a boundary are split at the cap
+        while cut - start > MAX_PARTITION_ROWS:
+            bounds.append((start, start + MAX_PARTITION_ROWS))
+            start += MAX_PARTITION_ROWS
+        if cut > start or not bounds:
+            bounds.append((start, cut))
+            start = cut
+    return bounds
+
+def snapshot_entry(store_dir, path):
+    """Manifest entry of one file, storing the objects it needs"""
+    if path.endswith(TABLE_FORMATS):
+        df, header = read_table(path)
+        partitions = []
+        for start, stop in partition_bounds(df):
+            part = df.iloc[start:stop].reset_index(drop=True)
+            digest = partition_digest(part)
+            partitions.append(put_object(store_dir, digest, '.parquet', lambda target: part.to_parquet(target, index=False)))
+        return {'kind': 'table', 'header': header, 'partitions': partitions, 'rows': len(df)}
+    digest = file_digest(path)
+    put_object(store_dir, digest, '.blob', lambda target: shutil.copyfile(path, target))
+    return {'kind': 'blob', 'object': digest, 'bytes': os.path.getsize(path)}
+
+def list_versions(store_dir=STORE_ROOT):
+    """Manifests of every version, oldest first"""
+    versions_dir = os.path.join(store_dir, 'versions')
+    try:
+        names = tuple(sorted(name for name in os.listdir(versions_dir) if name.endswith('.json')))
+    except FileNotFoundError:
+        return []
+    cached = _versions.get(versions_dir)
+    if cached is None or cached[0] != names:
+        manifests = []
+        for name in names:
+            with open(os.path.join(versions_dir, name)) as f:
+                manifests.append(json.load(f))
+        # Version ids only have whole seconds, so order by the exact creation time
+        manifests.sort(key=lambda manifest: manifest['created'])
+        cached = _versions[versions_dir] = (names, manifests)
+    return list(cached[1])
+
+def commit(data_dir, store_dir=STORE_ROOT, note=''):
+    """Snapshot the data directory; returns the new version, or the latest one when nothing changed"""
+    store_dir = os.path.abspath(store_dir)
+    files = {}
+    for root, dirs, names in os.walk(data_dir):
+        # Never snapshot the store into itself
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != store_dir)
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            files[os.path.relpath(path, data_dir)] = snapshot_entry(store_dir, path)
+
+    versions = list_versions(store_dir)
+    if versions and versions[-1]['files'] == files:
+        return versions[-1]['version']
+    created = time.time()
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(created))
+    version = f"{stamp}-{hashlib.blake2b(json.dumps(files, sort_keys=True).encode(), digest_size=4).hexdigest()}"
+    manifest = {'version': version, 'created': created, 'note': note, 'files': files}
+    os.makedirs(os.path.join(store_dir, 'versions'), exist_ok=True)
+    path = os.path.join(store_dir, 'versions', f'{version}.json')
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(f'{path}.tmp', path)
+    return version
+
+def resolve(as_of, store_dir=STORE_ROOT):
+    """Version named by ``as_of``: a version id, or the last version created at or before a date or time"""
+    versions = list_versions(store_dir)
+    for manifest in versions:
+        if manifest['version'] == as_of:
+            return as_of
+    try:
+        moment = pd.Timestamp(as_of)
+    except ValueError:
+        raise ValueError(f"{as_of!r} is neither a snapshot version nor a date") from None
+    if moment.tzinfo is None:
+        moment = moment.tz_localize('UTC')
+    if len(as_of) <= len('YYYY-MM-DD'):
+        # A bare date includes the whole day
+        moment += pd.Timedelta(days=1) - pd.Timedelta(1)
+    earlier = [manifest['version'] for manifest in versions if manifest['created'] <= moment.timestamp()]
+    if not earlier:
+        raise ValueError(f"No snapshot was taken as of {as_of}")
+    return earlier[-1]
+
+def link_object(source, path):
+    """Hard-link a stored object into a checkout, copying where links are not supported"""
+    try:
+        os.link(source, path)
+    except OSError:
+        shutil.copyfile(source, path)
+
+def checkout(version, store_dir=STORE_ROOT, keep=CHECKOUTS_KEPT):
+    """Directory holding a version's files in their original layout, written on first use"""
+    target = os.path.join(store_dir, 'checkouts', version)
+    if os.path.isdir(target):
+        # The modification time orders checkouts by last use for eviction
+        os.utime(target)
+        return target
+    with open(os.path.join(store_dir, 'versions', f'{version}.json')) as f:
+        manifest = json.load(f)
+
+    staging = f'{target}.{os.getpid()}.tmp'
+    for relpath, entry in manifest['files'].items():
+        path = os.path.join(staging, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if entry['kind'] == 'blob':
+            link_object(object_path(store_dir, entry['object'], '.blob'), path)
+            continue
+        df = pd.concat([pd.read_parquet(object_path(store_dir, digest, '.parquet')) for digest in entry['partitions']],
+                       ignore_index=True)
+        if path.endswith('.parquet'):
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False, header=entry['header'] or True)
+    try:
+        os.rename(staging, target)
+    except OSError:
+        # Another process checked the version out first
+        shutil.rmtree(staging, ignore_errors=True)
+    evict_checkouts(store_dir, keep, target)
+    return target
+
+def evict_checkouts(store_dir=STORE_ROOT, keep=CHECKOUTS_KEPT, current=None):
+    """Remove all but the most recently used checkouts; the stored objects stay"""
+    checkouts_dir = os.path.join(store_dir, 'checkouts')
+    checkouts = [entry.path for entry in os.scandir(checkouts_dir)
+                 if entry.is_dir() and not entry.name.endswith('.tmp') and entry.path != current]
+    checkouts.sort(key=lambda path: (os.stat(path).st_mtime_ns, path), reverse=True)
+    for path in checkouts[max(keep - (current is not None), 0):]:
+        # Move the directory away first so no reader sees it half deleted
+        doomed = f'{path}.{os.getpid()}.evicted.tmp'
+        try:
+            os.rename(path, doomed)
+        except OSError:
+            continue
+        shutil.rmtree(doomed, ignore_errors=True)
+
+def store_bytes(store_dir=STORE_ROOT):
+    """Bytes held by the stored objects"""
+    total = 0
+    for root, _, names in os.walk(os.path.join(store_dir, 'objects')):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in names)
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description='Versioned snapshots of the dashboard data')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    commit_parser = subparsers.add_parser('commit', help='Snapshot the data directory')
+    commit_parser.add_argument('--data-dir', default=os.environ.get('DASHBOARD_DATA_DIR', 'attached_assets'))
+    commit_parser.add_argument('--note', default='')
+    subparsers.add_parser('list', help='Show the versions')
+    checkout_parser = subparsers.add_parser('checkout', help='Print the directory of a version')
+    checkout_parser.add_argument('as_of', help='Version id, date or time')
+    for subparser in subparsers.choices.values():
+        subparser.add_argument('--store', default=STORE_ROOT)
+    args = parser.parse_args()
+
+    if args.command == 'commit':
+        version = commit(args.data_dir, args.store, args.note)
+        print(f"{version} ({store_bytes(args.store) / 1e6:,.2f} MB stored across all versions)")
+    elif args.command == 'list':
+        for manifest in list_versions(args.store):
+            created = time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(manifest['created']))
+            print(f"{manifest['version']}  {created}  {len(manifest['files'])} files  {manifest['note']}")
+    else:
+        try:
+            print(checkout(resolve(args.as_of, args.store), args.store))
+        except ValueError as e:
+            parser.error(str(e))
+
+if __name__ == '__main__':
+    main()
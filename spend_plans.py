@@ -0,0 +1,122 @@
+"""Out-of-core scans of per-period channel spend plans.
+
+Spend plan files (``final_baseline_spend.csv``, ``final_optimized_spend.csv``
+and their region x SKU x day successors) can be far larger than memory. The
+charts only need per-channel means and totals over a range of periods, so the
+plan is streamed in chunks (CSV) or record batches (Parquet), reading only
+the channel columns and stopping at the row limit, and reduced to one running
+sum per channel.
+
+Plans without a date column are positional, one row per day from the plan
+start date; a date range then maps to a row range. Plans with a ``Date`` (or
+``date``) column are filtered on that column instead, pushed down to row
+group statistics for Parquet.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+CHUNK_ROWS = 500_000
+DATE_COLUMNS = ['Date', 'date']
+
+def is_parquet(path):
+    return os.fspath(path).endswith(('.parquet', '.pq'))
+
+def plan_columns(path):
+    if is_parquet(path):
+        return pq.read_schema(path).names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+def row_window(start, end, n_rows, plan_start):
+    """Row range [first, stop) of a positional plan covering [start, end] and the row limit"""
+    plan_start = pd.Timestamp(plan_start)
+    first = max((pd.Timestamp(start) - plan_start).days, 0) if start is not None else 0
+    # An end before the plan start (or before start) selects no rows
+    stop = max((pd.Timestamp(end) - plan_start).days + 1, first) if end is not None else None
+    if n_rows is not None:
+        stop = first + n_rows if stop is None else min(stop, first + n_rows)
+    return first, stop
+
+def iter_positional_chunks(path, channels, first, stop, chunk_rows):
+    """Yield channel-only chunks of rows [first, stop) without materializing the file"""
+    if is_parquet(path):
+        parquet = pq.ParquetFile(path)
+        offset = 0
+        for group in range(parquet.num_row_groups):
+            group_rows = parquet.metadata.row_group(group).num_rows
+            # Row groups entirely outside the window are never read
+            if offset + group_rows <= first or (stop is not None and offset >= stop):
+                offset += group_rows
+                continue
+            for batch in parquet.iter_batches(batch_size=chunk_rows, row_groups=[group], columns=channels):
+                lo, hi = max(first - offset, 0), batch.num_rows if stop is None else min(stop - offset, batch.num_rows)
+                if hi > lo:
+                    yield batch.slice(lo, hi - lo).to_pandas()
+                offset += batch.num_rows
+        return
+
+    offset = 0
+    reader = pd.read_csv(path, usecols=channels, nrows=stop, chunksize=chunk_rows)
+    for chunk in reader:
+        lo = max(first - offset, 0)
+        offset += len(chunk)
+        if lo < len(chunk):
+            yield chunk.iloc[lo:]
+
+def iter_dated_chunks(path, channels, date_col, start, end, n_rows, chunk_rows):
+    """Yield channel-only chunks whose date falls in [start, end], up to n_rows rows"""
+    remaining = n_rows
+    if is_parquet(path):
+        condition = None
+        if start is not None:
+            condition = ds.field(date_col) >= pd.Timestamp(start)
+        if end is not None:
+            upper = ds.field(date_col) <= pd.Timestamp(end)
+            condition = upper if condition is None else condition & upper
+        batches = (batch.to_pandas() for batch in ds.dataset(path).to_batches(
+            columns=channels, filter=condition, batch_size=chunk_rows))
+    else:
+        batches = filter_dates(pd.read_csv(path, usecols=channels + [date_col], chunksize=chunk_rows),
+                               date_col, start, end)
+
+    for chunk in batches:
+        if remaining is not None:
+            chunk = chunk.iloc[:remaining]
+            remaining -= len(chunk)
+        yield chunk[channels]
+        if remaining == 0:
+            return
+
+def filter_dates(chunks, date_col, start, end):
+    for chunk in chunks:
+        dates = pd.to_datetime(chunk[date_col])
+        mask = np.ones(len(chunk), dtype=bool)
+        if start is not None:
+            mask &= (dates >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (dates <= pd.Timestamp(end)).to_numpy()
+        yield chunk[mask]
+
+def scan_spend_plan(path, channels, start=None, end=None, n_rows=None, plan_start=None, chunk_rows=CHUNK_ROWS):
+    """Stream a spend plan and return per-channel total, row count and mean with constant memory"""
+    date_col = next((col for col in DATE_COLUMNS if col in plan_columns(path)), None)
+    if date_col is not None:
+        chunks = iter_dated_chunks(path, channels, date_col, start, end, n_rows, chunk_rows)
+    else:
+        if plan_start is None and (start is not None or end is not None):
+            raise ValueError("A plan without a date column needs plan_start to select a date range")
+        first, stop = row_window(start, end, n_rows, plan_start or '1970-01-01')
+        chunks = iter_positional_chunks(path, channels, first, stop, chunk_rows)
+
+    totals = np.zeros(len(channels))
+    counts = np.zeros(len(channels), dtype=np.int64)
+    for chunk in chunks:
+        values = chunk[channels].to_numpy(dtype=np.float64)
+        totals += np.nansum(values, axis=0)
+        counts += (~np.isnan(values)).sum(axis=0)
+
+    means = np.divide(totals, counts, out=np.full(len(channels), np.nan), where=counts > 0)
+    return pd.DataFrame({'total': totals, 'rows': counts, 'mean': means}, index=channels)
@@ -0,0 +1,726 @@
+"""Static HTML export of the dashboard for read-only viewing.
+
+Every page is rendered once to a self-contained HTML file that a plain file
+server can serve with no Python per viewer. The pages are built from the
+same loaders and ``create_*`` builders the live pages call, in their default
+widget state: forecasts with anomalous periods left out, anomaly markers,
+cohort charts, the backtest, the allocator and phased plan, experiments,
+hierarchy drill-downs and the trained feature attributions.
+
+- every variant a page's widgets can show is pre-rendered: both
+  granularities (Month and Quarter), and one figure per option of the chart
+  selectors (month, drill-down node, objective, product and attribution month)
+- figure data is embedded as base64 typed arrays (Plotly's ``bdata``), which
+  is several times smaller than JSON numbers
+- the granularity and date range controls filter time series in the
+  browser, each selector swaps in its pre-rendered figure, and the product
+  category checkboxes re-sum the Overview GMV trend from per-category series
+
+With ``--month`` the pages are built from a copy of the data directory cut
+off after that month (``<output>/.data-<month>``), so aggregations at every
+granularity, alerts, the backtest, cohorts and attributions only see the
+published data; a page showing a later date (other than a forecast) fails the
+export.
+
+Pages are rendered in parallel worker processes. ``plotly.min.js`` is
+written once next to the pages (``--inline`` embeds it in each page
+instead) and every file gets a gzip sibling for servers that serve
+pre-compressed files.
+
+Usage:
+    python static_export.py --month 2024-06 --output static
+    python -m http.server --directory static/2024-06
+"""
+import argparse
+import base64
+import glob
+import gzip
+import html
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from plotly.offline import get_plotlyjs
+
+from allocator import OBJECTIVES, optimize
+from cohorts import clv_matrix, retention_matrix
+from utils import (
+    DATA_DIR,
+    DEFAULT_FORECAST_HORIZON,
+    FORECAST_META,
+    PLAN_START_DATE,
+    PERIOD_FREQUENCIES,
+    PRODUCT_CATEGORIES,
+    load_merged_data,
+    load_period_data,
+    load_revenue_periods,
+    load_spend_plan_comparison,
+    load_robyn_budget_allocation,
+    load_robyn_max_response,
+    load_robyn_target_efficiency,
+    load_response_curves,
+    load_calibrated_response_curves,
+    load_experiment_results,
+    load_feature_attributions,
+    load_backtest,
+    load_alerts,
+    load_cohort_activity,
+    load_hierarchy,
+    covariate_columns,
+    slice_periods,
+    anomaly_periods,
+    spike_periods,
+    compute_forecasts,
+    compute_holiday_impact,
+    compute_event_impact,
+    compute_cohort_summary,
+    apply_cohort_kpis,
+    compute_flighting_plan,
+    category_hierarchy,
+    channel_hierarchy,
+    create_monthly_gmv_chart,
+    create_product_category_breakdown,
+    create_category_area_chart,
+    create_holiday_impact_chart,
+    create_event_lift_chart,
+    create_drilldown_chart,
+    create_nps_gmv_chart,
+    create_stock_gmv_chart,
+    create_marketing_channel_chart,
+    create_category_trend_chart,
+    create_weather_correlation_chart,
+    create_correlation_heatmap,
+    create_kpi_time_series,
+    create_procurement_gmv_chart,
+    create_clv_cac_comparison,
+    create_retention_heatmap,
+    create_cohort_clv_chart,
+    create_cohort_cac_chart,
+    create_performance_metrics_chart,
+    create_nps_stock_chart,
+    create_budget_comparison_chart,
+    create_monthly_revenue_chart,
+    create_month_revenue_grid,
+    create_spend_plan_comparison_chart,
+    create_robyn_budget_comparison_chart,
+    create_allocation_result_chart,
+    create_experiment_lift_chart,
+    create_flighting_chart,
+    create_feature_importance_chart
+)
+
+GRANULARITIES = ['Month', 'Quarter']
+# Defaults of the Budget Optimization page's phased plan sliders: budget share, spend bounds, pacing bounds
+FLIGHTING_DEFAULTS = (1.0, 0.5, 2.0, 0.75, 1.25)
+# Joins the options of a chart's selectors into the key of its figure
+OPTION_SEPARATOR = '\x1f'
+# Variant key of a chart that is the same at every granularity
+ANY_GRANULARITY = '*'
+# Plain JSON lists shorter than this stay as they are
+MIN_PACKED_LENGTH = 8
+CURRENT_LINK = ' class="current"'
+# Plan files with one row per day from PLAN_START_DATE
+DAILY_PLAN_FILES = ['final_baseline_spend.csv', 'final_optimized_spend.csv', 'final_baseline_spend.parquet',
+                    'final_optimized_spend.parquet', 'final_overall_revenue.csv', 'final_product_revenue.csv']
+# Monthly plan files and the column holding their (month end) dates
+MONTHLY_PLAN_FILES = {'overall_revenue_monthly.csv': 'Unnamed: 0', 'product_revenue_monthly.csv': 'Unnamed: 0',
+                      'merged_file.csv': 'Unnamed: 0_baseline'}
+# Exported strings that name a date or period: 2024-05, 2024-05-31, 2024-05-31T00:00:00 or 2024-Q2
+DATE_LABEL = re.compile(r'^(\d{4})-(?:(\d{2})(?:-\d{2}(?:[T ][\d:.]+)?)?|Q([1-4]))$')
+
+def page_title(page):
+    return page.split('_', 1)[1].replace('_', ' ')
+
+def chart(fig):
+    """A chart with a single figure"""
+    return {'selectors': [], 'figures': {'': fig}}
+
+def choice_chart(selectors, figures):
+    """A chart shown one option at a time: selectors are (label, options, default) and figures are keyed by option tuples"""
+    return {
+        'selectors': [{'label': label, 'options': list(options), 'default': default} for label, options, default in selectors],
+        'figures': {OPTION_SEPARATOR.join(options): fig for options, fig in figures.items()}
+    }
+
+def drilldown_chart(index, measure):
+    """Drill-down chart of a hierarchy, with its top level and each expandable node below it"""
+    children = index.children(())
+    expandable = children.index[children['Children'] > 0].tolist() if index.depth > 1 else []
+    figures = {('All',): create_drilldown_chart(index, (), measure)}
+    figures.update(((node,), create_drilldown_chart(index, (node,), measure)) for node in expandable)
+    return choice_chart([(index.levels[0], ['All'] + expandable, 'All')], figures)
+
+def period_range(df, granularity):
+    """(start, end) of a period frame, with end the last instant of its last period"""
+    return df['Date'].iloc[0], df['Date'].iloc[-1].to_period(PERIOD_FREQUENCIES[granularity]).end_time
+
+def overview_charts(df, granularity, data_dir):
+    """Overview page charts, as the page shows them with every product category selected"""
+    alerts = load_alerts(data_dir)
+    series = ['Total_GMV'] + PRODUCT_CATEGORIES
+    spikes = spike_periods(alerts, series, granularity)
+    forecast = compute_forecasts(df.assign(GMV=df[PRODUCT_CATEGORIES].sum(axis=1)), ('GMV',),
+                                 DEFAULT_FORECAST_HORIZON, granularity, (('GMV', spikes),))
+    gmv_trend = chart(create_monthly_gmv_chart(df, PRODUCT_CATEGORIES, forecast, anomaly_periods(alerts, series, granularity)))
+    # The category checkboxes re-sum the first trace; the forecast and markers are of all categories
+    gmv_trend['toggle'] = {'label': 'Select Product Categories for GMV Chart',
+                           'series': {category: df[category].tolist() for category in PRODUCT_CATEGORIES},
+                           'total': df['Total_GMV'].tolist()}
+
+    index = load_hierarchy('geo', data_dir)
+    if index is None:
+        index = category_hierarchy(df)
+
+    months = df['YearMonth'].tolist()
+    charts = {
+        'gmv_trend': gmv_trend,
+        'geo_drilldown': drilldown_chart(index, 'GMV'),
+        'category_breakdown': choice_chart(
+            [('Select Month', months, months[-1])],
+            {(month,): create_product_category_breakdown(df, month) for month in months}
+        ),
+        'category_area': chart(create_category_area_chart(df)),
+        'holiday_impact': chart(create_holiday_impact_chart(compute_holiday_impact(df)))
+    }
+    adjusted = compute_event_impact(df, tuple(series), spikes).dropna(subset=['Lift'])
+    if not adjusted.empty:
+        charts['event_lift'] = chart(create_event_lift_chart(adjusted))
+    return charts
+
+def eda_charts(df, granularity, data_dir):
+    """Exploratory Data Analysis page charts"""
+    factor_columns = covariate_columns(data_dir)
+    corr_columns = [col for col in ['Total_GMV'] + factor_columns if col in df.columns]
+    return {
+        'nps_gmv': chart(create_nps_gmv_chart(df)),
+        'stock_gmv': chart(create_stock_gmv_chart(df)),
+        'marketing_channels': chart(create_marketing_channel_chart(df)),
+        'category_trend': chart(create_category_trend_chart(df)),
+        'weather_correlation': chart(create_weather_correlation_chart(df, factor_columns)),
+        'weather_heatmap': chart(create_correlation_heatmap(df, corr_columns))
+    }
+
+def kpi_charts(df, granularity, data_dir):
+    """KPI Analysis page charts, with cohort-based CLV and CAC when order-level data has been ingested"""
+    cohort_activity = load_cohort_activity(data_dir)
+    if not cohort_activity.empty:
+        cohort_summary = compute_cohort_summary(cohort_activity, load_merged_data(data_dir))
+        df = apply_cohort_kpis(df, cohort_summary, granularity)
+
+    alerts = load_alerts(data_dir)
+    marked = ['ROI'] + (['CLV', 'CAC'] if cohort_activity.empty else [])
+    anomalies = {kpi: anomaly_periods(alerts, [kpi] if kpi in marked else [], granularity) for kpi in ['ROI', 'CLV', 'CAC']}
+    spikes = tuple((kpi, spike_periods(alerts, [kpi], granularity)) for kpi in marked)
+    forecasts = compute_forecasts(df, ('ROI', 'CLV', 'CAC'), DEFAULT_FORECAST_HORIZON, granularity, spikes)
+
+    charts = {
+        'roas': chart(create_kpi_time_series(df, 'ROI', 'Monthly ROAS Trend', 'ROAS', forecasts, anomalies['ROI'])),
+        'clv': chart(create_kpi_time_series(df, 'CLV', 'Monthly CLV Trend', 'CLV', forecasts, anomalies['CLV'])),
+        'procurement_gmv': chart(create_procurement_gmv_chart(df)),
+        'cac': chart(create_kpi_time_series(df, 'CAC', 'Monthly CAC Trend', 'CAC', forecasts, anomalies['CAC'])),
+        'clv_cac': chart(create_clv_cac_comparison(df))
+    }
+    if not cohort_activity.empty:
+        in_range = cohort_summary[cohort_summary['Date'].between(*period_range(df, granularity))]
+        if not in_range.empty:
+            cohorts = in_range['Cohort'].tolist()
+            charts['cohort_retention'] = chart(create_retention_heatmap(retention_matrix(cohort_activity).loc[cohorts]))
+            charts['cohort_clv'] = chart(create_cohort_clv_chart(clv_matrix(cohort_activity).loc[cohorts]))
+            charts['cohort_cac'] = chart(create_cohort_cac_chart(in_range))
+    charts['performance'] = chart(create_performance_metrics_chart(df))
+    charts['nps_stock'] = chart(create_nps_stock_chart(df))
+    return charts
+
+def allocation_chart(data_dir):
+    """Interactive allocator results for each objective, with the page's default budget and bounds"""
+    experiments = load_experiment_results(data_dir)
+    curves = load_response_curves(data_dir) if experiments.empty else load_calibrated_response_curves(data_dir)
+    figures = {}
+    for objective in OBJECTIVES:
+        scenario = load_robyn_max_response(data_dir) if objective == 'max_response' else load_robyn_target_efficiency(data_dir)
+        scenario = scenario.set_index('channels').loc[curves.index]
+        if objective == 'max_response':
+            budget, target_roas = float(scenario['total_budget_unit'].iloc[0]), None
+        else:
+            budget = float(curves['init_spend'].sum())
+            target_roas = float(scenario['optmResponseUnitTotal'].iloc[0] / scenario['optmSpendUnitTotal'].iloc[0])
+        try:
+            result = optimize(curves, budget, scenario['constr_low'].tolist(), scenario['constr_up'].tolist(),
+                              objective, target_roas)
+        except ValueError:
+            continue
+        figures[(objective,)] = create_allocation_result_chart(curves, result)
+    if not figures:
+        return None
+    return choice_chart([('Objective', [objective for objective, in figures], OBJECTIVES[0])], figures)
+
+def budget_charts(df, granularity, data_dir):
+    """Budget Optimization page charts for the full range of the period data"""
+    start, end = period_range(df, granularity)
+    charts = {}
+    _, backtest_summary = load_backtest(data_dir)
+    if not backtest_summary.empty:
+        charts['backtest'] = chart(create_budget_comparison_chart(backtest_summary, 'Predicted vs Realized Revenue Improvement'))
+
+    revenue_data = slice_periods(load_revenue_periods(granularity, data_dir), start, end)
+    if not revenue_data.empty:
+        charts['monthly_revenue'] = chart(create_monthly_revenue_chart(revenue_data))
+        charts['revenue_grid'] = chart(create_month_revenue_grid(revenue_data))
+    spend_plan = slice_periods(load_spend_plan_comparison(data_dir), start, end)
+    if not spend_plan.empty:
+        charts['spend_plan'] = chart(create_spend_plan_comparison_chart(spend_plan))
+
+    index = load_hierarchy('campaigns', data_dir)
+    if index is None:
+        index = channel_hierarchy(slice_periods(load_merged_data(data_dir), start, end))
+    charts['campaign_drilldown'] = drilldown_chart(index, 'Spend')
+    charts['robyn_budget'] = chart(create_robyn_budget_comparison_chart(load_robyn_budget_allocation(data_dir)))
+
+    allocation = allocation_chart(data_dir)
+    if allocation is not None:
+        charts['allocation'] = allocation
+    experiments = load_experiment_results(data_dir)
+    if not experiments.empty:
+        charts['experiments'] = chart(create_experiment_lift_chart(experiments))
+    try:
+        plan, _ = compute_flighting_plan(*FLIGHTING_DEFAULTS, data_dir=data_dir)
+    except ValueError:
+        pass
+    else:
+        charts['flighting'] = chart(create_flighting_chart(plan))
+
+    # Importance and monthly SHAP values of the trained attribution model
+    feature_data, shap_values = load_feature_attributions(data_dir)
+    products = ["All Products"] + feature_data.index.tolist()
+    months = ["All Months"] + sorted(shap_values, reverse=True)
+    figures = {}
+    for product in products:
+        figures[(product, "All Months")] = create_feature_importance_chart(feature_data, product)
+        for month in months[1:]:
+            figures[(product, month)] = create_feature_importance_chart(shap_values[month], product, month)
+    charts['feature_importance'] = choice_chart(
+        [('Select Product Category', products, "All Products"), ('Attribution Month', months, "All Months")], figures
+    )
+    return charts
+
+# Page name -> builder of its charts from the period data at a granularity
+PAGE_CHARTS = {
+    '1_Overview': overview_charts,
+    '2_Exploratory_Data_Analysis': eda_charts,
+    '3_KPI_Analysis': kpi_charts,
+    '4_Budget_Optimization': budget_charts
+}
+
+def read_table(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    # Read as text, so the rows that are kept are written back unchanged
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+def cut_table(path, months, month):
+    """Drop the rows of a table whose month (``months(df)``, as periods) is after the cutoff month"""
+    if not os.path.exists(path):
+        return
+    df = read_table(path)
+    keep = np.asarray(months(df) <= pd.Period(month, freq='M'), dtype=bool)
+    if path.endswith('.parquet'):
+        df[keep].to_parquet(path, index=False)
+    else:
+        df[keep].to_csv(path, index=False)
+
+def cut_partitions(pattern, name, month):
+    """Remove the partition files matching a glob whose month (``name(path)``, 'YYYY-MM') is after the cutoff"""
+    for path in glob.glob(pattern):
+        if name(path) > month:
+            os.remove(path)
+
+def publish_data_dir(data_dir, month, target):
+    """Copy of a data directory with every dated asset cut off after ``month``.
+
+    The pages are built from this copy, so every loader -- aggregations at any
+    granularity, alerts, the backtest, cohorts and the attribution model --
+    only ever sees the data published for the month. Hierarchy stores hold
+    totals over all time and are left out; the pages then fall back to the
+    hierarchies of the period data.
+    """
+    if month < PLAN_START_DATE[:7]:
+        raise ValueError(f"The budget plans start in {PLAN_START_DATE[:7]}; publish that month or a later one")
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    shutil.copytree(data_dir, target, ignore=shutil.ignore_patterns('hierarchies'))
+    path = lambda *parts: os.path.join(target, *parts)
+    month_of = lambda dates: pd.to_datetime(dates).dt.to_period('M')
+
+    cut_table(path('final_merged.csv'), lambda df: month_of(df['Year'] + '-' + df['Month'].str.zfill(2)), month)
+    for name in DAILY_PLAN_FILES:
+        cut_table(path(name), lambda df: pd.date_range(PLAN_START_DATE, periods=len(df), freq='D').to_period('M'), month)
+    for name, column in MONTHLY_PLAN_FILES.items():
+        cut_table(path(name), lambda df: month_of(df[column]), month)
+
+    cut_partitions(path('sketches', '*.pkl'), lambda p: os.path.basename(p)[:-len('.pkl')], month)
+    cut_partitions(path('covariates', '*', 'month=*.parquet'), lambda p: os.path.basename(p)[len('month='):-len('.parquet')], month)
+    # Cohorts: later cohorts go, and the months after the cutoff leave every remaining partition
+    cut_partitions(path('cohorts', 'cohort=*.parquet'), lambda p: os.path.basename(p)[len('cohort='):-len('.parquet')], month)
+    for partition in glob.glob(path('cohorts', '*.parquet')):
+        cut_table(partition, lambda df: pd.PeriodIndex(df['order_month'], freq='M'), month)
+    if os.path.exists(path('cohorts', 'manifest.json')):
+        with open(path('cohorts', 'manifest.json')) as f:
+            manifest = json.load(f)
+        manifest['months'] = [m for m in manifest['months'] if m <= month]
+        with open(path('cohorts', 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+
+    # Experiments still running at the cutoff have no published result yet
+    end = pd.Period(month, freq='M').end_time
+    for manifest_path in glob.glob(path('experiments', '*', 'manifest.json')):
+        with open(manifest_path) as f:
+            if pd.Timestamp(json.load(f)['end']) > end:
+                shutil.rmtree(os.path.dirname(manifest_path))
+    return target
+
+def label_month(value):
+    """First month ('YYYY-MM') of the period a date or period label names, else None"""
+    match = DATE_LABEL.match(value)
+    if not match:
+        return None
+    year, month, quarter = match.groups()
+    return f"{year}-{month}" if month else f"{year}-{3 * int(quarter) - 2:02d}"
+
+def late_labels(data, month):
+    """Dates and period labels after the cutoff month in a page's data, except forecast traces"""
+    found = []
+
+    def visit(value):
+        if isinstance(value, dict):
+            if value.get('meta') == FORECAST_META:
+                return
+            for item in value.values():
+                visit(item)
+        elif isinstance(value, list):
+            for item in value:
+                visit(item)
+        elif isinstance(value, str):
+            start = label_month(value)
+            if start is not None and start > month:
+                found.append(value)
+
+    visit(data)
+    return sorted(set(found))
+
+def pack_arrays(value):
+    """Figure spec with its remaining numeric lists encoded as base64 typed arrays"""
+    if isinstance(value, dict):
+        return {key: pack_arrays(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if (len(value) >= MIN_PACKED_LENGTH
+                and all(isinstance(item, (int, float)) and not isinstance(item, bool) for item in value)):
+            array = np.asarray(value)
+            if array.dtype.kind == 'i' and np.abs(array).max() < 2 ** 31:
+                array, dtype = array.astype('<i4'), 'i4'
+            else:
+                array, dtype = array.astype('<f8'), 'f8'
+            return {'dtype': dtype, 'bdata': base64.b64encode(array.tobytes()).decode()}
+        return [pack_arrays(item) for item in value]
+    return value
+
+def figure_spec(fig):
+    return pack_arrays(json.loads(fig.to_json()))
+
+def page_data(page, data_dir=DATA_DIR, month=None):
+    """Everything a static page shows: period labels and each chart's variants per granularity.
+
+    ``data_dir`` must already be cut off at ``month`` (see publish_data_dir);
+    a date after the month anywhere in the page, other than a forecast,
+    raises ValueError.
+    """
+    periods, charts = {}, {}
+    for granularity in GRANULARITIES:
+        df = load_period_data(granularity, data_dir)
+        periods[granularity] = df['YearMonth'].tolist()
+        # Charts keep the page order of their first appearance; some only exist at some granularities
+        for key, variant in PAGE_CHARTS[page](df, granularity, data_dir).items():
+            variant['figures'] = {option: figure_spec(fig) for option, fig in variant['figures'].items()}
+            charts.setdefault(key, {'id': key, 'variants': {}})['variants'][granularity] = pack_arrays(variant)
+    for chart_data in charts.values():
+        # Charts that do not depend on the period data are embedded once
+        variants = list(chart_data['variants'].values())
+        if len(variants) == len(GRANULARITIES) and all(variant == variants[0] for variant in variants):
+            chart_data['variants'] = {ANY_GRANULARITY: variants[0]}
+    data = {'page': page, 'title': page_title(page), 'periods': periods, 'charts': list(charts.values())}
+    if month is not None:
+        late = late_labels(data, month)
+        if late:
+            raise ValueError(f"{page} shows data after {month}: {', '.join(late[:5])}")
+    return data
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title} - GMV &amp; KPI Dashboard</title>
+<style>
+  body {{ font-family: "Source Sans Pro", sans-serif; color: #424242; margin: 0; background: #f8f9fb; }}
+  nav {{ background: #0D47A1; padding: 12px 24px; }}
+  nav a {{ color: #E3F2FD; margin-right: 20px; text-decoration: none; }}
+  nav a.current {{ color: #ffffff; font-weight: 600; }}
+  main {{ padding: 24px; max-width: 1400px; margin: auto; }}
+  .controls, .selectors {{ display: flex; flex-wrap: wrap; gap: 16px; align-items: end; margin-bottom: 20px; }}
+  .controls label, .selectors label {{ display: flex; flex-direction: column; font-size: 14px; gap: 4px; }}
+  .selectors fieldset {{ border: none; padding: 0; margin: 0; font-size: 14px; }}
+  .selectors fieldset label {{ display: inline-flex; flex-direction: row; margin-right: 12px; }}
+  .chart {{ background: #ffffff; padding: 20px; border-radius: 10px; border: 1px solid #e6e6e6;
+            box-shadow: 0 1px 3px rgba(0,0,0,0.05); margin-bottom: 20px; }}
+  .note {{ font-size: 13px; color: #757575; }}
+</style>
+{plotly}
+</head>
+<body>
+<nav>{nav}</nav>
+<main>
+<h1>{title}</h1>
+<p class="note">Published view{published}, exported {exported}.</p>
+<div class="controls" id="controls"></div>
+<div id="charts"></div>
+</main>
+<script type="application/json" id="page-data">{data}</script>
+<script>
+{script}
+</script>
+</body>
+</html>
+"""
+
+# Decodes the typed arrays, renders the controls, re-sums toggled categories and filters time series to the selected range
+PAGE_SCRIPT = """
+const PAGE = JSON.parse(document.getElementById('page-data').textContent);
+const SEPARATOR = '\\x1f';
+const ANY_GRANULARITY = '*';
+const TYPES = {f8: Float64Array, f4: Float32Array, i4: Int32Array, u4: Uint32Array, i2: Int16Array,
+               u2: Uint16Array, i1: Int8Array, u1: Uint8Array};
+function decode(value) {
+  if (Array.isArray(value)) return value.map(decode);
+  if (value && typeof value === 'object') {
+    if (typeof value.bdata === 'string' && TYPES[value.dtype]) {
+      const bytes = Uint8Array.from(atob(value.bdata), c => c.charCodeAt(0));
+      return Array.from(new TYPES[value.dtype](bytes.buffer));
+    }
+    const out = {};
+    for (const key in value) out[key] = decode(value[key]);
+    return out;
+  }
+  return value;
+}
+const state = {granularity: Object.keys(PAGE.periods)[0], from: 0, to: Infinity};
+
+function select(label, options, value, onChange) {
+  const wrapper = document.createElement('label');
+  wrapper.textContent = label;
+  const input = document.createElement('select');
+  options.forEach(option => input.add(new Option(option, option)));
+  input.value = value;
+  input.addEventListener('change', () => onChange(input.value));
+  wrapper.appendChild(input);
+  return wrapper;
+}
+
+function checkboxes(label, options, checked, onChange) {
+  const wrapper = document.createElement('fieldset');
+  const legend = document.createElement('legend');
+  legend.textContent = label;
+  wrapper.appendChild(legend);
+  options.forEach(option => {
+    const item = document.createElement('label');
+    const input = document.createElement('input');
+    input.type = 'checkbox';
+    input.checked = checked.has(option);
+    input.addEventListener('change', () => {
+      if (input.checked) checked.add(option); else checked.delete(option);
+      onChange();
+    });
+    item.appendChild(input);
+    item.appendChild(document.createTextNode(option));
+    wrapper.appendChild(item);
+  });
+  return wrapper;
+}
+
+function filterTrace(trace, keep) {
+  if (!Array.isArray(trace.x) || !trace.x.every(x => keep.has(x) || x === null)) return trace;
+  const n = trace.x.length;
+  const index = trace.x.map((x, i) => keep.get(x) ? i : -1).filter(i => i >= 0);
+  const pick = (value) => Array.isArray(value) && value.length === n ? index.map(i => value[i]) : value;
+  const out = Object.assign({}, trace);
+  for (const key of ['x', 'y', 'text', 'customdata', 'hovertext']) out[key] = pick(trace[key]);
+  if (trace.marker) out.marker = Object.assign({}, trace.marker, {color: pick(trace.marker.color)});
+  if (trace.error_y) out.error_y = Object.assign({}, trace.error_y, {array: pick(trace.error_y.array),
+                                                                     arrayminus: pick(trace.error_y.arrayminus)});
+  return out;
+}
+
+// The first trace becomes the sum of the checked categories (total GMV when none is checked);
+// the forecast and anomaly markers are of all categories, so they are left out of a partial sum
+function toggleTraces(data, toggle, checked) {
+  const categories = Object.keys(toggle.series).filter(category => checked.has(category));
+  if (categories.length === Object.keys(toggle.series).length) return data;
+  const y = categories.length
+    ? toggle.total.map((_, i) => categories.reduce((sum, category) => sum + toggle.series[category][i], 0))
+    : toggle.total;
+  return [Object.assign({}, data[0], {y: y})];
+}
+
+function variantOf(chart) {
+  return chart.variants[state.granularity] || chart.variants[ANY_GRANULARITY];
+}
+
+function draw(chart) {
+  const variant = variantOf(chart);
+  chart.box.style.display = variant ? '' : 'none';
+  if (!variant) return;
+  const key = variant.selectors.map(selector => chart.selected[selector.label]).join(SEPARATOR);
+  const figure = variant.figures[key] || variant.figures[Object.keys(variant.figures)[0]];
+  let data = figure.data;
+  if (variant.toggle) data = toggleTraces(data, variant.toggle, chart.checked);
+  const labels = PAGE.periods[state.granularity];
+  const keep = new Map(labels.map((label, i) => [label, i >= state.from && i <= state.to]));
+  data = data.map(trace => filterTrace(trace, keep));
+  Plotly.react(chart.element, data, figure.layout, {responsive: true, displaylogo: false});
+}
+
+function renderControls() {
+  const controls = document.getElementById('controls');
+  controls.innerHTML = '';
+  const labels = PAGE.periods[state.granularity];
+  state.to = Math.min(state.to, labels.length - 1);
+  controls.appendChild(select('Granularity', Object.keys(PAGE.periods), state.granularity, value => {
+    state.granularity = value; state.from = 0; state.to = Infinity; renderControls(); redraw();
+  }));
+  controls.appendChild(select('From', labels, labels[state.from], value => {
+    state.from = labels.indexOf(value); state.to = Math.max(state.to, state.from); renderControls(); redraw();
+  }));
+  controls.appendChild(select('To', labels, labels[state.to], value => {
+    state.to = labels.indexOf(value); state.from = Math.min(state.from, state.to); renderControls(); redraw();
+  }));
+}
+
+function renderSelectors(chart) {
+  chart.selectorElement.innerHTML = '';
+  const variant = variantOf(chart);
+  if (!variant) return;
+  variant.selectors.forEach(selector => {
+    if (!selector.options.includes(chart.selected[selector.label])) chart.selected[selector.label] = selector.default;
+    chart.selectorElement.appendChild(select(selector.label, selector.options, chart.selected[selector.label], value => {
+      chart.selected[selector.label] = value; draw(chart);
+    }));
+  });
+  if (variant.toggle) {
+    const categories = Object.keys(variant.toggle.series);
+    chart.checked = chart.checked || new Set(categories);
+    chart.selectorElement.appendChild(checkboxes(variant.toggle.label, categories, chart.checked, () => draw(chart)));
+  }
+}
+
+function redraw() {
+  PAGE.charts.forEach(chart => { renderSelectors(chart); draw(chart); });
+}
+
+PAGE.charts.forEach(chart => {
+  chart.variants = decode(chart.variants);
+  chart.selected = {};
+  chart.box = document.createElement('div');
+  chart.box.className = 'chart';
+  chart.selectorElement = document.createElement('div');
+  chart.selectorElement.className = 'selectors';
+  chart.element = document.createElement('div');
+  chart.box.appendChild(chart.selectorElement);
+  chart.box.appendChild(chart.element);
+  document.getElementById('charts').appendChild(chart.box);
+});
+renderControls();
+redraw();
+"""
+
+def render_page(page, data_dir, month, output_dir, pages, inline=False):
+    """Write one page's HTML (and its gzip sibling); runs inside a worker process"""
+    started = time.perf_counter()
+    data = page_data(page, data_dir, month)
+    nav = ''.join(f'<a href="{name}.html"{CURRENT_LINK if name == page else ""}>{html.escape(page_title(name))}</a>'
+                  for name in pages)
+    plotly = f'<script>{get_plotlyjs()}</script>' if inline else '<script src="plotly.min.js"></script>'
+    # Keep the embedded JSON from closing the script element
+    payload = json.dumps(data, separators=(',', ':')).replace('</', '<\\/')
+    document = PAGE_TEMPLATE.format(
+        title=html.escape(data['title']), plotly=plotly, nav=nav, data=payload, script=PAGE_SCRIPT,
+        published=f" for {month}" if month else "", exported=time.strftime('%Y-%m-%d %H:%M')
+    )
+    path = os.path.join(output_dir, f'{page}.html')
+    size, compressed = write_file(path, document.encode())
+    return {'page': page, 'file': os.path.basename(path), 'charts': len(data['charts']),
+            'figures': sum(len(variant['figures']) for chart in data['charts'] for variant in chart['variants'].values()),
+            'bytes': size, 'gzip_bytes': compressed, 'seconds': round(time.perf_counter() - started, 2)}
+
+def write_file(path, content):
+    """Write a file and a gzip sibling; returns (bytes, gzip bytes)"""
+    with open(path, 'wb') as f:
+        f.write(content)
+    compressed = gzip.compress(content, mtime=0)
+    with open(f'{path}.gz', 'wb') as f:
+        f.write(compressed)
+    return len(content), len(compressed)
+
+def export_site(data_dir=DATA_DIR, output='static', month=None, workers=None, inline=False):
+    """Render every page in parallel into a static site; returns the site directory and its manifest"""
+    if month is not None:
+        month = pd.Period(month, freq='M').strftime('%Y-%m')
+    site_dir = os.path.join(output, month or 'latest')
+    os.makedirs(site_dir, exist_ok=True)
+    pages = list(PAGE_CHARTS)
+
+    started = time.perf_counter()
+    # The pages of a month are built from a copy of the data cut off at that month, kept next to the site
+    source_dir = data_dir
+    if month is not None:
+        data_dir = publish_data_dir(source_dir, month, os.path.join(output, f'.data-{month}'))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_page, page, data_dir, month, site_dir, pages, inline) for page in pages]
+        results = [future.result() for future in futures]
+    if not inline:
+        write_file(os.path.join(site_dir, 'plotly.min.js'), get_plotlyjs().encode())
+    index = (f'<!DOCTYPE html><html><head><meta charset="utf-8"><meta http-equiv="refresh" content="0; url={pages[0]}.html">'
+             f'<title>GMV &amp; KPI Dashboard</title></head><body><a href="{pages[0]}.html">Open the dashboard</a></body></html>')
+    write_file(os.path.join(site_dir, 'index.html'), index.encode())
+
+    manifest = {
+        'month': month,
+        'data_dir': source_dir,
+        'published_data_dir': data_dir,
+        'inline_plotlyjs': inline,
+        'elapsed_seconds': round(time.perf_counter() - started, 2),
+        'pages': results
+    }
+    with open(os.path.join(site_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return site_dir, manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the dashboard as static HTML pages')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--month', metavar='YYYY-MM', help='Publish the data up to and including this month')
+    parser.add_argument('--output', default='static', help='Directory receiving the site (in a folder per month)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--inline', action='store_true', help='Embed plotly.js in every page')
+    args = parser.parse_args()
+
+    site_dir, manifest = export_site(args.data_dir, args.output, args.month, args.workers, args.inline)
+    for page in manifest['pages']:
+        print(f"{page['file']}: {page['figures']} figures, {page['bytes'] / 1e3:,.0f} kB "
+              f"({page['gzip_bytes'] / 1e3:,.0f} kB gzipped) in {page['seconds']:.1f}s")
+    print(f"Site written to {site_dir} in {manifest['elapsed_seconds']:.1f}s")
+
+if __name__ == '__main__':
+    main()
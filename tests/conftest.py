@@ -0,0 +1,11 @@
+import os
+
+import pytest
+
+@pytest.fixture(scope='session', autouse=True)
+def repo_root():
+    # The data directory (attached_assets) is relative to the repository, like when the app runs
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    yield
+    os.chdir(cwd)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from allocator import MemoStore, curves_fingerprint, fit_response_curves, optimize, plan_key
+from utils import load_robyn_max_response, load_robyn_target_efficiency
+
+@pytest.fixture(scope='module')
+def curves():
+    return fit_response_curves([load_robyn_max_response(), load_robyn_target_efficiency()])
+
+@pytest.fixture
+def store(tmp_path):
+    return MemoStore(str(tmp_path / 'memo.sqlite'))
+
+def plan(curves):
+    n = len(curves)
+    return curves['init_spend'].sum(), np.full(n, 0.5), np.full(n, 1.5)
+
+def test_fingerprint_follows_curve_parameters(curves):
+    refitted = curves.copy()
+    refitted.loc[refitted.index[0], 'beta'] *= 1.01
+    assert curves_fingerprint(curves) == curves_fingerprint(curves.copy())
+    assert curves_fingerprint(refitted) != curves_fingerprint(curves)
+
+def test_plan_key_rounds_widget_noise(curves):
+    budget, low, up = plan(curves)
+    channels = curves.index.tolist()
+    key = plan_key('model', 'max_response', budget, None, channels, low, up)
+    assert plan_key('model', 'max_response', budget + 1e-9, None, channels, low, up) == key
+    assert plan_key('other', 'max_response', budget, None, channels, low, up) != key
+    assert plan_key('model', 'max_response', budget * 1.1, None, channels, low, up) != key
+
+def test_memo_is_keyed_on_the_curves(curves, store):
+    budget, low, up = plan(curves)
+    first = optimize(curves, budget, low, up, store=store)
+    assert first['success'] and not first['cached']
+    assert optimize(curves, budget, low, up, store=store)['cached']
+
+    calibrated = curves.copy()
+    calibrated['beta'] *= 1.2
+    result = optimize(calibrated, budget, low, up, store=store)
+    assert not result['cached']
+    assert result['total_response'] > first['total_response']
+
+def test_allocation_respects_budget_and_bounds(curves, store):
+    budget, low, up = plan(curves)
+    result = optimize(curves, budget, low, up, store=store)
+    spend = np.asarray(result['spend'])
+    init_spend = curves['init_spend'].to_numpy()
+    assert spend.sum() == pytest.approx(budget, rel=1e-6)
+    assert np.all(spend >= low * init_spend * (1 - 1e-6)) and np.all(spend <= up * init_spend * (1 + 1e-6))
@@ -0,0 +1,68 @@
+import json
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from anomalies import AnomalyStore
+from utils import anomaly_stream_key
+
+@pytest.fixture
+def store(tmp_path):
+    return AnomalyStore(str(tmp_path / 'anomalies.sqlite'))
+
+def metrics(n_days=120, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_days)
+    df = pd.DataFrame({
+        'Date': pd.date_range('2024-01-01', periods=n_days, freq='D'),
+        'GMV': 1000 * (1 + 0.2 * (t % 7 == 5)) * rng.lognormal(0, 0.03, n_days),
+        'ROAS': 3 + rng.normal(0, 0.05, n_days)
+    })
+    df.loc[40, 'GMV'] *= 4
+    # From day 80 on, ROAS settles at a new level
+    df.loc[80:, 'ROAS'] += 2
+    return df
+
+def saved_state(store, stream):
+    with closing(store._connect()) as db:
+        rows = db.execute("SELECT series, last_date, state FROM detector_state WHERE stream = ?", (stream,)).fetchall()
+    return {series: (last_date, json.loads(state)) for series, last_date, state in rows}
+
+def test_spikes_and_level_shifts_are_flagged(store):
+    alerts = store.update('s', metrics(), ['GMV', 'ROAS'], 'D')
+    flagged = set(zip(alerts['series'], alerts['date'], alerts['kind']))
+    assert ('GMV', '2024-02-10', 'spike') in flagged
+    assert ('ROAS', '2024-03-22', 'shift') in flagged
+    # After the shift ROAS is scored against its new level
+    assert not ((alerts['series'] == 'ROAS') & (alerts['date'] > '2024-03-22')).any()
+
+def test_incremental_updates_match_one_pass(store, tmp_path):
+    df = metrics()
+    one_pass = AnomalyStore(str(tmp_path / 'one_pass.sqlite'))
+    expected = one_pass.update('s', df, ['GMV', 'ROAS'], 'D')
+
+    alerts = pd.concat([store.update('s', df.iloc[:end], ['GMV', 'ROAS'], 'D') for end in (30, 45, 81, len(df))])
+    columns = ['series', 'date', 'kind', 'value', 'expected', 'score']
+    pd.testing.assert_frame_equal(alerts[columns].reset_index(drop=True), expected[columns], check_dtype=False)
+    assert saved_state(store, 's') == saved_state(one_pass, 's')
+
+def test_processed_dates_are_not_scored_again(store):
+    df = metrics()
+    store.update('s', df, ['GMV', 'ROAS'], 'D')
+    assert store.update('s', df, ['GMV', 'ROAS'], 'D').empty
+    assert {last_date for last_date, _ in saved_state(store, 's').values()} == {'2024-04-29'}
+
+def test_streams_keep_separate_state(store):
+    store.update('a', metrics(), ['GMV'], 'D')
+    assert store.alerts('b').empty
+    assert len(store.update('b', metrics(), ['GMV'], 'D')) == len(store.alerts('a'))
+
+def test_stream_keys_tell_apart_directories_with_the_same_name(tmp_path):
+    first, second = tmp_path / 'one' / 'attached_assets', tmp_path / 'two' / 'attached_assets'
+    first.mkdir(parents=True)
+    second.mkdir(parents=True)
+    assert anomaly_stream_key('merged_data', str(first)) != anomaly_stream_key('merged_data', str(second))
+    assert anomaly_stream_key('merged_data', str(first)) == anomaly_stream_key('merged_data', str(first) + '/')
+    assert anomaly_stream_key('merged_data', str(first)).startswith('attached_assets-')
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bitmaps import ARRAY_MAX, CHUNK_SIZE, Bitmap, BitmapIndex, is_bitset
+
+@pytest.fixture(scope='module')
+def facts():
+    # Spans several chunks, with dense values (bitset containers) and sparse ones (array containers)
+    rng = np.random.default_rng(0)
+    n_rows = 3 * CHUNK_SIZE + 1234
+    return pd.DataFrame({
+        'Month': rng.choice([f'2024-{month:02d}' for month in range(1, 7)], n_rows),
+        'Category': rng.choice(['Camera', 'GameCDDVD', 'Rare'], n_rows, p=[0.6, 0.39, 0.01]),
+        'GMV': rng.gamma(2.0, 100.0, n_rows)
+    })
+
+@pytest.fixture(scope='module')
+def index(facts):
+    return BitmapIndex(facts, ['Month', 'Category'], ['GMV'])
+
+def test_containers_switch_representation(index):
+    containers = [container for bitmap in index.bitmaps['Category'].values() for container in bitmap.chunks.values()]
+    assert any(is_bitset(container) for container in containers)
+    assert any(not is_bitset(container) and len(container) <= ARRAY_MAX for container in containers)
+
+@pytest.mark.parametrize('filters', [
+    {'Month': ['2024-02']},
+    {'Category': ['Rare', 'GameCDDVD']},
+    {'Month': ['2024-01', '2024-03', '2024-06'], 'Category': ['Camera', 'Rare']},
+    {'Month': ['2024-04'], 'Category': ['Rare']},
+    {'Month': ['2024-05'], 'Category': ['Unknown']},
+    {'Month': None, 'Category': ['Camera']}
+])
+def test_select_matches_brute_force(facts, index, filters):
+    mask = np.ones(len(facts), dtype=bool)
+    for dimension, values in filters.items():
+        if values is not None:
+            mask &= facts[dimension].isin(values).to_numpy()
+    selection = index.select(filters)
+    np.testing.assert_array_equal(selection.rows(), np.flatnonzero(mask))
+    assert len(selection) == mask.sum()
+
+def test_and_or_match_set_operations():
+    rng = np.random.default_rng(1)
+    a_rows = np.unique(rng.integers(0, 2 * CHUNK_SIZE, 20000))
+    b_rows = np.unique(rng.integers(0, 2 * CHUNK_SIZE, 3000))
+    a, b = Bitmap.from_rows(a_rows), Bitmap.from_rows(b_rows)
+    np.testing.assert_array_equal((a & b).rows(), np.intersect1d(a_rows, b_rows))
+    np.testing.assert_array_equal((a | b).rows(), np.union1d(a_rows, b_rows))
+
+def test_aggregate_matches_groupby(facts, index):
+    filters = {'Month': ['2024-01', '2024-02', '2024-05'], 'Category': ['Camera', 'Rare']}
+    result = index.aggregate(['Month', 'Category'], filters)
+    selected = facts[facts['Month'].isin(filters['Month']) & facts['Category'].isin(filters['Category'])]
+    expected = selected.groupby(['Month', 'Category'])['GMV'].sum()
+    np.testing.assert_allclose(result['GMV'].to_numpy(), expected.to_numpy())
+    assert result.index.tolist() == expected.index.tolist()
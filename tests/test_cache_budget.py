@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cache_budget
+from cache_budget import MB, SESSION_IDLE_SECONDS, cache_metrics, governed_cache, nbytes
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    # Fresh registries, so the app's own caches do not count against the budgets under test
+    monkeypatch.setattr(cache_budget, 'CACHES', {})
+    monkeypatch.setattr(cache_budget, 'SESSIONS', {})
+    monkeypatch.setattr(cache_budget, 'TOTAL_BUDGET', 100 * MB)
+    monkeypatch.setattr(cache_budget, 'SESSION_BUDGET', 100 * MB)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_budget, 'time', clock)
+    return clock
+
+@pytest.fixture
+def session(monkeypatch):
+    current = {'id': 'alice'}
+    monkeypatch.setattr(cache_budget, 'current_session', lambda: current['id'])
+    return current
+
+def array_cache(calls, **options):
+    @governed_cache(**options)
+    def load(n, size=1000):
+        calls.append(n)
+        return np.full(size, n, dtype=np.float64)
+    return load
+
+def test_hits_misses_and_byte_accounting(clock):
+    calls = []
+    load = array_cache(calls, name='arrays')
+    load(1)
+    load(2, size=500)
+    load(1)
+    assert calls == [1, 2]
+    cache = load.cache
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.bytes == 1000 * 8 + 500 * 8 == sum(entry[1] for entry in cache.entries.values())
+    row = cache_metrics().iloc[0]
+    assert row['Entries'] == 2 and row['Hit Rate'] == pytest.approx(1 / 3)
+    load.clear()
+    assert cache.bytes == 0 and not cache.entries
+
+def test_least_recently_used_entry_is_evicted_first(clock):
+    calls = []
+    load = array_cache(calls, max_entries=2)
+    load(1)
+    load(2)
+    load(1)  # 2 is now the least recently used
+    load(3)
+    assert list(load.cache.entries) == [cache_budget.cache_key((1,), {}), cache_budget.cache_key((3,), {})]
+    assert load.cache.evictions['lru'] == 1
+    load(2)
+    assert calls == [1, 2, 3, 2]
+
+def test_byte_cap_evicts_until_under_the_cap(clock):
+    load = array_cache([], max_bytes=20000)
+    for n in range(4):
+        load(n)  # 8000 bytes each
+    assert len(load.cache.entries) == 2 and load.cache.bytes == 16000
+    # An entry larger than the cap on its own is still kept
+    load(9, size=5000)
+    assert len(load.cache.entries) == 1 and load.cache.bytes == 40000
+
+def test_entries_expire_after_their_ttl(clock):
+    calls = []
+    load = array_cache(calls, ttl=60)
+    load(1)
+    clock.now += 59
+    load(1)
+    clock.now += 2
+    load(1)
+    assert calls == [1, 1]
+    assert load.cache.evictions['ttl'] == 1
+    # Expired entries of other keys go when a new entry is stored
+    load(2)
+    clock.now += 61
+    load(3)
+    assert list(load.cache.entries) == [cache_budget.cache_key((3,), {})]
+
+def test_process_budget_evicts_from_the_largest_cache(clock, monkeypatch):
+    monkeypatch.setattr(cache_budget, 'TOTAL_BUDGET', 50000)
+    small, large = array_cache([], name='small'), array_cache([], name='large')
+    small(1)
+    large(1, size=2000)
+    large(2, size=2000)
+    large(3, size=2000)  # 8000 + 3 x 16000 > 50000
+    assert len(small.cache.entries) == 1
+    assert list(large.cache.entries) == [cache_budget.cache_key((n,), {'size': 2000}) for n in (2, 3)]
+
+def test_session_budget_only_evicts_entries_no_one_else_uses(clock, session, monkeypatch):
+    monkeypatch.setattr(cache_budget, 'SESSION_BUDGET', 20000)
+    load = array_cache([])
+    load(1)
+    session['id'] = 'bob'
+    load(1)  # shared with alice
+    load(2)
+    load(3)  # bob holds 24000 > 20000: his own entry 2 goes, the shared entry stays
+    keys = list(load.cache.entries)
+    assert cache_budget.cache_key((1,), {}) in keys and cache_budget.cache_key((2,), {}) not in keys
+    assert load.cache.evictions['session'] == 1
+
+def test_idle_sessions_stop_holding_entries(clock, session):
+    load = array_cache([])
+    load(1)
+    clock.now += SESSION_IDLE_SECONDS + 1
+    session['id'] = 'bob'
+    load(2)
+    assert set(cache_budget.SESSIONS) == {'bob'}
+    assert all('alice' not in entry[3] for entry in load.cache.entries.values())
+
+def test_handed_out_values_cannot_change_the_cache(clock):
+    @governed_cache
+    def frame():
+        return {'df': pd.DataFrame({'a': [1, 2, 3]}), 'values': np.arange(3), 'names': ['x']}
+
+    first = frame()
+    first['df'].loc[0, 'a'] = 100
+    first['names'].append('y')
+    with pytest.raises(ValueError):
+        first['values'][0] = 100
+    second = frame()
+    assert second['df']['a'].tolist() == [1, 2, 3] and second['names'] == ['x']
+
+def test_keys_follow_frame_contents():
+    df = pd.DataFrame({'a': [1.0, 2.0]})
+    assert cache_budget.cache_key((df,), {}) == cache_budget.cache_key((df.copy(),), {})
+    assert cache_budget.cache_key((df,), {}) != cache_budget.cache_key((df.assign(a=[1.0, 3.0]),), {})
+    assert cache_budget.cache_key((df,), {}) != cache_budget.cache_key((df.astype('float32'),), {})
+
+def test_nbytes_counts_nested_containers():
+    values = np.zeros(100)
+    assert nbytes({'x': [values, values]}) > 2 * values.nbytes
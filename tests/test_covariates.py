@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from covariates import join_covariates, store_version, write_source
+
+def periods(n=6):
+    return pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=n, freq='MS'), 'GMV': np.arange(n, dtype=float)})
+
+def test_window_join_matches_monthly_groupby(tmp_path):
+    rng = np.random.default_rng(0)
+    # Distinct times: a later observation with the same time replaces an earlier one
+    hours = rng.choice(220 * 24, 500, replace=False)
+    observations = pd.DataFrame({'time': pd.Timestamp('2023-12-15') + pd.to_timedelta(hours, unit='h'),
+                                 'rain': rng.gamma(2.0, 1.0, 500)})
+    write_source(observations, tmp_path / 'weather', 'time', ['rain'], how='window', agg='sum')
+
+    joined = join_covariates(periods(), str(tmp_path))
+    expected = observations.groupby(observations['time'].dt.to_period('M').dt.start_time)['rain'].sum()
+    np.testing.assert_allclose(joined['rain'].to_numpy(), expected.reindex(joined['Date']).to_numpy())
+
+def test_asof_join_takes_the_last_observation_of_each_period(tmp_path):
+    observations = pd.DataFrame({'time': pd.to_datetime(['2024-01-10', '2024-01-31', '2024-03-05']),
+                                 'index': [1.0, 2.0, 3.0]})
+    write_source(observations, tmp_path / 'market', 'time', ['index'], how='asof')
+
+    joined = join_covariates(periods(4), str(tmp_path))
+    # February has no observation of its own and carries January's last one forward
+    assert joined['index'].tolist() == [2.0, 2.0, 3.0, 3.0]
+
+def test_store_version_changes_on_ingest(tmp_path):
+    assert store_version(str(tmp_path)) is None
+    observations = pd.DataFrame({'time': pd.to_datetime(['2024-01-10']), 'rain': [1.0]})
+    write_source(observations, tmp_path / 'weather', 'time', ['rain'])
+    version = store_version(str(tmp_path))
+    write_source(observations.assign(time=pd.to_datetime(['2024-02-10'])), tmp_path / 'weather', 'time', ['rain'])
+    assert store_version(str(tmp_path)) not in (None, version)
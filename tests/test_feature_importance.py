@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from feature_importance import compute_attributions, fit_tree, predict_tree, tree_shap
+
+def test_tree_shap_is_additive():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(60, 4))
+    residual = X[:, 0] * 2 - X[:, 1] * X[:, 2] + rng.normal(scale=0.1, size=60)
+    tree = fit_tree(X, residual)
+    base = predict_tree(tree, X, np.zeros(X.shape[1], dtype=bool))
+    np.testing.assert_allclose(tree_shap(tree, X).sum(axis=1) + base, predict_tree(tree, X))
+
+def test_unused_features_get_no_attribution():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(40, 3))
+    tree = fit_tree(X, X[:, 1])
+    phi = tree_shap(tree, X)
+    unused = np.setdiff1d(np.arange(X.shape[1]), tree['feature'][tree['feature'] >= 0])
+    assert np.all(phi[:, unused] == 0)
+
+def test_monthly_shap_values_are_centered():
+    # Each month's attributions sum to its prediction minus the mean prediction over the training months
+    rng = np.random.default_rng(2)
+    months = pd.date_range('2023-07-01', periods=24, freq='MS')
+    df = pd.DataFrame(rng.gamma(2.0, 10.0, size=(24, 3)), columns=['TV', 'SEM', 'Radio'])
+    df['Date'] = months
+    df['Camera'] = 3 * df['TV'] + df['SEM'] + rng.normal(scale=1.0, size=24)
+    importance, shap = compute_attributions(df, ['Camera'], ['TV', 'SEM', 'Radio'], workers=1)
+
+    totals = sum(values.loc['Camera'].sum() for values in shap.values())
+    scale = sum(values.loc['Camera'].abs().sum() for values in shap.values())
+    assert abs(totals) <= 1e-9 * scale
+    np.testing.assert_allclose(importance.sum(axis=1), 1.0)
+    assert importance.loc['Camera'].idxmax() == 'TV'
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from forecasting import (ALPHAS, BETAS, MIN_PERIODS, fill_excluded, forecast_frame, forecast_matrix, future_exog,
+                         holt_fit)
+
+def reference_holt_sse(series, alpha, beta):
+    level, trend, sse = series[0], series[1] - series[0], 0.0
+    for value in series[1:]:
+        error = value - (level + trend)
+        sse += error ** 2
+        level, trend = level + trend + alpha * error, trend + alpha * beta * error
+    return sse, level, trend
+
+def monthly_frame(n_months=24, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_months)
+    return pd.DataFrame({
+        'Date': pd.date_range('2022-01-01', periods=n_months, freq='MS'),
+        'GMV': 1000 + 20 * t + 50 * np.sin(2 * np.pi * t / 12) + rng.normal(0, 10, n_months),
+        'Margin': rng.normal(0, 5, n_months),
+        'Total Investment': rng.gamma(2.0, 100.0, n_months),
+        'Has Holiday': (t % 12 == 10).astype(float)
+    })
+
+def test_holt_fit_picks_the_grid_point_with_the_lowest_error():
+    y = np.random.default_rng(1).normal(100, 10, (3, 20)).cumsum(axis=1)
+    state = holt_fit(y)
+    for row, series in enumerate(y):
+        fits = {(alpha, beta): reference_holt_sse(series, alpha, beta) for alpha in ALPHAS for beta in BETAS}
+        best = min(fits, key=lambda key: fits[key][0])
+        assert (state['alpha'][row], state['beta'][row]) == pytest.approx(best)
+        assert state['level'][row] == pytest.approx(fits[best][1])
+        assert state['trend'][row] == pytest.approx(fits[best][2])
+
+def test_linear_series_is_extrapolated_exactly():
+    df = monthly_frame()[['Date']].assign(Linear=np.arange(24) * 5.0 + 10)
+    forecast = forecast_frame(df, ['Linear'], 3)
+    np.testing.assert_allclose(forecast['Forecast'], [130.0, 135.0, 140.0], atol=1e-6)
+    assert forecast['Date'].tolist() == list(pd.date_range('2024-01-01', periods=3, freq='MS'))
+
+def test_batches_chunks_and_workers_agree():
+    rng = np.random.default_rng(2)
+    y = 100 + rng.normal(0, 5, (9, 30)).cumsum(axis=1)
+    exog = rng.gamma(2.0, 1.0, (30, 2))
+    whole = forecast_matrix(y, exog, 4, 12)
+    chunked = forecast_matrix(y, exog, 4, 12, workers=2, chunk_size=4)
+    np.testing.assert_allclose(chunked[0], whole[0])
+    np.testing.assert_allclose(chunked[1], whole[1])
+    assert chunked[2].tolist() == whole[2].tolist()
+
+def test_intervals_nest_and_nonnegative_series_are_floored():
+    df = monthly_frame()
+    df['Sparse'] = np.r_[np.full(20, 50.0), [5.0, 1.0, 0.5, 0.0]]
+    forecast = forecast_frame(df, ['GMV', 'Margin', 'Sparse'], 6)
+    assert set(forecast['Series']) == {'GMV', 'Margin', 'Sparse'}
+    assert (forecast['Lower_95'] <= forecast['Lower_80']).all()
+    assert (forecast['Lower_80'] <= forecast['Forecast']).all()
+    assert (forecast['Forecast'] <= forecast['Upper_80']).all()
+    assert (forecast['Upper_80'] <= forecast['Upper_95']).all()
+    sparse = forecast[forecast['Series'] == 'Sparse']
+    assert (sparse[['Forecast', 'Lower_80', 'Lower_95']] >= 0).all().all()
+    # A series that has been negative is not floored
+    assert (forecast.loc[forecast['Series'] == 'Margin', 'Lower_95'] < 0).any()
+
+def test_series_with_gaps_and_short_histories_are_skipped():
+    df = monthly_frame()
+    df.loc[5, 'Margin'] = np.nan
+    assert forecast_frame(df, ['GMV', 'Margin'], 3)['Series'].unique().tolist() == ['GMV']
+    assert forecast_frame(df.head(MIN_PERIODS - 1), ['GMV'], 3).empty
+    assert forecast_frame(df, ['GMV'], 0).empty
+
+def test_excluded_periods_are_interpolated_before_fitting():
+    df = monthly_frame()
+    spiked = df.assign(GMV=df['GMV'].where(df.index != 8, 10 * df['GMV']))
+    excluded = {'GMV': df.index == 8}
+    interpolated = df.assign(GMV=df['GMV'].where(df.index != 8, (df.loc[7, 'GMV'] + df.loc[9, 'GMV']) / 2))
+    pd.testing.assert_frame_equal(forecast_frame(spiked, ['GMV'], 3, excluded=excluded),
+                                  forecast_frame(interpolated, ['GMV'], 3))
+
+def test_fill_excluded_keeps_rows_without_usable_points():
+    values = np.array([[1.0, 50.0, 3.0], [7.0, 8.0, 9.0]])
+    filled = fill_excluded(values, np.array([[False, True, False], [True, True, True]]))
+    np.testing.assert_array_equal(filled, [[1.0, 2.0, 3.0], [7.0, 8.0, 9.0]])
+
+def test_future_regressors_repeat_the_previous_season():
+    exog = np.arange(24, dtype=np.float64)[:, None]
+    np.testing.assert_array_equal(future_exog(exog, 3, 12)[:, 0], [12.0, 13.0, 14.0])
+    # Without a full season of history the last value is carried forward
+    np.testing.assert_array_equal(future_exog(exog[:6], 2, 12)[:, 0], [5.0, 5.0])
@@ -0,0 +1,43 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+import shared_data
+import utils
+from shared_data import LOADERS, check, publish
+
+@pytest.fixture
+def shared_root(tmp_path, monkeypatch):
+    root = str(tmp_path / 'shared')
+    publish(root, utils.DATA_DIR)
+    # Serve the default loaders from the published version, polling it on the first call
+    monkeypatch.setattr(shared_data, 'SHARED_DATA_ROOT', root)
+    monkeypatch.setattr(shared_data, '_attached', {'version': None, 'checked': float('-inf'), 'frames': {}})
+    return root
+
+def shared_loaders():
+    """The app's loaders by shared dataset name"""
+    return {name: loader for loader in vars(utils).values()
+            for name, read in LOADERS.items() if getattr(loader, 'read', None) is read}
+
+def test_every_loader_is_shared():
+    assert set(shared_loaders()) == set(LOADERS)
+
+@pytest.mark.parametrize('name', sorted(LOADERS))
+def test_shared_mode_reads_like_file_mode(shared_root, name):
+    shared = shared_loaders()[name]()
+    assert shared_data._attached['version'] is not None
+    pd.testing.assert_frame_equal(shared, LOADERS[name](utils.DATA_DIR))
+
+def test_check_finds_no_mismatch(shared_root):
+    assert check(shared_root, utils.DATA_DIR) == {}
+
+def test_check_reports_changed_data(shared_root, tmp_path):
+    data_dir = tmp_path / 'data'
+    shutil.copytree(utils.DATA_DIR, data_dir)
+    path = data_dir / 'feature_importance_values.csv'
+    values = pd.read_csv(path, index_col=0)
+    values.iloc[0, 0] += 1
+    values.to_csv(path)
+    assert list(check(shared_root, str(data_dir))) == ['feature_importance']
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import HyperLogLog, OrderSketch, QuantileSketch, hash_values, ingest_orders, merge_partitions, read_store
+
+def make_orders(n_orders=20000, n_customers=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'order_date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 91, n_orders), unit='D'),
+        'customer_id': rng.integers(0, n_customers, n_orders),
+        'category': rng.choice(['Camera', 'GameCDDVD', 'GamingHardware'], n_orders),
+        'gmv': rng.lognormal(6.0, 1.0, n_orders),
+        'units': rng.integers(1, 5, n_orders)
+    })
+
+@pytest.mark.parametrize('n_distinct', [100, 5000, 200000])
+def test_distinct_count_within_error_bound(n_distinct):
+    sketch = HyperLogLog().add_hashes(hash_values(np.arange(n_distinct)))
+    # Three standard errors; small counts use linear counting and are much tighter
+    assert abs(sketch.estimate() - n_distinct) <= 3 * sketch.relative_error * n_distinct
+
+def test_merged_distinct_count_matches_single_sketch():
+    values = np.arange(50000)
+    whole = HyperLogLog().add_hashes(hash_values(values))
+    merged = HyperLogLog().add_hashes(hash_values(values[:30000])).merge(HyperLogLog().add_hashes(hash_values(values[20000:])))
+    np.testing.assert_array_equal(merged.registers, whole.registers)
+
+@pytest.mark.parametrize('q', [0.01, 0.25, 0.5, 0.9, 0.99])
+def test_quantiles_within_relative_accuracy(q):
+    values = np.random.default_rng(1).lognormal(5.0, 2.0, 50000)
+    sketch = QuantileSketch().add(values)
+    exact = np.sort(values)[int(q * (len(values) - 1))]
+    assert abs(sketch.quantile(q) - exact) <= sketch.relative_accuracy * exact
+
+def test_non_positive_values_are_counted_below_every_bucket():
+    sketch = QuantileSketch().add([-5.0, 0.0, 0.0, 10.0, 20.0, np.nan])
+    assert sketch.count == 5
+    assert sketch.quantile(0.25) == 0.0
+    assert abs(sketch.quantile(1.0) - 20.0) <= sketch.relative_accuracy * 20.0
+
+def test_merged_partitions_match_one_sketch(tmp_path):
+    orders = make_orders()
+    ingest_orders(orders, tmp_path)
+    store = read_store(tmp_path)
+    assert sorted(store) == ['2024-01', '2024-02', '2024-03']
+
+    merged = merge_partitions(store, sorted(store)).summary()
+    whole = OrderSketch.from_orders(orders).summary()
+    assert merged['orders'] == len(orders)
+    assert merged['units'] == orders['units'].sum()
+    assert merged['gmv'] == pytest.approx(orders['gmv'].sum())
+    assert merged['median_order_value'] == whole['median_order_value']
+    assert merged['distinct_customers'] == pytest.approx(whole['distinct_customers'])
+    exact = orders['customer_id'].nunique()
+    assert abs(merged['distinct_customers'] - exact) <= 3 * merged['distinct_customers_error'] * exact
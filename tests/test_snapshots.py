@@ -0,0 +1,83 @@
+import os
+
+import pandas as pd
+import pytest
+
+from snapshots import checkout, commit, list_versions, partition_bounds, resolve
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data_dir = tmp_path / 'data'
+    (data_dir / 'store').mkdir(parents=True)
+    table = pd.DataFrame({'Month': [f'M{i:04d}' for i in range(400)], 'GMV': [str(i * 7) for i in range(400)]})
+    table.to_csv(data_dir / 'final_merged.csv', index=False)
+    (data_dir / 'store' / 'notes.txt').write_text('first')
+    return data_dir
+
+def partitions(manifest, name='final_merged.csv'):
+    return manifest['files'][name]['partitions']
+
+def test_checkout_round_trip(data_dir, tmp_path):
+    store = str(tmp_path / 'snapshots')
+    version = commit(str(data_dir), store)
+    assert commit(str(data_dir), store) == version
+    target = checkout(version, store)
+    pd.testing.assert_frame_equal(pd.read_csv(os.path.join(target, 'final_merged.csv'), dtype=str),
+                                  pd.read_csv(data_dir / 'final_merged.csv', dtype=str))
+    assert open(os.path.join(target, 'store', 'notes.txt')).read() == 'first'
+
+def test_inserted_row_keeps_other_partitions(data_dir, tmp_path):
+    store = str(tmp_path / 'snapshots')
+    first = commit(str(data_dir), store)
+    table = pd.read_csv(data_dir / 'final_merged.csv', dtype=str)
+    inserted = pd.concat([table.iloc[:3], pd.DataFrame({'Month': ['Mnew'], 'GMV': ['1']}), table.iloc[3:]])
+    inserted.to_csv(data_dir / 'final_merged.csv', index=False)
+    second = commit(str(data_dir), store, note='insert')
+    assert second != first
+
+    manifests = {manifest['version']: manifest for manifest in list_versions(store)}
+    before, after = partitions(manifests[first]), partitions(manifests[second])
+    assert len(before) > 4
+    # Only the partition receiving the row changes (a new boundary may split it in two)
+    assert len([part for part in after if part not in before]) <= 2
+    assert len([part for part in before if part not in after]) == 1
+
+def test_partition_bounds_cover_the_table():
+    table = pd.DataFrame({'value': [str(i) for i in range(1000)]})
+    bounds = partition_bounds(table)
+    assert bounds[0][0] == 0 and bounds[-1][1] == len(table)
+    assert all(stop == start for (_, stop), (start, _) in zip(bounds, bounds[1:]))
+    assert partition_bounds(table.iloc[:0]) == [(0, 0)]
+
+def test_resolve_and_evict(data_dir, tmp_path):
+    store = str(tmp_path / 'snapshots')
+    versions = []
+    for i in range(3):
+        (data_dir / 'store' / 'notes.txt').write_text(f'version {i}')
+        versions.append(commit(str(data_dir), store))
+    assert resolve(versions[1], store) == versions[1]
+    assert resolve('2200-01-01', store) == versions[-1]
+    with pytest.raises(ValueError):
+        resolve('1999-01-01', store)
+
+    for version in versions:
+        checkout(version, store, keep=2)
+    kept = os.listdir(os.path.join(store, 'checkouts'))
+    assert len(kept) == 2 and versions[-1] in kept
+    # An evicted version is checked out again from the store
+    evicted = next(version for version in versions if version not in kept)
+    notes = open(os.path.join(checkout(evicted, store, keep=2), 'store', 'notes.txt')).read()
+    assert notes == f'version {versions.index(evicted)}'
+
+def test_snapshot_version_follows_new_commits(data_dir, tmp_path, monkeypatch):
+    import utils
+
+    store = str(tmp_path / 'snapshots')
+    monkeypatch.setattr(utils, 'resolve', lambda as_of: resolve(as_of, store))
+    assert utils.snapshot_version('2200-01-01') is None
+    first = commit(str(data_dir), store)
+    # A miss is not remembered
+    assert utils.snapshot_version('2200-01-01') == first
+    (data_dir / 'store' / 'notes.txt').write_text('second')
+    second = commit(str(data_dir), store)
+    assert utils.snapshot_version('2200-01-01') == second
@@ -0,0 +1,17 @@
+from spend_plans import row_window
+
+PLAN_START = '2024-03-01'
+
+def test_row_window_covers_the_dates():
+    assert row_window('2024-03-01', '2024-03-31', None, PLAN_START) == (0, 31)
+    assert row_window('2024-03-10', None, None, PLAN_START) == (9, None)
+
+def test_row_window_clamps_to_the_plan():
+    # A start before the plan reads from its first row, and an end before the start selects nothing
+    assert row_window('2024-01-01', '2024-03-02', None, PLAN_START) == (0, 2)
+    first, stop = row_window('2024-03-10', '2024-02-01', None, PLAN_START)
+    assert stop == first
+
+def test_row_window_applies_the_row_limit():
+    assert row_window('2024-03-05', '2024-12-31', 10, PLAN_START) == (4, 14)
+    assert row_window(None, None, 10, PLAN_START) == (0, 10)
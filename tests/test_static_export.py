@@ -0,0 +1,67 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cohorts import ingest_orders, read_activity, read_customers
+from sketches import ingest_orders as sketch_orders, read_store
+from static_export import late_labels, publish_data_dir
+from utils import FORECAST_META
+
+def make_orders(n_orders=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'order_date': (pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 182, n_orders), unit='D')).strftime('%Y-%m-%d'),
+        'customer_id': rng.integers(0, 300, n_orders).astype(str),
+        'category': rng.choice(['Camera', 'GameCDDVD'], n_orders),
+        'gmv': rng.gamma(2.0, 100.0, n_orders),
+        'units': rng.integers(1, 4, n_orders)
+    })
+
+@pytest.fixture(scope='module')
+def published(tmp_path_factory):
+    root = tmp_path_factory.mktemp('export')
+    source = root / 'data'
+    publish_data_dir('attached_assets', '2024-06', str(source))
+    orders = make_orders()
+    ingest_orders(orders, source / 'cohorts')
+    sketch_orders(orders, source / 'sketches')
+    return orders, source, publish_data_dir(str(source), '2024-04', str(root / 'published'))
+
+def test_merged_data_and_plans_stop_at_the_month(published):
+    _, _, target = published
+    merged = pd.read_csv(os.path.join(target, 'final_merged.csv'))
+    assert (merged['Year'] * 100 + merged['Month']).max() == 202404
+    # Daily plans start on 2024-03-01: March and April are kept
+    assert len(pd.read_csv(os.path.join(target, 'final_optimized_spend.csv'))) == 31 + 30
+    assert pd.to_datetime(pd.read_csv(os.path.join(target, 'merged_file.csv'))['Unnamed: 0_baseline']).max() == pd.Timestamp('2024-04-30')
+
+def test_order_stores_match_a_store_built_from_the_published_orders(published, tmp_path):
+    orders, _, target = published
+    expected = tmp_path / 'cohorts'
+    ingest_orders(orders[orders['order_date'] < '2024-05'], expected)
+    columns = ['cohort', 'order_month']
+    pd.testing.assert_frame_equal(read_activity(os.path.join(target, 'cohorts')).sort_values(columns, ignore_index=True),
+                                  read_activity(expected).sort_values(columns, ignore_index=True))
+    pd.testing.assert_series_equal(read_customers(os.path.join(target, 'cohorts')).sort_index(),
+                                   read_customers(expected).sort_index())
+    with open(os.path.join(target, 'cohorts', 'manifest.json')) as f:
+        assert json.load(f)['months'] == ['2024-01', '2024-02', '2024-03', '2024-04']
+    assert sorted(read_store(os.path.join(target, 'sketches'))) == ['2024-01', '2024-02', '2024-03', '2024-04']
+
+def test_months_before_the_plans_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match='budget plans start'):
+        publish_data_dir('attached_assets', '2024-01', str(tmp_path / 'published'))
+
+def test_late_labels_allow_the_cutoff_quarter_and_forecasts():
+    page = {
+        'periods': {'Month': ['2024-03', '2024-04'], 'Quarter': ['2024-Q1', '2024-Q2']},
+        'charts': [{'data': [{'x': ['2024-04-30', '2024-04-01T00:00:00'], 'name': 'GMV'},
+                             {'x': ['2024-04', '2024-07'], 'meta': FORECAST_META}]}]
+    }
+    assert late_labels(page, '2024-04') == []
+    page['charts'][0]['data'][0]['x'].append('2024-05-01')
+    page['periods']['Quarter'].append('2024-Q3')
+    assert late_labels(page, '2024-04') == ['2024-05-01', '2024-Q3']
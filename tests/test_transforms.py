@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from transforms import (geometric_adstock, hill_saturation, reference_geometric_adstock, reference_hill_saturation,
+                        reference_weibull_adstock, sample_hyperparameters, weibull_adstock)
+
+N_CHANNELS, N_PERIODS = 4, 30
+
+@pytest.fixture(scope='module')
+def spend():
+    rng = np.random.default_rng(0)
+    spend = rng.gamma(2.0, 50.0, (N_CHANNELS, N_PERIODS))
+    # Dark periods exercise the zero-spend paths
+    spend[1, 5:12] = 0.0
+    return spend
+
+@pytest.fixture(scope='module')
+def params():
+    return sample_hyperparameters(8, N_CHANNELS)
+
+def test_geometric_adstock_with_shared_rates_matches_loops(spend):
+    # Fewer distinct rates than periods takes the grouped lfilter path
+    theta = np.tile([0.1, 0.5, 0.5, 0.8], (3, 1))
+    np.testing.assert_allclose(geometric_adstock(spend, theta), reference_geometric_adstock(spend, theta))
+
+def test_geometric_adstock_with_distinct_rates_matches_loops(spend, params):
+    # 8 sets x 4 channels = 32 distinct rates > 30 periods takes the time recursion path
+    theta = params['theta']
+    assert len(np.unique(theta)) > N_PERIODS
+    np.testing.assert_allclose(geometric_adstock(spend, theta), reference_geometric_adstock(spend, theta))
+
+def test_one_rate_per_set_broadcasts_over_channels(spend):
+    theta = np.array([0.2, 0.6])
+    expected = reference_geometric_adstock(spend, np.repeat(theta[:, None], N_CHANNELS, axis=1))
+    np.testing.assert_allclose(geometric_adstock(spend, theta), expected)
+
+@pytest.mark.parametrize('kind', ['cdf', 'pdf'])
+@pytest.mark.parametrize('max_lag', [6, N_PERIODS])
+def test_weibull_adstock_matches_loops(spend, params, kind, max_lag):
+    fast = weibull_adstock(spend, params['shape'], params['scale'], max_lag, kind)
+    slow = reference_weibull_adstock(spend, params['shape'], params['scale'], max_lag, kind)
+    np.testing.assert_allclose(fast, slow, rtol=1e-9, atol=1e-9 * np.abs(slow).max())
+
+def test_weibull_adstock_rejects_unknown_kind(spend, params):
+    with pytest.raises(ValueError, match="'cdf' or 'pdf'"):
+        weibull_adstock(spend, params['shape'], params['scale'], 6, kind='exp')
+
+def test_hill_saturation_matches_loops(spend, params):
+    adstocked = geometric_adstock(spend, params['theta'])
+    saturated = hill_saturation(adstocked, params['alpha'], params['gamma'])
+    np.testing.assert_allclose(saturated, reference_hill_saturation(adstocked, params['alpha'], params['gamma']))
+    assert ((saturated >= 0) & (saturated <= 1)).all()
+
+def test_hill_saturation_of_a_channel_time_matrix(spend, params):
+    saturated = hill_saturation(spend, params['alpha'][:1], params['gamma'][:1])
+    assert saturated.shape == (1, N_CHANNELS, N_PERIODS)
+    np.testing.assert_allclose(saturated, reference_hill_saturation(spend[None], params['alpha'][:1], params['gamma'][:1]))
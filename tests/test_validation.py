@@ -0,0 +1,98 @@
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import validation
+from validation import SchemaError, validate, validation_report
+
+@pytest.fixture(autouse=True)
+def quarantine_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(validation, 'QUARANTINE_DIR', str(tmp_path / 'quarantine'))
+    return tmp_path / 'quarantine'
+
+def monthly_revenue(n_months=6):
+    dates = pd.date_range('2024-01-01', periods=n_months, freq='MS')
+    baseline = np.linspace(100.0, 150.0, n_months)
+    return pd.DataFrame({
+        'Date': dates,
+        'baseline': baseline,
+        'optimized': baseline * 1.1,
+        'improvement': baseline * 0.1,
+        'improvement_pct': np.full(n_months, 10.0)
+    })
+
+def test_quarantine_dir_is_anchored_on_the_module(tmp_path, monkeypatch):
+    # Import a fresh copy from another working directory, without the override
+    monkeypatch.delenv('DASHBOARD_QUARANTINE_DIR', raising=False)
+    monkeypatch.chdir(tmp_path)
+    spec = importlib.util.spec_from_file_location('fresh_validation', validation.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert module.QUARANTINE_DIR == os.path.join(os.path.dirname(validation.__file__), '.cache', 'quarantine')
+
+def test_clean_frame_passes_through(quarantine_dir):
+    df = monthly_revenue()
+    checked = validate('monthly_revenue', df, 'attached_assets')
+    pd.testing.assert_frame_equal(checked, df)
+    report = checked.attrs['validation']
+    assert report['quarantined_rows'] == 0 and report['violations'] == [] and report['quarantine_file'] is None
+    assert not quarantine_dir.exists()
+
+def test_missing_column_raises_schema_error():
+    with pytest.raises(SchemaError, match="missing column.*'optimized'"):
+        validate('monthly_revenue', monthly_revenue().drop(columns='optimized'), 'attached_assets')
+
+def test_wrong_type_raises_schema_error():
+    df = monthly_revenue().astype({'baseline': str})
+    with pytest.raises(SchemaError, match="'baseline' should be number"):
+        validate('monthly_revenue', df, 'attached_assets')
+
+def test_row_violations_quarantine_their_partitions(quarantine_dir):
+    df = monthly_revenue()
+    df.loc[1, 'baseline'] = -5.0
+    df.loc[4, 'optimized'] = np.nan
+    checked = validate('monthly_revenue', df, 'attached_assets')
+
+    assert checked['Date'].tolist() == df['Date'].drop([1, 4]).tolist()
+    report = checked.attrs['validation']
+    assert report['rows'] == 6 and report['quarantined_rows'] == 2
+    assert report['quarantined_partitions'] == [str(df.loc[1, 'Date']), str(df.loc[4, 'Date'])]
+    assert {(v['check'], v['column'], v['rows']) for v in report['violations']} == {
+        ('>= 0', 'baseline', 1), ('non-null', 'optimized', 1)
+    }
+
+    quarantined = pd.read_csv(report['quarantine_file'])
+    assert os.path.dirname(report['quarantine_file']) == str(quarantine_dir)
+    assert quarantined['_violations'].tolist() == ['baseline >= 0; ', 'optimized non-null; ']
+
+def test_out_of_order_dates_are_quarantined():
+    df = monthly_revenue()
+    df.loc[3, 'Date'] = df.loc[1, 'Date']
+    report = validate('monthly_revenue', df, 'attached_assets').attrs['validation']
+    assert report['violations'] == [{'check': 'strictly increasing', 'column': 'Date', 'rows': 1}]
+    assert report['quarantined_partitions'] == [str(df.loc[1, 'Date'])]
+    # The whole partition goes, including the earlier row that was in order
+    assert report['quarantined_rows'] == 2
+
+def test_cross_column_rules():
+    df = pd.DataFrame({
+        'solID': ['1_1', '1_1'], 'channels': ['TV', 'SEM'],
+        'initSpendUnit': [1.0, 2.0], 'optmSpendUnit': [1.0, 2.0],
+        'initResponseUnit': [1.0, 2.0], 'optmResponseUnit': [1.0, 2.0], 'initResponseMargUnit': [1.0, 2.0],
+        'constr_low': [0.5, 1.5], 'constr_up': [1.5, 1.0]
+    })
+    checked = validate('robyn_max_response', df, 'attached_assets')
+    assert checked['channels'].tolist() == ['TV']
+    assert checked.attrs['validation']['violations'] == [{'check': 'constr_low <= constr_up', 'column': None, 'rows': 1}]
+
+def test_validation_report_summarises_assets():
+    df = monthly_revenue()
+    df.loc[2, 'baseline'] = -1.0
+    reports = [validate('monthly_revenue', df, 'attached_assets').attrs['validation'],
+               validate('monthly_revenue', monthly_revenue(), 'attached_assets').attrs['validation']]
+    summary = validation_report(reports)
+    assert summary['Status'].tolist() == ['quarantined', 'ok']
+    assert summary.loc[0, 'Violations'] == 'baseline >= 0 (1 rows)'
@@ -3,48 +3,213 @@ import numpy as np
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 import ast
+import functools
+import hashlib
+import inspect
+import os
 import re
 
+from shared_data import SHARED_DATA_ROOT, shared_loader, status as shared_status
+from sketches import merge_partitions, read_store
+from cohorts import clv_matrix, cohort_summary, read_activity, retention_matrix
+from spend_plans import scan_spend_plan
+from allocator import fit_response_curves
+from validation import validate, validation_report
+from forecasting import CHUNK_SIZE, forecast_frame
+from anomalies import AnomalyStore
+from event_impact import event_lift
+from cache_budget import NO_SESSION, current_session, governed_cache
+from backtest import rolling_origin_backtest, summarize
+from bitmaps import BitmapIndex
+from hierarchy import HierarchyIndex
+from feature_importance import load_attributions
+from covariates import join_covariates, list_sources, resample_aggregations, store_version
+from experiments import calibrate_curves, read_results
+from snapshots import checkout, list_versions, resolve
+from flighting import adstock, fit_flighting_curves, plan_response, solve_flighting
+
 # Set blue color theme with enhanced gradient
 BLUE_PALETTE = ['#0D47A1', '#1565C0', '#1976D2', '#1E88E5', '#2196F3', '#42A5F5', '#64B5F6', '#90CAF9', '#BBDEFB', '#E3F2FD']
 SINGLE_BLUE = '#1976D2'
 # Highlight colors for important elements
 HIGHLIGHT_BLUE = '#01579B'
 ACCENT_BLUE = '#29B6F6'
+# Markers for anomalous periods
+ALERT_RED = '#E53935'
+# Palette used by the Budget Optimization page
+BUDGET_PALETTE = ['#0D2A63', '#2073BC', '#2196f3', '#64b5f6', '#bbdefb']
+
+# Plotly serializes the default template into every figure, and its stock template made up most of the chart
+# bytes sent to the browser; this small template carries only the shared styling the dashboard relies on
+pio.templates['dashboard'] = go.layout.Template(layout=dict(
+    colorway=BLUE_PALETTE,
+    colorscale=dict(sequential=px.colors.sequential.Blues, diverging=px.colors.diverging.RdBu),
+    font=dict(color='#424242'),
+    paper_bgcolor='white',
+    plot_bgcolor='white',
+    xaxis=dict(gridcolor='#EEEEEE', linecolor='#BDBDBD', zerolinecolor='#BDBDBD', automargin=True),
+    yaxis=dict(gridcolor='#EEEEEE', linecolor='#BDBDBD', zerolinecolor='#BDBDBD', automargin=True),
+    hoverlabel=dict(align='left')
+))
+pio.templates.default = os.environ.get('DASHBOARD_PLOTLY_TEMPLATE', 'dashboard')
+
+# Directory holding the CSV assets; override to point the app at another tenant's data
+DATA_DIR = os.environ.get('DASHBOARD_DATA_DIR', 'attached_assets')
+
+PRODUCT_CATEGORIES = ['Camera', 'CameraAccessory', 'EntertainmentSmall', 'GameCDDVD', 'GamingHardware']
+MARKETING_CHANNELS = ['TV', 'Digital', 'Sponsorship', 'Content Marketing', 
+                      'Online Marketing', 'Affiliates', 'SEM', 'Radio', 'Other']
+# Column names in the Optym spend plan CSVs have different spelling and spaces in them
+OPTYM_CHANNELS = ['TV', 'Digital', 'Sponsorship', 'Content Marketing', 
+                  'Online marketing', ' Affiliates', 'SEM', 'Radio', 'Other']
+# The Optym spend plans hold one row per day starting on this date
+PLAN_START_DATE = '2024-03-01'
+
+# Supported period granularities and their pandas resample frequencies
+GRANULARITIES = {'Day': 'D', 'Week': 'W-MON', 'Month': 'MS', 'Quarter': 'QS'}
+# Matching pandas period frequencies, used to snap range starts to a period boundary
+PERIOD_FREQUENCIES = {'Day': 'D', 'Week': 'W', 'Month': 'M', 'Quarter': 'Q'}
+# Periods forecast until the viewer changes the horizon
+DEFAULT_FORECAST_HORIZON = 3
+# Trace meta of forecast fans, whose periods lie after the data
+FORECAST_META = 'forecast'
+# Merged data columns that are averaged (or maxed) when resampling; all other numeric columns are summed
+MERGED_AGGREGATIONS = {
+    'Has Holiday': 'max', 'Holiday Percentage': 'mean', 'Sales Percentage': 'mean', 
+    'NPS': 'mean', 'Stock Index': 'mean', 'tavg': 'mean', 'prcp': 'mean', 'wspd': 'mean', 
+    'pres': 'mean', 'CLV': 'mean', 'CAC': 'mean', 'Delivery_Performance': 'mean', 
+    'Procurement_Performance': 'mean'
+}
+
+# Pre-joined monthly weather columns of the merged data
+WEATHER_COLUMNS = ['tavg', 'prcp', 'wspd', 'pres']
+
+KPI_COLUMNS = ['Total_GMV', 'ROI', 'CLV', 'CAC', 'NPS', 'Stock Index', 
+               'Delivery_Performance', 'Procurement_Performance', 'Profit']
 
-@st.cache_data
-def load_merged_data():
+# Metric streams run through the anomaly detector
+ANOMALY_STREAMS = ['merged_data', 'daily_revenue']
+
+def asset_path(filename, data_dir=DATA_DIR):
+    """Return the path of a data asset inside the given data directory"""
+    return os.path.join(data_dir, filename)
+
+def session_as_of():
+    """Snapshot the session is viewing (``?as_of=``), kept across pages; None for the live data"""
+    if current_session() == NO_SESSION:
+        return None
+    state = st.session_state
+    if 'as_of' in st.query_params:
+        state['as_of'] = st.query_params['as_of']
+    elif state.get('as_of'):
+        # Page links drop the query string
+        st.query_params['as_of'] = state['as_of']
+    return state.get('as_of')
+
+def snapshot_version(as_of):
+    """Snapshot version as of a version id or date; None when there is none.
+
+    Not cached: list_versions re-reads the manifests only when the versions
+    directory changes, so a new snapshot is picked up on the next rerun.
+    """
     try:
-        df = pd.read_csv('attached_assets/final_merged.csv')
-        # Create YearMonth column for easier filtering
-        df['YearMonth'] = df['Year'].astype(str) + '-' + df['Month'].astype(str).str.zfill(2)
+        return resolve(as_of)
+    except ValueError:
+        return None
+
+def snapshot_data_dir(as_of):
+    """Checked-out data directory of the snapshot as of a version id or date; None when there is none.
+
+    Checkouts are evicted when unused, so the directory is checked out again
+    (from the stored partitions) whenever it has been removed.
+    """
+    version = snapshot_version(as_of)
+    return None if version is None else checkout(version)
+
+def as_of_loader(loader):
+    """Decorator serving a loader's default data directory from the snapshot the session views.
+
+    Calls that pass another data directory are left alone, so the snapshot
+    directory is threaded through nested loaders and keys their caches.
+    """
+    signature = inspect.signature(loader)
+
+    @functools.wraps(loader)
+    def wrapper(*args, **kwargs):
+        arguments = signature.bind(*args, **kwargs)
+        if arguments.arguments.get('data_dir', DATA_DIR) == DATA_DIR:
+            as_of = session_as_of()
+            snapshot_dir = snapshot_data_dir(as_of) if as_of else None
+            if snapshot_dir is not None:
+                arguments.arguments['data_dir'] = snapshot_dir
+                return loader(*arguments.args, **arguments.kwargs)
+        return loader(*args, **kwargs)
+    return wrapper
+
+@shared_loader('merged_data')
+@governed_cache(max_entries=4)
+def read_merged_data(data_dir=DATA_DIR):
+    """final_merged.csv as read from disk, before covariates are joined"""
+    df = pd.read_csv(asset_path('final_merged.csv', data_dir))
+    # Date column backs the period index; keep rows sorted so ranges can be binary searched
+    df['Date'] = pd.to_datetime(dict(year=df['Year'], month=df['Month'], day=1))
+    df = df.sort_values('Date', kind='stable').reset_index(drop=True)
+    # Create YearMonth column for easier filtering
+    df['YearMonth'] = df['Year'].astype(str) + '-' + df['Month'].astype(str).str.zfill(2)
+    return validate('merged_data', df, data_dir)
+
+def covariates_version(data_dir=DATA_DIR):
+    return store_version(asset_path('covariates', data_dir))
+
+@governed_cache(max_entries=4)
+def join_merged_covariates(data_dir, version):
+    """The merged data with the covariate store joined, cached per store version"""
+    df = read_merged_data(data_dir)
+    if version is None:
         return df
-    except Exception as e:
-        st.error(f"Error loading data: {str(e)}")
-        # Return empty DataFrame with required columns
-        return pd.DataFrame({
-            'Year': [],
-            'Month': [],
-            'YearMonth': [],
-            'Total_GMV': [],
-            'Product_Category': [],
-            'Marketing_Channel': [],
-            'Spend': [],
-            'NPS_Score': [],
-            'Stock_Level': [],
-            'Weather_Score': []
-        })
-
-@st.cache_data
-def load_optimized_spend():
-    df = pd.read_csv('attached_assets/final_optimized_spend.csv', header=0)
-    return df
+    # Ingested covariate sources refine or extend the pre-joined columns
+    return validate('merged_data', join_covariates(df, asset_path('covariates', data_dir)), data_dir)
 
-@st.cache_data
-def load_overall_revenue():
-    df = pd.read_csv('attached_assets/final_overall_revenue.csv', header=0)
+@as_of_loader
+def load_merged_data(data_dir=DATA_DIR):
+    """The merged data with the current covariates; a new ingest is picked up on the next call"""
+    return join_merged_covariates(data_dir, covariates_version(data_dir))
+
+@as_of_loader
+def covariate_columns(data_dir=DATA_DIR):
+    """Weather columns plus the columns of every ingested covariate source"""
+    columns = list(WEATHER_COLUMNS)
+    for manifest in list_sources(asset_path('covariates', data_dir)).values():
+        columns += [column for column in manifest['columns'] if column not in columns]
+    return columns
+
+@as_of_loader
+@shared_loader('optimized_spend')
+@governed_cache(max_entries=4)
+def load_optimized_spend(data_dir=DATA_DIR):
+    df = pd.read_csv(asset_path('final_optimized_spend.csv', data_dir), header=0)
+    df['Date'] = pd.date_range(PLAN_START_DATE, periods=len(df), freq='D')
+    return validate('optimized_spend', df, data_dir)
+
+def spend_plan_path(plan, data_dir=DATA_DIR):
+    """Path of a spend plan ('baseline' or 'optimized'), preferring a Parquet copy when one exists"""
+    parquet = asset_path(f'final_{plan}_spend.parquet', data_dir)
+    return parquet if os.path.exists(parquet) else asset_path(f'final_{plan}_spend.csv', data_dir)
+
+@as_of_loader
+@governed_cache(max_entries=64)
+def load_channel_allocation(plan='optimized', start=None, end=None, data_dir=DATA_DIR):
+    """Average channel allocation of a spend plan, streamed from disk without loading the plan"""
+    return compute_channel_allocation(spend_plan_path(plan, data_dir), start, end)
+
+@as_of_loader
+@shared_loader('overall_revenue')
+@governed_cache(max_entries=4)
+def load_overall_revenue(data_dir=DATA_DIR):
+    df = pd.read_csv(asset_path('final_overall_revenue.csv', data_dir), header=0)
     
     # Convert string representations of dictionaries to actual dictionaries
     df['revenue_dict'] = df['overall_revenue'].apply(lambda x: ast.literal_eval(re.sub(r'np\.float64\(([^)]+)\)', r'\1', x)))
@@ -55,25 +220,595 @@ def load_overall_revenue():
     df['improvement'] = df['revenue_dict'].apply(lambda x: x['improvement'])
     df['improvement_pct'] = df['revenue_dict'].apply(lambda x: x['improvement_pct'])
     
-    return df
+    return validate('overall_revenue', df, data_dir)
 
-@st.cache_data
-def load_product_revenue():
-    df = pd.read_csv('attached_assets/final_product_revenue.csv', header=0)
-    return df
+@as_of_loader
+@shared_loader('product_revenue')
+@governed_cache(max_entries=4)
+def load_product_revenue(data_dir=DATA_DIR):
+    df = pd.read_csv(asset_path('final_product_revenue.csv', data_dir), header=0)
+    return validate('product_revenue', df, data_dir)
 
-@st.cache_data
-def load_robyn_max_response():
-    df = pd.read_csv('attached_assets/1_190_4_max_response_reallocated.csv', header=0)
-    return df
+@as_of_loader
+@shared_loader('robyn_max_response')
+@governed_cache(max_entries=4)
+def load_robyn_max_response(data_dir=DATA_DIR):
+    df = pd.read_csv(asset_path('1_190_4_max_response_reallocated.csv', data_dir), header=0)
+    return validate('robyn_max_response', df, data_dir)
+
+@as_of_loader
+@shared_loader('robyn_target_efficiency')
+@governed_cache(max_entries=4)
+def load_robyn_target_efficiency(data_dir=DATA_DIR):
+    df = pd.read_csv(asset_path('1_190_4_target_efficiency_reallocated.csv', data_dir), header=0)
+    return validate('robyn_target_efficiency', df, data_dir)
+
+@as_of_loader
+@governed_cache(max_entries=4)
+def load_response_curves(data_dir=DATA_DIR):
+    """Hill response curves per Robyn channel fitted to both allocator scenarios"""
+    return fit_response_curves([load_robyn_max_response(data_dir), load_robyn_target_efficiency(data_dir)])
+
+@as_of_loader
+@governed_cache(max_entries=4)
+def load_experiment_results(data_dir=DATA_DIR):
+    """Analyzed geo-lift experiments, one row each; empty until an experiment is ingested"""
+    return read_results(asset_path('experiments', data_dir))
+
+@as_of_loader
+@governed_cache(max_entries=4)
+def load_calibrated_response_curves(data_dir=DATA_DIR):
+    """Robyn response curves scaled toward the incremental ROAS measured by the experiments"""
+    return calibrate_curves(load_response_curves(data_dir), load_experiment_results(data_dir))
+
+@as_of_loader
+@shared_loader('monthly_revenue')
+@governed_cache(max_entries=4)
+def load_monthly_revenue(data_dir=DATA_DIR):
+    df = pd.read_csv(asset_path('overall_revenue_monthly.csv', data_dir))
+    df['Date'] = pd.to_datetime(df['Unnamed: 0']).dt.to_period('M').dt.start_time
+    df['month'] = df['Date'].dt.strftime('%B')
+    return validate('monthly_revenue', df, data_dir)
+
+@as_of_loader
+@shared_loader('spend_plan_comparison')
+@governed_cache(max_entries=4)
+def load_spend_plan_comparison(data_dir=DATA_DIR):
+    df = pd.read_csv(asset_path('merged_file.csv', data_dir))
+    df['Date'] = pd.to_datetime(df['Unnamed: 0_baseline']).dt.to_period('M').dt.start_time
+    return validate('spend_plan_comparison', df, data_dir)
+
+@as_of_loader
+@shared_loader('robyn_budget_allocation')
+@governed_cache(max_entries=4)
+def load_robyn_budget_allocation(data_dir=DATA_DIR):
+    df = pd.read_csv(asset_path('Robyn_marketing_budget_allocation.csv', data_dir))
+    return validate('robyn_budget_allocation', df, data_dir)
+
+@as_of_loader
+@shared_loader('feature_importance')
+@governed_cache(max_entries=4)
+def load_feature_importance(data_dir=DATA_DIR):
+    df = pd.read_csv(asset_path('feature_importance_values.csv', data_dir), index_col=0)
+    return validate('feature_importance', df, data_dir)
+
+@as_of_loader
+@governed_cache(max_entries=4)
+def load_feature_attributions(data_dir=DATA_DIR):
+    """Channel importance per product and SHAP values per month, retrained when the merged data changes"""
+    return load_attributions(load_merged_data(data_dir), PRODUCT_CATEGORIES, MARKETING_CHANNELS)
+
+@as_of_loader
+def load_validation_report(data_dir=DATA_DIR):
+    """Validation report of every asset, as attached to the loaded (and possibly cached) frames"""
+    if SHARED_DATA_ROOT and data_dir == DATA_DIR:
+        # Shared-memory workers serve frames validated by the publisher
+        manifest = shared_status(SHARED_DATA_ROOT)
+        if manifest and 'validation' in manifest:
+            return validation_report(manifest['validation'])
+    frames = [loader(data_dir) for loader in [
+        load_merged_data, load_optimized_spend, load_overall_revenue, load_product_revenue,
+        load_robyn_max_response, load_robyn_target_efficiency, load_monthly_revenue,
+        load_spend_plan_comparison, load_robyn_budget_allocation, load_feature_importance
+    ]]
+    return validation_report([df.attrs['validation'] for df in frames if 'validation' in df.attrs])
+
+def available_granularities(dates):
+    """Granularities at or coarser than the native spacing of a sorted date series"""
+    spacing = dates.diff().median() if len(dates) > 1 else pd.Timedelta(days=1)
+    if pd.isna(spacing) or spacing < pd.Timedelta(days=7):
+        return list(GRANULARITIES)
+    if spacing < pd.Timedelta(days=28):
+        return ['Week', 'Month', 'Quarter']
+    if spacing < pd.Timedelta(days=90):
+        return ['Month', 'Quarter']
+    return ['Quarter']
+
+def format_period_labels(dates, granularity):
+    """Axis labels for period start dates at the given granularity"""
+    if granularity == 'Quarter':
+        return dates.dt.year.astype(str) + '-Q' + dates.dt.quarter.astype(str)
+    if granularity == 'Month':
+        return dates.dt.strftime('%Y-%m')
+    return dates.dt.strftime('%Y-%m-%d')
+
+def resample_periods(df, granularity, aggregations=None):
+    """Aggregate a frame with a sorted 'Date' column to the given granularity, labelling periods by their start"""
+    aggregations = aggregations or {}
+    numeric_cols = [col for col in df.select_dtypes('number').columns if col not in ('Year', 'Month')]
+    resampler = df.set_index('Date')[numeric_cols].resample(GRANULARITIES[granularity], label='left', closed='left')
+    resampled = resampler.agg({col: aggregations.get(col, 'sum') for col in numeric_cols})
+    # Drop empty bins so gaps in the history don't show up as zero periods
+    resampled = resampled[resampler.size() > 0].reset_index()
+    
+    resampled['Year'] = resampled['Date'].dt.year
+    resampled['Month'] = resampled['Date'].dt.month
+    resampled['YearMonth'] = format_period_labels(resampled['Date'], granularity)
+    return resampled
+
+@as_of_loader
+def load_period_data(granularity, data_dir=DATA_DIR):
+    """Merged data at the given granularity, resampled once per granularity and covariate store version"""
+    return resample_merged_data(granularity, data_dir, covariates_version(data_dir))
+
+@governed_cache(max_entries=16)
+def resample_merged_data(granularity, data_dir, version):
+    df = join_merged_covariates(data_dir, version)
+    if granularity == 'Month' and available_granularities(df['Date'])[0] == 'Month':
+        return df
+    
+    aggregations = {**MERGED_AGGREGATIONS, **resample_aggregations(list_sources(asset_path('covariates', data_dir)))}
+    resampled = resample_periods(df, granularity, aggregations)
+    if 'ROI' in resampled.columns:
+        resampled['ROI'] = resampled['Total_GMV'] / resampled['Total Investment']
+    return resampled
+
+@as_of_loader
+@governed_cache(max_entries=16)
+def load_revenue_periods(granularity, data_dir=DATA_DIR):
+    """Baseline vs optimized plan revenue at the given granularity"""
+    df = load_monthly_revenue(data_dir)
+    if granularity == 'Month':
+        return df
+    
+    resampled = resample_periods(df[['Date', 'baseline', 'optimized', 'improvement']], granularity)
+    resampled['improvement_pct'] = resampled['improvement'] / resampled['baseline'] * 100
+    resampled['month'] = resampled['YearMonth']
+    return resampled
+
+@governed_cache(max_entries=16)
+def snapshot_summary(data_dir):
+    """KPIs and average optimized channel allocation of one data directory"""
+    merged = load_merged_data(data_dir)
+    revenue = load_monthly_revenue(data_dir)
+    kpis = pd.Series({
+        'Total GMV': merged['Total_GMV'].sum(),
+        'Total Investment': merged['Total Investment'].sum(),
+        'ROI': merged['Total_GMV'].sum() / merged['Total Investment'].sum(),
+        'Average NPS': merged['NPS'].mean(),
+        'Average CLV': merged['CLV'].mean(),
+        'Average CAC': merged['CAC'].mean(),
+        'Revenue Improvement %': 100 * (revenue['optimized'].sum() / revenue['baseline'].sum() - 1)
+    })
+    return kpis, load_channel_allocation('optimized', data_dir=data_dir)
+
+def snapshot_label(manifest):
+    """Creation time (UTC) and note of a snapshot version"""
+    return f"{pd.Timestamp(manifest['created'], unit='s'):%Y-%m-%d %H:%M} {manifest['note']}".strip()
 
-@st.cache_data
-def load_robyn_target_efficiency():
-    df = pd.read_csv('attached_assets/1_190_4_target_efficiency_reallocated.csv', header=0)
+def compare_snapshots(version_a, version_b):
+    """(KPIs, channel allocations) of two snapshot versions side by side, with the change from A to B"""
+    tables = []
+    for a, b in zip(snapshot_summary(checkout(version_a)), snapshot_summary(checkout(version_b))):
+        table = pd.DataFrame({'A': a, 'B': b})
+        table['Change'] = table['B'] - table['A']
+        table['Change %'] = table['Change'] / table['A'].abs() * 100
+        tables.append(table)
+    return tuple(tables)
+
+def slice_periods(df, start=None, end=None):
+    """Rows of a Date-sorted frame whose period starts within [start, end], found by binary search"""
+    dates = df['Date'].values
+    lo = 0 if start is None else dates.searchsorted(np.datetime64(pd.Timestamp(start)), side='left')
+    hi = len(dates) if end is None else dates.searchsorted(np.datetime64(pd.Timestamp(end)), side='right')
+    return df.iloc[lo:hi]
+
+def _select_snapshot():
+    version = st.session_state['snapshot_version']
+    if version == 'Live':
+        st.session_state['as_of'] = None
+        st.query_params.pop('as_of', None)
+    else:
+        st.session_state['as_of'] = version
+        st.query_params['as_of'] = version
+
+def snapshot_controls():
+    """Render the data version selector in the sidebar; the choice is the session's ``?as_of=``.
+
+    Only lists the recorded versions: snapshots are taken by ``python snapshots.py commit``.
+    """
+    versions = {manifest['version']: manifest for manifest in reversed(list_versions())}
+    as_of = session_as_of()
+    selected = 'Live'
+    if as_of:
+        try:
+            selected = resolve(as_of)
+        except ValueError as e:
+            st.sidebar.warning(f"{e}; showing the live data.")
+    
+    st.sidebar.header("Data Version")
+    options = ['Live'] + list(versions)
+    st.sidebar.selectbox(
+        "Data as of", options, index=options.index(selected), key="snapshot_version", on_change=_select_snapshot,
+        format_func=lambda version: version if version == 'Live' else snapshot_label(versions[version])
+    )
+    if selected != 'Live':
+        st.sidebar.caption(f"Viewing snapshot {selected}.")
+
+def period_controls(dates):
+    """Render the global granularity and date range controls in the sidebar.
+    
+    The selection is kept in session state so it carries over between pages.
+    Returns (granularity, start, end) snapped to whole periods: start to the
+    start of its period and end to the last instant of its period.
+    """
+    snapshot_controls()
+    state = st.session_state
+    min_date, max_date = dates.min().date(), dates.max().date()
+    
+    st.sidebar.header("Time Range")
+    options = available_granularities(dates)
+    saved = state.get('period_granularity', 'Month')
+    granularity = st.sidebar.selectbox(
+        "Granularity", options,
+        index=options.index(saved) if saved in options else 0
+    )
+    state['period_granularity'] = granularity
+    
+    saved_range = state.get('period_range', (min_date, max_date))
+    saved_range = (max(saved_range[0], min_date), min(saved_range[1], max_date))
+    selected_range = st.sidebar.date_input(
+        "Date Range", value=saved_range,
+        min_value=min_date, max_value=max_date
+    )
+    # The widget returns a single date while a range is being picked
+    if len(selected_range) == 2:
+        state['period_range'] = tuple(selected_range)
+    start, end = state.get('period_range', saved_range)
+    
+    start = pd.Timestamp(start).to_period(PERIOD_FREQUENCIES[granularity]).start_time
+    # Monthly data is dated the 1st, so an unsnapped end would drop the rest of the last month for daily consumers
+    end = pd.Timestamp(end).to_period(PERIOD_FREQUENCIES[granularity]).end_time
+    state['period_selection'] = (granularity, start, end)
+    return state['period_selection']
+
+def select_periods(data_dir=DATA_DIR):
+    """Render the period controls and return the merged data at the chosen granularity and range"""
+    granularity, start, end = period_controls(load_merged_data(data_dir)['Date'])
+    df = slice_periods(load_period_data(granularity, data_dir), start, end)
+    
+    if df.empty:
+        st.warning("No data in the selected date range.")
+        st.stop()
     return df
 
-def create_monthly_gmv_chart(df, selected_categories=None):
-    """Create a monthly GMV line chart with optional product category filtering"""
+def forecast_controls():
+    """Render the forecast horizon control in the sidebar; 0 turns forecasts off"""
+    st.sidebar.header("Forecast")
+    horizon = st.sidebar.slider(
+        "Forecast horizon (periods)", 0, 6,
+        value=st.session_state.get('forecast_horizon', DEFAULT_FORECAST_HORIZON)
+    )
+    st.session_state['forecast_horizon'] = horizon
+    return horizon
+
+@st.cache_data(persist='disk', max_entries=64)
+def compute_forecasts(df, columns, horizon, granularity, excluded=()):
+    """Forecasts of period data columns, cached per data version (the content of the frame).
+
+    ``excluded`` holds (column, period labels) pairs of anomalous periods left out of the column's fit.
+    """
+    workers = min(os.cpu_count() or 1, -(-len(columns) // CHUNK_SIZE))
+    masks = {column: df['YearMonth'].isin(labels).to_numpy() for column, labels in excluded}
+    forecasts = forecast_frame(df, list(columns), horizon, granularity, workers, masks)
+    forecasts['YearMonth'] = format_period_labels(forecasts['Date'], granularity)
+    return forecasts
+
+def add_forecast_fan(fig, df, column, forecast):
+    """Overlay a forecast fan (80% and 95% intervals) for a column on a time series chart"""
+    forecast = forecast[forecast['Series'] == column] if forecast is not None else None
+    if forecast is None or forecast.empty:
+        return fig
+    
+    # Start the fan at the last actual point so it joins the line
+    x = [df['YearMonth'].iloc[-1]] + forecast['YearMonth'].tolist()
+    last = df[column].iloc[-1]
+    for level, opacity in [(95, 0.15), (80, 0.3)]:
+        fig.add_trace(go.Scatter(
+            x=x, y=[last] + forecast[f'Upper_{level}'].tolist(),
+            mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip', meta=FORECAST_META
+        ))
+        fig.add_trace(go.Scatter(
+            x=x, y=[last] + forecast[f'Lower_{level}'].tolist(),
+            mode='lines', line=dict(width=0), fill='tonexty',
+            fillcolor=f'rgba(33, 150, 243, {opacity})', name=f'{level}% interval', meta=FORECAST_META
+        ))
+    fig.add_trace(go.Scatter(
+        x=x, y=[last] + forecast['Forecast'].tolist(),
+        mode='lines+markers', name='Forecast',
+        line=dict(color=ACCENT_BLUE, dash='dash'), marker=dict(color=ACCENT_BLUE), meta=FORECAST_META
+    ))
+    return fig
+
+def anomaly_stream(name, data_dir=DATA_DIR):
+    """Date-sorted frame, metric columns and frequency of an anomaly stream"""
+    if name == 'merged_data':
+        return load_merged_data(data_dir), KPI_COLUMNS + PRODUCT_CATEGORIES + ['Total Investment'], 'MS'
+    
+    # Plan revenue predictions hold one row per day of the spend plans
+    revenue = pd.concat([
+        load_overall_revenue(data_dir)[['baseline', 'optimized']],
+        load_product_revenue(data_dir).filter(regex='_(baseline|optimized)$')
+    ], axis=1)
+    revenue['Date'] = pd.date_range(PLAN_START_DATE, periods=len(revenue), freq='D')
+    return revenue, [col for col in revenue.columns if col != 'Date'], 'D'
+
+def anomaly_stream_key(name, data_dir=DATA_DIR):
+    """Detector state and alerts are kept per data directory: the basename is for reading, the hash of
+    the resolved path keeps directories with the same name (e.g. two checkouts) apart"""
+    path = os.path.realpath(data_dir)
+    digest = hashlib.sha1(path.encode()).hexdigest()[:12]
+    return f"{os.path.basename(path)}-{digest}-{name}"
+
+def update_anomalies(name, data_dir=DATA_DIR):
+    """Score the rows of a stream the detector has not seen yet; returns the new alerts"""
+    df, columns, freq = anomaly_stream(name, data_dir)
+    return AnomalyStore().update(anomaly_stream_key(name, data_dir), df, columns, freq)
+
+@as_of_loader
+@governed_cache(max_entries=4, ttl=300)
+def load_alerts(data_dir=DATA_DIR):
+    """Alerts of every anomaly stream, after scoring any rows that arrived since the last check"""
+    store = AnomalyStore()
+    alerts = []
+    for name in ANOMALY_STREAMS:
+        update_anomalies(name, data_dir)
+        alerts.append(store.alerts(anomaly_stream_key(name, data_dir)).assign(stream=name))
+    return pd.concat(alerts, ignore_index=True)
+
+def anomaly_periods(alerts, series, granularity, stream='merged_data'):
+    """Periods (YearMonth labels) containing alerts of the given series, with a hover label each"""
+    alerts = alerts[(alerts['stream'] == stream) & alerts['series'].isin(series)]
+    labels = alerts['series'] + ': ' + alerts['kind'] + ' (z = ' + alerts['score'].round(1).astype(str) + ')'
+    periods = pd.DataFrame({'YearMonth': format_period_labels(alerts['date'], granularity), 'Label': labels})
+    return periods.groupby('YearMonth', as_index=False)['Label'].agg('<br>'.join)
+
+def spike_periods(alerts, series, granularity, stream='merged_data'):
+    """Period labels with spikes of the given series, as a tuple for cache keys"""
+    return tuple(anomaly_periods(alerts[alerts['kind'] == 'spike'], series, granularity, stream)['YearMonth'])
+
+def add_anomaly_markers(fig, df, column, anomalies):
+    """Circle the points of a time series chart that fall in anomalous periods"""
+    if anomalies is None or anomalies.empty:
+        return fig
+    
+    flagged = df[['YearMonth', column]].merge(anomalies, on='YearMonth')
+    if not flagged.empty:
+        fig.add_trace(go.Scatter(
+            x=flagged['YearMonth'], y=flagged[column], mode='markers', name='Anomaly',
+            marker=dict(color=ALERT_RED, size=16, symbol='circle-open', line=dict(width=3)),
+            text=flagged['Label'], hovertemplate='%{text}<extra></extra>'
+        ))
+    return fig
+
+@as_of_loader
+@st.cache_resource(ttl=300)
+def load_order_sketches(data_dir=DATA_DIR):
+    """Per-month order sketch bundles written by `python sketches.py ingest`"""
+    return read_store(asset_path('sketches', data_dir))
+
+@as_of_loader
+def compute_order_metrics(start, end, data_dir=DATA_DIR):
+    """Merge the order sketches of the months in [start, end]; None when no orders are sketched"""
+    partitions = pd.period_range(start, end, freq='M').strftime('%Y-%m')
+    return merge_partitions(load_order_sketches(data_dir), partitions)
+
+@as_of_loader
+@governed_cache(max_entries=4, ttl=300)
+def load_cohort_activity(data_dir=DATA_DIR):
+    """Cohort activity written by `python cohorts.py ingest`; empty when no orders are ingested"""
+    return read_activity(asset_path('cohorts', data_dir))
+
+def compute_cohort_summary(activity, merged_df, horizon=None):
+    """Per-cohort customers, CLV and CAC, with acquisition spend from the monthly merged data"""
+    spend = merged_df.set_index('Date')
+    return cohort_summary(activity, spend['Total Investment'], spend[MARKETING_CHANNELS], horizon)
+
+def apply_cohort_kpis(df, summary, granularity):
+    """Replace the static CLV and CAC columns of period data with cohort-based values"""
+    totals = summary[['Date', 'Customers', 'Spend']].assign(Value=summary['CLV'] * summary['Customers'])
+    periods = resample_periods(totals, granularity)
+    periods['CLV'] = periods['Value'] / periods['Customers']
+    periods['CAC'] = periods['Spend'] / periods['Customers']
+    return df.drop(columns=['CLV', 'CAC']).merge(periods[['Date', 'CLV', 'CAC']], on='Date', how='left')
+
+@as_of_loader
+@st.cache_resource(ttl=300)
+def load_hierarchy(name, data_dir=DATA_DIR):
+    """Hierarchy written by `python hierarchy.py ingest`; None when it has not been ingested.
+
+    The index is shared by all sessions, so nodes one user expanded are already loaded for the others.
+    """
+    return HierarchyIndex.from_store(asset_path(os.path.join('hierarchies', name), data_dir))
+
+def channel_hierarchy(df):
+    """One-level spend hierarchy of the marketing channels in a period frame"""
+    facts = pd.DataFrame({'Channel': MARKETING_CHANNELS, 'Spend': df[MARKETING_CHANNELS].sum().to_numpy()})
+    return HierarchyIndex.from_frame(facts, ['Channel'], ['Spend'])
+
+def category_hierarchy(df):
+    """One-level GMV hierarchy of the product categories in a period frame"""
+    facts = pd.DataFrame({'Category': PRODUCT_CATEGORIES, 'GMV': df[PRODUCT_CATEGORIES].sum().to_numpy()})
+    return HierarchyIndex.from_frame(facts, ['Category'], ['GMV'])
+
+def drilldown_controls(index, key):
+    """Render one selectbox per expanded level and return the selected node's path"""
+    path = ()
+    columns = st.columns(index.depth - 1) if index.depth > 1 else []
+    for depth, level in enumerate(index.levels[:-1]):
+        children = index.children(path)
+        expandable = children.index[children['Children'] > 0].tolist()
+        with columns[depth]:
+            choice = st.selectbox(level, ['All'] + expandable, key=f"{key}_{'/'.join(path)}")
+        if choice == 'All':
+            break
+        path = path + (choice,)
+    return path
+
+def compute_monthly_category_gmv(df):
+    """Monthly total GMV and GMV per product category"""
+    return df[['YearMonth', 'Total_GMV'] + PRODUCT_CATEGORIES].reset_index(drop=True)
+
+def compute_category_gmv(df, selected_month=None):
+    """Total GMV per product category, optionally for a single month"""
+    if selected_month:
+        df = df[df['YearMonth'] == selected_month]
+    return pd.DataFrame({
+        'Category': PRODUCT_CATEGORIES,
+        'GMV': [df[cat].sum() for cat in PRODUCT_CATEGORIES]
+    })
+
+def gmv_facts(df):
+    """Long GMV fact table of a period frame: one row per period and product category"""
+    return pd.DataFrame({
+        'YearMonth': np.repeat(df['YearMonth'].to_numpy(), len(PRODUCT_CATEGORIES)),
+        'Category': np.tile(PRODUCT_CATEGORIES, len(df)),
+        'GMV': df[PRODUCT_CATEGORIES].to_numpy(dtype=np.float64).ravel()
+    })
+
+@governed_cache(max_entries=16)
+def load_gmv_index(df):
+    """Bitmap index of a period frame's GMV facts by month and product category"""
+    return BitmapIndex(gmv_facts(df), ['YearMonth', 'Category'], ['GMV'])
+
+def chart_selection(key, valid):
+    """Distinct x values selected (click, box or lasso) on the chart with this key, limited to valid values"""
+    state = st.session_state.get(key)
+    points = state['selection']['points'] if state else []
+    valid = set(valid)
+    return list(dict.fromkeys(point['x'] for point in points if point.get('x') in valid))
+
+def cross_filter_frame(index, months=None, categories=None):
+    """Period frame of category GMV (and their total) for the selected months and categories"""
+    gmv = index.aggregate(['YearMonth', 'Category'], {'YearMonth': months or None, 'Category': categories or None})
+    frame = gmv['GMV'].unstack('Category').reindex(columns=PRODUCT_CATEGORIES)
+    frame['Total_GMV'] = frame.sum(axis=1)
+    return frame.fillna(0).rename_axis(columns=None).reset_index()
+
+def compute_channel_spend(df):
+    """Monthly investment per marketing channel"""
+    return df[['YearMonth', 'Total Investment'] + MARKETING_CHANNELS].reset_index(drop=True)
+
+def compute_kpi_series(df, kpi_columns=KPI_COLUMNS):
+    """Monthly series for the given KPI columns"""
+    return df[['YearMonth'] + list(kpi_columns)].reset_index(drop=True)
+
+def compute_channel_allocation(optimized_df, start=None, end=None, n_periods=12):
+    """Average Optym allocation per channel over a date range, or over the first periods of the plan.
+
+    ``optimized_df`` is a loaded plan or the path of a plan file; paths are
+    streamed out of core, so plans larger than memory work too.
+    """
+    if isinstance(optimized_df, (str, os.PathLike)):
+        n_rows = n_periods if start is None and end is None else None
+        allocation = scan_spend_plan(optimized_df, OPTYM_CHANNELS, start, end, n_rows, PLAN_START_DATE)['mean'].rename(None)
+        allocation.index = MARKETING_CHANNELS
+        return allocation
+    if start is None and end is None:
+        plan = optimized_df.iloc[:n_periods]
+    else:
+        plan = slice_periods(optimized_df, start, end)
+    allocation = plan[OPTYM_CHANNELS].mean()
+    allocation.index = MARKETING_CHANNELS
+    return allocation
+
+def backtest_plans(data_dir=DATA_DIR):
+    """Each model's recommendation as multipliers of the merged channel spend, with the lift the model predicts"""
+    baseline = compute_channel_allocation(spend_plan_path('baseline', data_dir), n_periods=None)
+    optimized = compute_channel_allocation(spend_plan_path('optimized', data_dir), n_periods=None)
+    optym = (optimized / baseline.where(baseline > 0)).fillna(1.0)
+    revenue = load_overall_revenue(data_dir)
+    
+    # Robyn reallocates a subset of the channels; the others keep their spend
+    robyn_df = load_robyn_max_response(data_dir)
+    robyn = pd.Series(1.0, index=MARKETING_CHANNELS)
+    robyn.update(pd.Series((robyn_df['optmSpendUnit'] / robyn_df['initSpendUnit']).to_numpy(),
+                           index=robyn_df['channels'].str.replace('_', ' ')))
+    return {
+        'Optym': (optym.to_numpy(), revenue['optimized'].sum() / revenue['baseline'].sum() - 1),
+        'Robyn MMM': (robyn.to_numpy(), robyn_df['optmResponseUnitTotalLift'].iloc[0])
+    }
+
+@as_of_loader
+@governed_cache(max_entries=4)
+def load_backtest(data_dir=DATA_DIR):
+    """Rolling-origin backtest folds and per-model summary of the Optym and Robyn recommendations"""
+    df = load_merged_data(data_dir)
+    # Months with anomalous GMV spikes are neither fitted nor scored
+    alerts = load_alerts(data_dir)
+    spikes = alerts[(alerts['stream'] == 'merged_data') & (alerts['series'] == 'Total_GMV') & (alerts['kind'] == 'spike')]
+    usable = ~df['Date'].isin(spikes['date'])
+    
+    folds = rolling_origin_backtest(df[MARKETING_CHANNELS], df['Total_GMV'], backtest_plans(data_dir), usable)
+    folds['Origin'] = df['YearMonth'].to_numpy()[folds['Origin'].to_numpy(dtype=int)]
+    folds['Month'] = df['YearMonth'].to_numpy()[folds['Month'].to_numpy(dtype=int)]
+    return folds, summarize(folds)
+
+@as_of_loader
+@governed_cache(max_entries=4)
+def load_flighting_inputs(data_dir=DATA_DIR):
+    """Channel response curves, actual (channels, months) spend and dates over the Optym plan horizon"""
+    df = load_merged_data(data_dir)
+    alerts = load_alerts(data_dir)
+    spikes = alerts[(alerts['stream'] == 'merged_data') & (alerts['series'] == 'Total_GMV') & (alerts['kind'] == 'spike')]
+    curves = fit_flighting_curves(df[MARKETING_CHANNELS], df['Total_GMV'], MARKETING_CHANNELS, ~df['Date'].isin(spikes['date']))
+    
+    # The plan starts where the Optym plans do; the months before it leave the carryover
+    dates = load_spend_plan_comparison(data_dir)['Date']
+    horizon = df['Date'].isin(dates)
+    history = df.loc[df['Date'] < dates.min(), MARKETING_CHANNELS].to_numpy(float)
+    curves['carry'] = adstock(history.T, curves['decay'].to_numpy())[:, -1] if len(history) else 0.0
+    return curves, df.loc[horizon, MARKETING_CHANNELS].to_numpy(float).T, pd.DatetimeIndex(df.loc[horizon, 'Date'])
+
+@as_of_loader
+@governed_cache(max_entries=32)
+def compute_flighting_plan(budget_share, low, up, pace_low, pace_up, data_dir=DATA_DIR):
+    """Phased plan over the Optym horizon vs the spend actually made.
+
+    The budget is a share of the actual spend over the horizon; channel
+    bounds are multipliers of each channel's mean monthly spend and pacing
+    limits multipliers of an even split of the budget across months.
+    """
+    curves, actual, dates = load_flighting_inputs(data_dir)
+    budget = budget_share * actual.sum()
+    monthly = actual.mean(axis=1)
+    result = solve_flighting(curves, budget, len(dates), low * monthly, up * monthly,
+                             pace_low * budget / len(dates), pace_up * budget / len(dates))
+    
+    plan = pd.DataFrame(result['spend'].T, columns=MARKETING_CHANNELS)
+    plan.insert(0, 'YearMonth', format_period_labels(pd.Series(dates), 'Month'))
+    plan['Actual Spend'] = actual.sum(axis=0)
+    plan['Planned Response'] = result['response'].sum(axis=0)
+    plan['Actual Response'] = plan_response(curves, actual).sum(axis=0)
+    return plan, {key: result[key] for key in ['total_spend', 'total_response', 'success', 'message', 'iterations', 'solve_seconds']}
+
+def compute_robyn_allocation(robyn_df):
+    """Initial vs optimized spend and response per channel for a Robyn allocator scenario"""
+    return robyn_df[['channels', 'initSpendUnit', 'optmSpendUnit', 'initResponseUnit', 
+                     'optmResponseUnit', 'constr_low', 'constr_up']].reset_index(drop=True)
+
+def create_monthly_gmv_chart(df, selected_categories=None, forecast=None, anomalies=None):
+    """Create a monthly GMV line chart with optional product category filtering, forecast fan and anomaly markers"""
     
     if selected_categories and len(selected_categories) > 0:
         filtered_df = df.copy()
@@ -91,11 +826,14 @@ def create_monthly_gmv_chart(df, selected_categories=None):
                      title='Monthly Total GMV for Selected Categories',
                      labels={'Selected_GMV': 'GMV', 'YearMonth': 'Month'},
                      markers=True)
+        gmv_column = 'Selected_GMV'
     else:
+        filtered_df = df
         fig = px.line(df, x='YearMonth', y='Total_GMV', 
                      title='Monthly Total GMV',
                      labels={'Total_GMV': 'GMV', 'YearMonth': 'Month'},
                      markers=True)
+        gmv_column = 'Total_GMV'
     
     fig.update_traces(line_color=SINGLE_BLUE, marker_color=SINGLE_BLUE)
     fig.update_layout(
@@ -105,24 +843,18 @@ def create_monthly_gmv_chart(df, selected_categories=None):
         hovermode='x unified'
     )
     
+    # The forecast is of the plotted series, whichever GMV column that is
+    if forecast is not None:
+        add_forecast_fan(fig, filtered_df, gmv_column, forecast.assign(Series=gmv_column))
+    add_anomaly_markers(fig, filtered_df, gmv_column, anomalies)
+    
     return fig
 
 def create_product_category_breakdown(df, selected_month=None):
     """Create a product category breakdown chart with optional month filtering"""
     
-    if selected_month:
-        filtered_df = df[df['YearMonth'] == selected_month]
-    else:
-        filtered_df = df.copy()
-    
-    # Get product categories and their GMV
-    product_categories = ['Camera', 'CameraAccessory', 'EntertainmentSmall', 'GameCDDVD', 'GamingHardware']
-    
     # Create a new dataframe for the visualization
-    breakdown_df = pd.DataFrame({
-        'Category': product_categories,
-        'GMV': [filtered_df[cat].sum() for cat in product_categories]
-    })
+    breakdown_df = compute_category_gmv(df, selected_month)
     
     # Sort by GMV
     breakdown_df = breakdown_df.sort_values('GMV', ascending=False)
@@ -140,24 +872,41 @@ def create_product_category_breakdown(df, selected_month=None):
     
     return fig
 
-def create_marketing_channel_chart(df):
-    """Create a chart showing marketing spend by channel over time"""
+def add_column_traces(fig, df, columns, palette=BLUE_PALETTE, **trace_args):
+    """Add one line trace per column, plotting the frame's columns directly instead of a melted copy"""
+    for i, column in enumerate(columns):
+        fig.add_trace(go.Scatter(
+            x=df['YearMonth'], y=df[column], name=column,
+            line=dict(color=palette[i % len(palette)]), **trace_args
+        ))
+    return fig
+
+def create_drilldown_chart(index, path, measure):
+    """Create a bar chart of a hierarchy node's children"""
     
-    channels = ['TV', 'Digital', 'Sponsorship', 'Content Marketing', 
-                'Online Marketing', 'Affiliates', 'SEM', 'Radio', 'Other']
+    children = index.children(path)[measure].sort_values(ascending=False)
+    level = index.levels[len(path)]
     
-    # Melt the dataframe to get a long format for plotting
-    melted_df = pd.melt(df, id_vars=['YearMonth'], 
-                        value_vars=channels,
-                        var_name='Channel', value_name='Investment')
+    fig = px.bar(x=children.index, y=children.to_numpy(),
+                title=f"{measure} by {level}" + (f" in {' > '.join(path)}" if path else ''),
+                color_discrete_sequence=BLUE_PALETTE)
     
-    fig = px.line(melted_df, x='YearMonth', y='Investment', color='Channel',
-                 title='Monthly Investment by Marketing Channel',
-                 labels={'Investment': 'Investment Amount', 'YearMonth': 'Month'},
-                 color_discrete_sequence=BLUE_PALETTE,
-                 markers=True)
+    fig.update_layout(
+        plot_bgcolor='white',
+        xaxis_title=level,
+        yaxis_title=measure,
+        hovermode='x unified'
+    )
+    
+    return fig
+
+def create_marketing_channel_chart(df):
+    """Create a chart showing marketing spend by channel over time"""
+    
+    fig = add_column_traces(go.Figure(), df, MARKETING_CHANNELS, mode='lines+markers')
     
     fig.update_layout(
+        title='Monthly Investment by Marketing Channel',
         plot_bgcolor='white',
         xaxis_title='Month',
         yaxis_title='Investment Amount',
@@ -221,10 +970,10 @@ def create_stock_gmv_chart(df):
     
     return fig
 
-def create_weather_correlation_chart(df):
-    """Create chart showing weather factors correlation with Total GMV"""
+def create_weather_correlation_chart(df, columns=WEATHER_COLUMNS):
+    """Create chart showing weather factors (and any other covariates) correlation with Total GMV"""
     
-    weather_cols = ['tavg', 'prcp', 'wspd', 'pres']
+    weather_cols = [col for col in columns if col in df.columns]
     
     # Calculate correlations between weather factors and GMV
     corr_dict = {}
@@ -237,21 +986,22 @@ def create_weather_correlation_chart(df):
         'Correlation with GMV': list(corr_dict.values())
     })
     
+    factor = 'Weather Factor' if set(weather_cols) <= set(WEATHER_COLUMNS) else 'External Factor'
     fig = px.bar(corr_df, x='Weather Factor', y='Correlation with GMV',
-                title='Correlation of Weather Factors with Total GMV',
+                title=f'Correlation of {factor}s with Total GMV',
                 color_discrete_sequence=[SINGLE_BLUE])
     
     fig.update_layout(
         plot_bgcolor='white',
-        xaxis_title='Weather Factor',
+        xaxis_title=factor,
         yaxis_title='Correlation Coefficient',
         hovermode='closest'
     )
     
     return fig
 
-def create_kpi_time_series(df, kpi_column, title, y_label):
-    """Create a time series chart for a given KPI"""
+def create_kpi_time_series(df, kpi_column, title, y_label, forecast=None, anomalies=None):
+    """Create a time series chart for a given KPI, with an optional forecast fan and anomaly markers"""
     
     fig = px.line(df, x='YearMonth', y=kpi_column, 
                  title=title,
@@ -266,6 +1016,9 @@ def create_kpi_time_series(df, kpi_column, title, y_label):
         hovermode='x unified'
     )
     
+    add_forecast_fan(fig, df, kpi_column, forecast)
+    add_anomaly_markers(fig, df, kpi_column, anomalies)
+    
     return fig
 
 def create_clv_cac_comparison(df):
@@ -313,6 +1066,73 @@ def create_clv_cac_comparison(df):
     
     return fig
 
+def create_retention_heatmap(retention):
+    """Create a cohort x months-since-acquisition retention heatmap"""
+    
+    fig = px.imshow(retention * 100,
+                    color_continuous_scale=px.colors.sequential.Blues,
+                    labels=dict(x='Months Since Acquisition', y='Cohort', color='Retention (%)'),
+                    text_auto='.0f',
+                    aspect='auto',
+                    title='Cohort Retention (%)')
+    
+    fig.update_layout(
+        plot_bgcolor='white',
+        height=450
+    )
+    
+    return fig
+
+def create_cohort_clv_chart(clv):
+    """Create cumulative CLV curves, one line per acquisition cohort"""
+    
+    fig = go.Figure()
+    
+    for i, (cohort, curve) in enumerate(clv.iterrows()):
+        fig.add_trace(go.Scatter(
+            x=curve.index,
+            y=curve.to_numpy(),
+            name=cohort,
+            mode='lines',
+            line=dict(color=BLUE_PALETTE[i % len(BLUE_PALETTE)], width=2)
+        ))
+    
+    fig.update_layout(
+        title='Cumulative CLV by Cohort',
+        xaxis_title='Months Since Acquisition',
+        yaxis_title='Cumulative Value per Customer',
+        plot_bgcolor='white',
+        hovermode='x unified'
+    )
+    
+    return fig
+
+def create_cohort_cac_chart(summary):
+    """Create a stacked bar chart of cohort CAC attributed to marketing channels"""
+    
+    fig = go.Figure()
+    
+    channel_columns = [col for col in summary.columns if col.startswith('CAC ')]
+    for i, col in enumerate(channel_columns):
+        fig.add_trace(go.Bar(
+            x=summary['Cohort'],
+            y=summary[col],
+            name=col[len('CAC '):],
+            marker_color=BLUE_PALETTE[i % len(BLUE_PALETTE)]
+        ))
+    
+    fig.update_layout(
+        title='CAC by Acquisition Cohort and Channel',
+        xaxis_title='Cohort',
+        yaxis_title='CAC',
+        barmode='stack',
+        plot_bgcolor='white',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        hovermode='x unified'
+    )
+    
+    return fig
+
 def create_performance_metrics_chart(df):
     """Create a chart showing delivery and procurement performance over time"""
     
@@ -389,54 +1209,29 @@ def create_nps_stock_chart(df):
     
     return fig
 
-def create_budget_comparison_chart(optimized_df, overall_revenue_df, robyn_df, title):
-    """Create a comparison chart for Optym and Robyn budget optimization models"""
-    
-    # Process Optym Model data (using the first few rows from optimized_df and overall_revenue_df)
-    # Column names in the CSV file have spaces in them, so we need to match exactly
-    optym_channels = ['TV', 'Digital', 'Sponsorship', 'Content Marketing', 
-                          'Online marketing', ' Affiliates', 'SEM', 'Radio', 'Other']
-    
-    # Take average of first 12 rows as representative data
-    optym_spend = optimized_df.iloc[:12][optym_channels].mean().values
-    
-    # Get baseline and optimized revenue
-    optym_baseline_revenue = overall_revenue_df['baseline'].iloc[0]
-    optym_optimized_revenue = overall_revenue_df['optimized'].iloc[0]
-    optym_improvement = overall_revenue_df['improvement_pct'].iloc[0]
-    
-    # Process Robyn Model data
-    # Extract Affiliates, Online Marketing and Sponsorship from the Robyn data
-    robyn_channels = ['Affiliates', 'Online_Marketing', 'Sponsorship']
-    
-    # Filter the robyn dataframe to include only necessary records
-    robyn_data = {}
-    for channel in robyn_channels:
-        channel_row = robyn_df[robyn_df['channels'] == channel].iloc[0] if len(robyn_df[robyn_df['channels'] == channel]) > 0 else None
-        if channel_row is not None:
-            robyn_data[channel] = {
-                'spend': channel_row['initSpendUnit'],
-                'response': channel_row['optmResponseUnit']
-            }
-    
-    # Create comparison dataframe
-    model_comparison = {
-        'Model': ['Optym', 'Robyn MMM'],
-        'Revenue Improvement (%)': [optym_improvement, 30]  # Using 30% as example for Robyn
-    }
-    
-    comparison_df = pd.DataFrame(model_comparison)
+def create_budget_comparison_chart(summary, title):
+    """Create a comparison chart of predicted and backtested revenue improvement for Optym and Robyn"""
     
     fig = go.Figure()
     
     fig.add_trace(go.Bar(
-        x=comparison_df['Model'],
-        y=comparison_df['Revenue Improvement (%)'],
-        marker_color=[BLUE_PALETTE[0], BLUE_PALETTE[2]]
+        x=summary['Model'],
+        y=summary['Predicted Lift'],
+        name='Predicted by model',
+        marker_color=BLUE_PALETTE[6]
+    ))
+    
+    fig.add_trace(go.Bar(
+        x=summary['Model'],
+        y=summary['Realized Lift'],
+        name='Realized in backtest',
+        marker_color=BLUE_PALETTE[0],
+        error_y=dict(type='data', array=summary['Realized Std'], color=HIGHLIGHT_BLUE)
     ))
     
     fig.update_layout(
         title=title,
+        barmode='group',
         plot_bgcolor='white',
         xaxis_title='Model',
         yaxis_title='Revenue Improvement (%)',
@@ -445,15 +1240,44 @@ def create_budget_comparison_chart(optimized_df, overall_revenue_df, robyn_df, t
     
     return fig
 
-def create_optym_channel_allocation(optimized_df):
-    """Create a chart showing channel allocation in the Sarvottam model"""
+def create_flighting_chart(plan):
+    """Create a stacked bar chart of the phased plan's spend per month and channel against the actual spend"""
+    
+    fig = go.Figure()
+    
+    for i, channel in enumerate(MARKETING_CHANNELS):
+        fig.add_trace(go.Bar(
+            x=plan['YearMonth'],
+            y=plan[channel],
+            name=channel,
+            marker_color=BLUE_PALETTE[i % len(BLUE_PALETTE)]
+        ))
     
-    # Get channel names and average allocation - match exact column names from CSV
-    channels = ['TV', 'Digital', 'Sponsorship', 'Content Marketing', 
-                'Online marketing', ' Affiliates', 'SEM', 'Radio', 'Other']
+    fig.add_trace(go.Scatter(
+        x=plan['YearMonth'],
+        y=plan['Actual Spend'],
+        name='Actual Spend',
+        mode='lines+markers',
+        line=dict(color=ACCENT_BLUE, dash='dash')
+    ))
+    
+    fig.update_layout(
+        title='Phased Plan: Spend per Month and Channel',
+        barmode='stack',
+        plot_bgcolor='white',
+        xaxis_title='Month',
+        yaxis_title='Spend',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        hovermode='x unified'
+    )
+    
+    return fig
+
+def create_optym_channel_allocation(optimized_df, start=None, end=None):
+    """Create a chart showing channel allocation in the Sarvottam model"""
     
-    # Calculate average allocation for first 12 months
-    allocation = optimized_df.iloc[:12][channels].mean().reset_index()
+    # Calculate average allocation over the selected range (first 12 rows by default)
+    allocation = compute_channel_allocation(optimized_df, start, end).reset_index()
     allocation.columns = ['Channel', 'Allocation']
     
     # Sort by allocation
@@ -505,3 +1329,561 @@ def create_robyn_channel_allocation(robyn_df):
     )
     
     return fig
+
+def create_category_area_chart(df, categories=PRODUCT_CATEGORIES):
+    """Create a stacked area chart of monthly GMV by product category"""
+    
+    fig = add_column_traces(go.Figure(), df, categories, mode='lines', stackgroup='GMV')
+    
+    fig.update_layout(
+        title='Monthly GMV by Product Category',
+        plot_bgcolor='white',
+        xaxis_title='Month',
+        yaxis_title='GMV',
+        hovermode='x unified',
+        legend_title='Product Category'
+    )
+    
+    return fig
+
+def compute_holiday_impact(df):
+    """Compute average GMV for holiday and non-holiday periods"""
+    
+    # Group by 'Has Holiday' and calculate mean GMV
+    holiday_impact = df.groupby('Has Holiday')['Total_GMV'].mean().reset_index()
+    holiday_impact['Has Holiday'] = holiday_impact['Has Holiday'].map({0: 'No Holiday', 1: 'Holiday'})
+    
+    return holiday_impact
+
+@governed_cache(max_entries=32)
+def compute_event_impact(df, series, excluded_periods=()):
+    """Holiday and sale uplift per series, leaving out the given periods (YearMonth labels)"""
+    return event_lift(df[~df['YearMonth'].isin(excluded_periods)], list(series))
+
+def create_event_lift_chart(impact):
+    """Create a grouped bar chart of event-day uplift per series with 95% error bars"""
+    
+    fig = px.bar(
+        impact.assign(Interval=impact['Lift Error'] * 1.96),
+        x='Series',
+        y='Lift',
+        color='Event',
+        barmode='group',
+        error_y='Interval',
+        title='GMV Uplift of an Event Day over a Regular Day',
+        color_discrete_sequence=[BLUE_PALETTE[0], BLUE_PALETTE[4]],
+        hover_data={'Regression Lift': ':.1f', 'Pairs': True, 'Interval': False}
+    )
+    
+    fig.update_layout(
+        plot_bgcolor='white',
+        xaxis_title='',
+        yaxis_title='Uplift (%)',
+        hovermode='closest'
+    )
+    
+    return fig
+
+def create_holiday_impact_chart(holiday_impact):
+    """Create a bar chart comparing average GMV in holiday and non-holiday periods"""
+    
+    fig = px.bar(
+        holiday_impact, 
+        x='Has Holiday', 
+        y='Total_GMV',
+        color='Has Holiday',
+        title='Average GMV: Holiday vs. Non-Holiday Periods',
+        color_discrete_sequence=[BLUE_PALETTE[0], BLUE_PALETTE[2]]
+    )
+    
+    fig.update_layout(
+        plot_bgcolor='white',
+        xaxis_title='',
+        yaxis_title='Average GMV',
+        hovermode='closest',
+        showlegend=False
+    )
+    
+    return fig
+
+def create_category_trend_chart(df):
+    """Create a line chart of monthly GMV by product category"""
+    
+    fig = add_column_traces(go.Figure(), df, PRODUCT_CATEGORIES, mode='lines+markers')
+    
+    fig.update_layout(
+        title='Monthly GMV by Product Category',
+        plot_bgcolor='white',
+        xaxis_title='Month',
+        yaxis_title='GMV',
+        hovermode='x unified',
+        legend_title='Product Category'
+    )
+    
+    return fig
+
+def create_procurement_gmv_chart(df):
+    """Create a chart comparing normalized procurement performance with normalized GMV"""
+    
+    # Calculate normalized procurement performance
+    procurement_normalized = df['Procurement_Performance'] / df['Procurement_Performance'].max()
+    gmv_normalized = df['Total_GMV'] / df['Total_GMV'].max()
+    
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatter(
+        x=df['YearMonth'],
+        y=procurement_normalized,
+        name='Normalized Procurement Performance',
+        mode='lines+markers',
+        line=dict(color=BLUE_PALETTE[0], width=2),
+        marker=dict(color=BLUE_PALETTE[0], size=8)
+    ))
+    
+    fig.add_trace(go.Scatter(
+        x=df['YearMonth'],
+        y=gmv_normalized,
+        name='Normalized GMV',
+        mode='lines+markers',
+        line=dict(color=BLUE_PALETTE[2], width=2),
+        marker=dict(color=BLUE_PALETTE[2], size=8)
+    ))
+    
+    fig.update_layout(
+        title='Normalized Procurement Performance vs GMV',
+        plot_bgcolor='white',
+        xaxis_title='Month',
+        yaxis_title='Normalized Value (0-1)',
+        hovermode='x unified',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+    )
+    
+    return fig
+
+def create_monthly_revenue_chart(revenue_data):
+    """Create a grouped bar chart of baseline vs optimized revenue for every month"""
+    
+    fig = go.Figure()
+    
+    # Add baseline bars
+    fig.add_trace(go.Bar(
+        x=revenue_data['month'],
+        y=revenue_data['baseline'],
+        name='Baseline',
+        marker_color=BUDGET_PALETTE[0],
+        text=revenue_data['baseline'].round(1),
+        textposition='auto'
+    ))
+    
+    # Add optimized bars
+    fig.add_trace(go.Bar(
+        x=revenue_data['month'],
+        y=revenue_data['optimized'],
+        name='Optimized',
+        marker_color=BUDGET_PALETTE[1],
+        text=revenue_data['optimized'].round(1),
+        textposition='auto'
+    ))
+    
+    # Add percentage labels
+    for i, row in revenue_data.iterrows():
+        improvement_pct = (row['optimized'] - row['baseline']) / row['baseline'] * 100
+        
+        # Create a percentage label with a box around it
+        fig.add_annotation(
+            x=row['month'],
+            y=row['optimized'] + 30,  # Position above the optimized bar
+            text=f"{improvement_pct:.1f}%",
+            showarrow=False,
+            font=dict(size=12, color="black"),
+            bgcolor="white",
+            bordercolor="#2196f3",
+            borderwidth=2,
+            borderpad=4,
+            opacity=0.8
+        )
+    
+    fig.update_layout(
+        barmode='group',
+        plot_bgcolor='white',
+        font=dict(family="Arial", size=12),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ),
+        margin=dict(l=50, r=50, t=80, b=50),
+        yaxis=dict(
+            title="Revenue",
+            gridcolor='lightgrey',
+            zerolinecolor='lightgrey'
+        ),
+        xaxis=dict(
+            title="Month",
+            tickfont=dict(size=14)
+        ),
+        height=500
+    )
+    
+    return fig
+
+def create_month_revenue_chart(revenue_data, month):
+    """Create a small baseline vs optimized revenue chart for a single month"""
+    
+    monthly_data = revenue_data[revenue_data['month'] == month].iloc[0]
+    
+    fig = go.Figure()
+    
+    # Add baseline bar
+    fig.add_trace(go.Bar(
+        x=['Baseline'],
+        y=[monthly_data['baseline']],
+        marker_color=BUDGET_PALETTE[0],
+        width=0.4,
+        text=[round(monthly_data['baseline'], 1)],
+        textposition='auto'
+    ))
+    
+    # Add optimized bar
+    fig.add_trace(go.Bar(
+        x=['Optimized'],
+        y=[monthly_data['optimized']],
+        marker_color=BUDGET_PALETTE[1],
+        width=0.4,
+        text=[round(monthly_data['optimized'], 1)],
+        textposition='auto'
+    ))
+    
+    # Calculate improvement percentage
+    improvement_pct = (monthly_data['optimized'] - monthly_data['baseline']) / monthly_data['baseline'] * 100
+    
+    # Add percentage label
+    fig.add_annotation(
+        x=0.5,
+        y=monthly_data['optimized'] + (monthly_data['optimized'] * 0.1),
+        text=f"{improvement_pct:.1f}%",
+        showarrow=False,
+        font=dict(size=12, color="black"),
+        bgcolor="white",
+        bordercolor="#2196f3",
+        borderwidth=2,
+        borderpad=4,
+        opacity=0.8
+    )
+    
+    fig.update_layout(
+        title=month,
+        plot_bgcolor='white',
+        showlegend=False,
+        margin=dict(l=10, r=10, t=40, b=10),
+        height=250,
+        yaxis=dict(
+            gridcolor='lightgrey',
+            zerolinecolor='lightgrey'
+        )
+    )
+    
+    return fig
+
+def create_month_revenue_grid(revenue_data, columns=6):
+    """Create one figure of small baseline vs optimized revenue charts, one subplot per period"""
+    
+    months = revenue_data['month'].tolist()
+    n_rows = -(-len(months) // columns)
+    n_cols = min(len(months), columns)
+    fig = make_subplots(rows=n_rows, cols=n_cols, subplot_titles=months, 
+                        horizontal_spacing=0.04, vertical_spacing=0.25 / n_rows)
+    
+    for i, (_, monthly_data) in enumerate(revenue_data.iterrows()):
+        row, col = i // n_cols + 1, i % n_cols + 1
+        
+        for label, column, color in [('Baseline', 'baseline', BUDGET_PALETTE[0]), 
+                                     ('Optimized', 'optimized', BUDGET_PALETTE[1])]:
+            fig.add_trace(go.Bar(
+                x=[label],
+                y=[monthly_data[column]],
+                marker_color=color,
+                width=0.4,
+                text=[round(monthly_data[column], 1)],
+                textposition='auto',
+                name=label
+            ), row=row, col=col)
+        
+        # Improvement percentage above the bars of each period
+        improvement_pct = (monthly_data['optimized'] - monthly_data['baseline']) / monthly_data['baseline'] * 100
+        fig.add_annotation(
+            x=0.5,
+            y=monthly_data['optimized'] * 1.1,
+            text=f"{improvement_pct:.1f}%",
+            showarrow=False,
+            font=dict(size=12, color="black"),
+            bgcolor="white",
+            bordercolor="#2196f3",
+            borderwidth=2,
+            borderpad=4,
+            opacity=0.8,
+            row=row, col=col
+        )
+    
+    fig.update_layout(
+        plot_bgcolor='white',
+        showlegend=False,
+        margin=dict(l=10, r=10, t=40, b=10),
+        height=250 * n_rows
+    )
+    fig.update_yaxes(gridcolor='lightgrey', zerolinecolor='lightgrey')
+    
+    return fig
+
+def create_spend_plan_comparison_chart(df):
+    """Create a grouped bar chart of baseline vs optimized budget per channel for the latest plan date"""
+    
+    # Get the latest date's data
+    latest_date = df['Unnamed: 0_baseline'].iloc[0]
+    baseline_data = df[df['Unnamed: 0_baseline'] == latest_date].iloc[0]
+    optimized_data = df[df['Unnamed: 0_optimized'] == latest_date].iloc[0]
+    
+    # Create channel names list (excluding Total and Unnamed columns)
+    channels = [col.replace('_baseline', '') for col in df.columns if col.endswith('_baseline') 
+               and not col.startswith('Unnamed') and not col.startswith('Total')]
+    
+    fig = go.Figure()
+    
+    # Add baseline bars
+    fig.add_trace(go.Bar(
+        name='Baseline',
+        x=channels,
+        y=[baseline_data[f'{channel}_baseline'] for channel in channels],
+        marker_color='#2073BC',
+        opacity=0.8
+    ))
+    
+    # Add optimized bars
+    fig.add_trace(go.Bar(
+        name='Optimized',
+        x=channels,
+        y=[optimized_data[f'{channel}_optimized'] for channel in channels],
+        marker_color='#2196f3',
+        opacity=0.8
+    ))
+    
+    fig.update_layout(
+        barmode='group',
+        height=500,
+        margin=dict(l=50, r=50, t=50, b=50),
+        showlegend=True,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ),
+        xaxis_title="Marketing Channels",
+        yaxis_title="Budget Allocation ($)",
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(
+            size=12,
+            color='#333333'
+        )
+    )
+    
+    fig.update_xaxes(
+        showgrid=False,
+        gridwidth=1,
+        gridcolor='LightGrey'
+    )
+    
+    fig.update_yaxes(
+        showgrid=True,
+        gridwidth=1,
+        gridcolor='LightGrey'
+    )
+    
+    return fig
+
+def create_robyn_budget_comparison_chart(robyn_budget_data):
+    """Create a clustered bar chart of original vs new budget per Robyn channel"""
+    
+    fig = go.Figure()
+    
+    # Add bars for original budget
+    fig.add_trace(go.Bar(
+        x=robyn_budget_data['Channel'],
+        y=robyn_budget_data['Original_Budget'],
+        name='Original Budget',
+        marker_color=BUDGET_PALETTE[0],
+        text=robyn_budget_data['Original_Budget'],
+        textposition='outside'
+    ))
+    
+    # Add bars for new budget
+    fig.add_trace(go.Bar(
+        x=robyn_budget_data['Channel'],
+        y=robyn_budget_data['New_Budget'],
+        name='New Budget',
+        marker_color=BUDGET_PALETTE[1],
+        text=robyn_budget_data['New_Budget'],
+        textposition='outside'
+    ))
+    
+    fig.update_layout(
+        title='Robyn Model: Channel Budget Comparison',
+        xaxis_title='Marketing Channel',
+        yaxis_title='Budget (Million $)',
+        barmode='group',
+        plot_bgcolor='white',
+        font=dict(color='#424242'),
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        margin=dict(l=10, r=10, t=30, b=10),
+        hovermode='x unified',
+        bargap=0.2,
+        bargroupgap=0.1
+    )
+    
+    return fig
+
+def create_experiment_lift_chart(results):
+    """Create a bar chart of each experiment's incremental response with its 95% placebo interval"""
+    
+    fig = go.Figure()
+    
+    for i, (channel, tests) in enumerate(results.groupby('channel', sort=False)):
+        fig.add_trace(go.Bar(
+            x=tests['experiment'],
+            y=tests['lift'],
+            name=channel.replace('_', ' '),
+            marker_color=BLUE_PALETTE[(2 * i) % len(BLUE_PALETTE)],
+            error_y=dict(
+                type='data', symmetric=False,
+                array=tests['lift_high'] - tests['lift'],
+                arrayminus=tests['lift'] - tests['lift_low']
+            ),
+            customdata=tests[['p_value', 'iroas']],
+            hovertemplate='%{x}<br>Lift: %{y:,.0f}<br>p-value: %{customdata[0]:.3f}<br>'
+                          'Incremental ROAS: %{customdata[1]:,.0f}<extra></extra>'
+        ))
+    
+    fig.update_layout(
+        title='Incremental Response per Experiment',
+        xaxis_title='Experiment',
+        yaxis_title='Incremental Response',
+        plot_bgcolor='white',
+        font=dict(color='#424242'),
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        margin=dict(l=10, r=10, t=30, b=10)
+    )
+    
+    return fig
+
+def create_snapshot_allocation_chart(allocation, label_a, label_b):
+    """Create a clustered bar chart of the average optimized channel allocation in two snapshots"""
+    
+    fig = go.Figure()
+    
+    for column, label, color in [('A', label_a, BUDGET_PALETTE[0]), ('B', label_b, BUDGET_PALETTE[1])]:
+        fig.add_trace(go.Bar(
+            x=allocation.index,
+            y=allocation[column],
+            name=label,
+            marker_color=color
+        ))
+    
+    fig.update_layout(
+        title='Average Optimized Channel Allocation by Snapshot',
+        xaxis_title='Marketing Channel',
+        yaxis_title='Average Daily Spend',
+        barmode='group',
+        plot_bgcolor='white',
+        font=dict(color='#424242'),
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        margin=dict(l=10, r=10, t=30, b=10),
+        hovermode='x unified'
+    )
+    
+    return fig
+
+def create_allocation_result_chart(curves, result):
+    """Create a clustered bar chart of initial vs allocated spend per Robyn channel"""
+    
+    fig = go.Figure()
+    
+    fig.add_trace(go.Bar(
+        x=curves.index,
+        y=curves['init_spend'],
+        name='Initial Spend',
+        marker_color=BUDGET_PALETTE[0],
+        text=curves['init_spend'].round(2),
+        textposition='outside'
+    ))
+    
+    fig.add_trace(go.Bar(
+        x=result['channels'],
+        y=result['spend'],
+        name='Allocated Spend',
+        marker_color=BUDGET_PALETTE[2],
+        text=np.round(result['spend'], 2),
+        textposition='outside'
+    ))
+    
+    fig.update_layout(
+        title='Allocator: Spend per Channel',
+        xaxis_title='Marketing Channel',
+        yaxis_title='Spend per Period',
+        barmode='group',
+        plot_bgcolor='white',
+        font=dict(color='#424242'),
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        margin=dict(l=10, r=10, t=30, b=10),
+        hovermode='x unified'
+    )
+    
+    return fig
+
+def create_feature_importance_chart(feature_data, selected_product="All Products", month=None):
+    """Create a bar chart of channel feature importance for one product or the average of all products.
+
+    With a month, ``feature_data`` holds that month's SHAP values instead, and
+    "All Products" shows their total across products.
+    """
+    
+    if selected_product == "All Products":
+        # Calculate average across all products (SHAP contributions add up instead)
+        feature_importance_data = (feature_data.sum() if month else feature_data.mean()).reset_index()
+        title = 'Average Feature Importance Across All Products'
+    else:
+        # Get data for selected product
+        feature_importance_data = feature_data.loc[selected_product].reset_index()
+        title = f'Feature Importance for {selected_product}'
+    feature_importance_data.columns = ['Channel', 'Importance']
+    if month:
+        title = f'Channel Contribution to GMV (SHAP) for {selected_product}, {month}'
+    
+    fig = px.bar(
+        feature_importance_data, 
+        x='Channel', 
+        y='Importance',
+        title=title,
+        color='Importance',
+        color_continuous_scale=px.colors.sequential.Blues,
+        text='Importance'
+    )
+    
+    fig.update_traces(
+        texttemplate='%{text:.3s}' if month else '%{text:.3f}',
+        textposition='outside'
+    )
+    
+    fig.update_layout(
+        plot_bgcolor='white',
+        font=dict(color='#424242'),
+        xaxis_title='Marketing Channel',
+        yaxis_title='SHAP Value (GMV)' if month else 'Feature Importance',
+        margin=dict(l=10, r=10, t=50, b=10),
+        coloraxis_showscale=False
+    )
+    
+    return fig
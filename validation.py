@@ -0,0 +1,246 @@
+"""Schema contracts for the data assets, checked once at ingest.
+
+Each loader passes its frame through ``validate`` before caching it. A
+contract lists the expected columns with their type, bounds and nullability,
+optional cross-column rules and the date column that must strictly increase.
+All checks are whole-column NumPy operations.
+
+Structural problems (missing columns, wrong types) raise ``SchemaError`` so
+a broken asset fails loudly at load time instead of rendering empty charts.
+Row-level violations (nulls, out-of-range values, out-of-order dates)
+quarantine the affected partitions: they are dropped from the frame, written
+to the quarantine directory and listed in the validation report. Frames that
+reach the pages therefore satisfy their contract and need no further checks.
+
+The validation report is attached to the frame it describes
+(``df.attrs['validation']``), so it is cached with the data and a loader
+served from cache still returns its report.
+"""
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+QUARANTINE_DIR = os.environ.get(
+    'DASHBOARD_QUARANTINE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'quarantine')
+)
+
+SPEND = {'type': 'number', 'min': 0}
+AMOUNT = {'type': 'number', 'min': 0}
+SHARE = {'type': 'number', 'min': 0, 'max': 100}
+
+MERGED_SPEND_COLUMNS = ['Total Investment', 'TV', 'Digital', 'Sponsorship', 'Content Marketing',
+                        'Online Marketing', 'Affiliates', 'SEM', 'Radio', 'Other']
+PLAN_SPEND_COLUMNS = ['TV', 'Digital', 'Sponsorship', 'Content Marketing', 'Online marketing',
+                      ' Affiliates', 'SEM', 'Radio', 'Other']
+
+# Asset name (as registered with shared_loader) -> contract
+CONTRACTS = {
+    'merged_data': {
+        'columns': {
+            'Year': {'type': 'integer', 'min': 2000, 'max': 2100},
+            'Month': {'type': 'integer', 'min': 1, 'max': 12},
+            'Total_GMV': AMOUNT,
+            'Has Holiday': {'type': 'number', 'min': 0, 'max': 1},
+            'Holiday Percentage': SHARE,
+            'Sales Days': {'type': 'number', 'min': 0, 'max': 31},
+            'Sales Percentage': SHARE,
+            'NPS': {'type': 'number', 'min': -100, 'max': 100},
+            'Stock Index': {'type': 'number', 'min': 0},
+            'tavg': {'type': 'number'},
+            'prcp': {'type': 'number', 'min': 0},
+            'wspd': {'type': 'number', 'min': 0},
+            'pres': {'type': 'number', 'min': 0},
+            'CLV': {'type': 'number', 'min': 0},
+            'CAC': {'type': 'number', 'min': 0},
+            'Delivery_Performance': {'type': 'number'},
+            'Procurement_Performance': {'type': 'number'},
+            'Profit': {'type': 'number'},
+            'ROI': {'type': 'number'},
+            **{column: SPEND for column in MERGED_SPEND_COLUMNS},
+            **{category: AMOUNT for category in ['Camera', 'CameraAccessory', 'EntertainmentSmall',
+                                                 'GameCDDVD', 'GamingHardware']}
+        },
+        'date': 'Date',
+        'partition': 'YearMonth'
+    },
+    'optimized_spend': {
+        'columns': {column: SPEND for column in PLAN_SPEND_COLUMNS},
+        'date': 'Date',
+        'partition': 'Date'
+    },
+    # Daily revenue is a model prediction and can dip below zero on individual days
+    'overall_revenue': {
+        'columns': {'baseline': {'type': 'number'}, 'optimized': {'type': 'number'},
+                    'improvement': {'type': 'number'}, 'improvement_pct': {'type': 'number'}}
+    },
+    'product_revenue': {
+        'patterns': {r'_(baseline|optimized|improvement|improvement_pct)$': {'type': 'number'}}
+    },
+    'robyn_max_response': {
+        'columns': {
+            'solID': {'type': 'string'},
+            'channels': {'type': 'string'},
+            'initSpendUnit': SPEND, 'optmSpendUnit': SPEND,
+            'initResponseUnit': AMOUNT, 'optmResponseUnit': AMOUNT,
+            'initResponseMargUnit': AMOUNT,
+            'constr_low': {'type': 'number', 'min': 0}, 'constr_up': {'type': 'number', 'min': 0}
+        },
+        'rules': {'constr_low <= constr_up': lambda df: df['constr_low'].to_numpy() <= df['constr_up'].to_numpy()}
+    },
+    'monthly_revenue': {
+        'columns': {'baseline': AMOUNT, 'optimized': AMOUNT, 'improvement': {'type': 'number'},
+                    'improvement_pct': {'type': 'number'}},
+        'date': 'Date',
+        'partition': 'Date'
+    },
+    'spend_plan_comparison': {
+        'patterns': {r'^(?!Unnamed).*_(baseline|optimized)$': SPEND},
+        'date': 'Date',
+        'partition': 'Date'
+    },
+    'robyn_budget_allocation': {
+        'columns': {'Channel': {'type': 'string'}, 'Original_Budget': SPEND, 'New_Budget': SPEND,
+                    'Budget_Shift': {'type': 'number'}, 'Revenue_Lift': {'type': 'number'}}
+    },
+    'feature_importance': {
+        'patterns': {r'.': {'type': 'number', 'min': 0}}
+    }
+}
+CONTRACTS['robyn_target_efficiency'] = CONTRACTS['robyn_max_response']
+
+class SchemaError(ValueError):
+    """An asset does not have the structure its contract requires"""
+
+TYPE_CHECKS = {
+    'number': pd.api.types.is_numeric_dtype,
+    'integer': pd.api.types.is_integer_dtype,
+    'string': lambda dtype: pd.api.types.is_string_dtype(dtype) or pd.api.types.is_object_dtype(dtype)
+}
+
+def contract_columns(contract, df):
+    """Column specs of a contract resolved against a frame's columns"""
+    columns = dict(contract.get('columns', {}))
+    for pattern, spec in contract.get('patterns', {}).items():
+        matched = [column for column in df.columns if re.search(pattern, str(column))
+                   and column not in columns and column != contract.get('date')]
+        if not matched:
+            raise SchemaError(f"no column matches {pattern!r}")
+        columns.update({column: spec for column in matched})
+    return columns
+
+def row_violations(contract, df, columns):
+    """(check, column, failing row mask) for every row-level check that fails somewhere"""
+    violations = []
+    for column, spec in columns.items():
+        values = df[column]
+        null = values.isna().to_numpy()
+        if not spec.get('nullable', False) and null.any():
+            violations.append(('non-null', column, null))
+        if spec['type'] in ('number', 'integer'):
+            array = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            if 'min' in spec:
+                below = array < spec['min']
+                if below.any():
+                    violations.append((f">= {spec['min']}", column, below))
+            if 'max' in spec:
+                above = array > spec['max']
+                if above.any():
+                    violations.append((f"<= {spec['max']}", column, above))
+
+    for name, rule in contract.get('rules', {}).items():
+        broken = ~np.asarray(rule(df), dtype=bool)
+        if broken.any():
+            violations.append((name, None, broken))
+
+    date = contract.get('date')
+    if date and len(df):
+        dates = df[date].to_numpy(dtype='datetime64[ns]')
+        # Each date must be later than every date before it (no duplicates, no reordering)
+        previous = np.maximum.accumulate(dates)[:-1]
+        out_of_order = np.concatenate([[False], dates[1:] <= previous])
+        out_of_order |= np.isnat(dates)
+        if out_of_order.any():
+            violations.append(('strictly increasing', date, out_of_order))
+    return violations
+
+def quarantine(name, data_dir, df, bad, violations):
+    """Write quarantined rows with their failed checks; returns the file path"""
+    reasons = np.full(len(df), '', dtype=object)
+    for check, column, mask in violations:
+        reasons[mask] += (f"{column} {check}" if column else check) + '; '
+    rows = df[bad].assign(_violations=reasons[bad])
+    path = os.path.join(QUARANTINE_DIR, f"{os.path.basename(os.path.normpath(data_dir))}-{name}.csv")
+    os.makedirs(QUARANTINE_DIR, exist_ok=True)
+    rows.to_csv(path, index=not isinstance(df.index, pd.RangeIndex))
+    return path
+
+def validate(name, df, data_dir):
+    """Check a freshly loaded asset against its contract and return the rows that pass.
+
+    Raises SchemaError for structural problems; quarantines partitions with
+    row-level violations and attaches the report as ``df.attrs['validation']``.
+    """
+    contract = CONTRACTS[name]
+    started = time.perf_counter()
+    try:
+        columns = contract_columns(contract, df)
+        missing = [column for column in list(columns) + [contract.get('date'), contract.get('partition')]
+                   if column and column not in df.columns]
+        if missing:
+            raise SchemaError(f"missing column(s) {', '.join(map(repr, missing))}")
+        wrong_type = [f"{column!r} should be {spec['type']} (is {df[column].dtype})"
+                      for column, spec in columns.items() if not TYPE_CHECKS[spec['type']](df[column].dtype)]
+        if wrong_type:
+            raise SchemaError('; '.join(wrong_type))
+    except SchemaError as e:
+        raise SchemaError(f"{name} ({data_dir}): {e}") from None
+
+    violations = row_violations(contract, df, columns)
+    bad = np.zeros(len(df), dtype=bool)
+    for _, _, mask in violations:
+        bad |= mask
+
+    partitions, quarantine_path = [], None
+    if bad.any():
+        partition = contract.get('partition')
+        if partition:
+            # A partition with any bad row is quarantined as a whole
+            partitions = pd.unique(df.loc[bad, partition]).tolist()
+            bad = df[partition].isin(partitions).to_numpy()
+        quarantine_path = quarantine(name, data_dir, df, bad, violations)
+        df = df[~bad]
+        if isinstance(df.index, pd.RangeIndex):
+            df = df.reset_index(drop=True)
+
+    df = df.copy(deep=False)
+    df.attrs['validation'] = {
+        'asset': name,
+        'data_dir': data_dir,
+        'rows': len(df) + int(bad.sum()),
+        'quarantined_rows': int(bad.sum()),
+        'quarantined_partitions': [str(p) for p in partitions],
+        'violations': [{'check': check, 'column': column, 'rows': int(mask.sum())}
+                       for check, column, mask in violations],
+        'quarantine_file': quarantine_path,
+        'seconds': time.perf_counter() - started
+    }
+    return df
+
+def validation_report(reports):
+    """One row per validated asset with its violation summary"""
+    rows = []
+    for report in reports:
+        rows.append({
+            'Asset': report['asset'],
+            'Rows': report['rows'],
+            'Quarantined Rows': report['quarantined_rows'],
+            'Quarantined Partitions': ', '.join(report['quarantined_partitions']),
+            'Violations': '; '.join(
+                f"{v['column'] + ' ' if v['column'] else ''}{v['check']} ({v['rows']} rows)" for v in report['violations']
+            ),
+            'Status': 'quarantined' if report['quarantined_rows'] else 'ok'
+        })
+    return pd.DataFrame(rows, columns=['Asset', 'Rows', 'Quarantined Rows', 'Quarantined Partitions', 'Violations', 'Status'])